@@ -84,6 +84,8 @@
 % SST_Astride_TDM.py, script per l'estrazione sia delle header keys importanti sia delle coordinate dei punti medi delle tracce 
 % dei satelliti dai file calibrati fits WCS
 %
+% SST_pipeline.py, script che esegue gli script Python precedenti in un unico processo (dal 17 ottobre 2026)
+%
 % evaluate_TDM_measurements.py, script del PoliMI per verificare i residui
 % dei TDM dei Galileo usati per le campagne di calibrazione. Si trova
 % dentro la cartella "Evaluate_TDM".
@@ -276,37 +278,24 @@ end
 % MASTER BIAS FRAME GENERATION AND FITS IMAGE CALIBRATION %
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
-disp('COMPUTE MASTER BIAS FRAME')
+disp('COMPUTE MASTER BIAS FRAME, RAW IMAGES CALIBRATION (MASTER BIAS SUBTRACTION)')
+disp('AND READ HEADERS KEYS FROM CALIBRATED IMAGES')
 disp('   ')
 
 % Matlab va nella cartella dove ci sono gli script Python della pipeline
 cd(home_path)
 
-% Define command line for fits_master_bias.py
-command_line_bias=strcat('python3', " ", 'fits_master_bias.py', " ", data_path, " ", image_prefix, '_BIAS_', " ", '.fit', " ", num2str(NBmin), " ", num2str(NBmax-NBmin+1));
- 
-% Generate a file "master_bias.fit" in data_path
-system(command_line_bias);
-
-disp('RAW IMAGES CALIBRATION (MASTER BIAS SUBTRACTION)')
-disp('  ')
+% Dal 17 ottobre 2026 master bias, calibrazione e lettura delle keys sono eseguiti da SST_pipeline.py
+% in un unico processo Python (fasi "reduction"), invece di tre chiamate separate a
+% fits_master_bias.py, fits_calibration.py e fits_keys_reader.py. I file di output sono gli stessi.
 
-% Define command line for fits_calibration.py
-command_line_calibration=strcat('python3', " ", 'fits_calibration.py', " ", data_path, " ", image_prefix, '_', " ", '.fit', " ", num2str(Nmin), " ", num2str(Nmax-Nmin+1));
+% Define command line for SST_pipeline.py
+command_line_reduction=strcat('python3', " ", 'SST_pipeline.py', " ", data_path, " ", image_prefix, " ", num2str(NBmin), " ", num2str(NBmax), " ", num2str(Nmin), " ", num2str(Nmax), " ", num2str(soglia_astride), " ", 'reduction');
 
-% Images calibration, final format: "YYYYMMDD_NNN_cal.fit"
+% Generate a file "master_bias.fit" in data_path, calibrated images "YYYYMMDD_NNN_cal.fit"
+% and read header keys: data e ora, nome oggetto, tempo di esposizione, AR e DEC. Save in: "Data_keys.txt".
 % N.B. Sono le immagini "*_cal.fit" che vanno calibrate con astrometry.net
-system(command_line_calibration);
-
-disp('READ HEADERS KEYS FROM CALIBRATED IMAGES')
-disp('  ')
-
-% Define command line for fits_calibration.py
-command_line_header=strcat('python3', " ", 'fits_keys_reader.py', " ", data_path, " ", image_prefix, '_', " ", '_cal.fit', " ", num2str(Nmin), " ", num2str(Nmax-Nmin+1));
-
-% Read heder keys: data e ora, nome oggetto, tempo di esposizione, AR e DEC.
-% Save in: "Data_keys.txt".
-system(command_line_header);
+system(command_line_reduction);
 
 disp('EXIT MASTER BIAS GENERATION, FITS CALIBRATION AND IMPORTANT HEADER KEYS READING')
 disp('  ')
@@ -423,31 +412,21 @@ end
 % EXTRACTING KEYWORDS FROM WCS FITS %
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 disp('  ')
-disp('READ HEADERS KEYS FROM CALIBRATED WCS IMAGES')
+disp('READ HEADERS KEYS FROM CALIBRATED WCS IMAGES AND START SATELLITES TRACE EXTRACTION WITH ASTRiDE')
 disp('  ')
 
-% Define command line for fits_calibration.py
-command_line_header=strcat('python3', " ", 'fits_keys_reader.py', " ", data_path, " ", image_prefix, '_WCS_', " ", '.fit', " ", num2str(Nmin), " ", num2str(Nmax-Nmin+1));
+% Lettura delle keys dalle immagini WCS ed estrazione delle tracce con SST_pipeline.py in un unico
+% processo Python (fasi "extraction", cioè fits_keys_reader.py e SST_Astride_TDM.py)
+
+% Define command line for SST_pipeline.py
+command_line_extraction=strcat('python3', " ", 'SST_pipeline.py', " ", data_path, " ", image_prefix, " ", num2str(NBmin), " ", num2str(NBmax), " ", num2str(Nmin), " ", num2str(Nmax), " ", num2str(soglia_astride), " ", 'extraction');
 
 % Read heder keys: data e ora, nome oggetto, tempo di esposizione,
 % AR e DEC from WCS images. Save in: "Data_keys.txt".
-
-system(command_line_header);
-
-%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-% EXTRACTION OF SATELLITE TRACES FROM WCS IMAGES, READING OF HEADER KEYS AND MEASUREMENT OF AR AND DEC COORDINATES OF THE TRACE CENTER %
-%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-
-disp('START SATELLITES TRACE EXTRACTION WITH ASTRiDE')
-disp('   ')
-
-% Define command line for SST_ASTRiDE_TDM.py
-command_line_astrid=strcat('python3', " ", 'SST_Astride_TDM.py', " ", data_path, " ", image_prefix, '_WCS_', " ", '.fit', " ", num2str(Nmin), " ", num2str(Nmax-Nmin+1), " ", num2str(soglia_astride));
- 
 % Satellite headers and trace extraction, save header keys, AR and DEC coordinates in "Data_headers_streaks.txt"
 % Warning: a comma is placed after each key to facilitate the recognition of columns with readtable.
 
-system(command_line_astrid);
+system(command_line_extraction);
 
 disp('EXIT ASTRiDE SCRIPT RETURN TO MATLAB')
 disp('  ')
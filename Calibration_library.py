@@ -0,0 +1,291 @@
+# Python library for the persistent storage of master calibration frames.
+#
+# Each master bias created by "fits_master_bias.py" is saved in the calibration library folder
+# together with the SHA1 hashes of the bias frames used to build it and the detector configuration
+# read from the header (detector, binning, temperature, frame size and date of the night).
+# When the same bias set is processed again the master is reused immediately, without computing
+# the median again. When the night has no master bias of its own (path0+'master_bias.fit'),
+# "fits_calibration.py" looks up in the library the master compatible with the science frames.
+#
+# The functions that can be used are:
+#
+# 1-"find_master(files)", master built from exactly the same bias files (None if not present)
+#
+# 2-"store_master(data, head, files)", save a new master in the library and return its path
+#
+# 3-"find_compatible_master(head)", most recent master with the same detector configuration of head
+#
+# 4-"expire_library()", delete the entries older than MAX_AGE_DAYS or exceeding MAX_ENTRIES
+#
+# The library index is the JSON file "library.json" in the library folder.
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import hashlib
+import json
+import os
+import time
+import datetime
+
+import Fits_io as fio
+
+# Default library folder, next to the pipeline scripts so that it is shared by all the nights.
+# The environment variable SST_CALIBRATION_LIBRARY selects another folder (e.g. for tests and benchmarks)
+LIBRARY_PATH=os.environ.get('SST_CALIBRATION_LIBRARY',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Calibration_library'))
+
+# Expiry of the library entries
+MAX_AGE_DAYS=60        # Maximum age of a master (days)
+MAX_ENTRIES=100        # Maximum number of masters in the library
+
+# Maximum difference of CCD temperature for compatible masters (degrees)
+TEMP_TOLERANCE=2.0
+
+# Header keys of the detector configuration (the first one present is used)
+DETECTOR_KEYS=('DETNAME', 'INSTRUME')
+XBIN_KEYS=('XBINNING', 'CCDXBIN', 'BINX')
+YBIN_KEYS=('YBINNING', 'CCDYBIN', 'BINY')
+TEMP_KEYS=('CCD-TEMP', 'CCDTEMP', 'SET-TEMP')
+
+INDEX_NAME='library.json'
+
+#==================================================================================
+
+def file_hash(file_to_hash, block_size=1<<20):
+
+    """
+    SHA1 hash of the content of a file read in blocks of block_size bytes.
+    """
+
+    h=hashlib.sha1()
+    with open(file_to_hash, 'rb') as f:
+        block=f.read(block_size)
+        while block:
+            h.update(block)
+            block=f.read(block_size)
+
+    return h.hexdigest()
+
+#==================================================================================
+
+def _first_key(head, keys):
+
+    """
+    Value of the first key of keys present in the header head (None if no key is present).
+    """
+
+    for key in keys:
+        if key in head:
+            return head[key]
+
+    return None
+
+#==================================================================================
+
+def detector_config(head):
+
+    """
+    Detector configuration of a fits header used to match compatible masters.
+    Output:
+    dictionary with detector name, binning, frame size, CCD temperature and date of the night
+    """
+
+    detector=_first_key(head, DETECTOR_KEYS)
+    temp=_first_key(head, TEMP_KEYS)
+
+    return {'detector': None if detector is None else str(detector).strip(),
+            'xbin': _first_key(head, XBIN_KEYS),
+            'ybin': _first_key(head, YBIN_KEYS),
+            'naxis1': head.get('NAXIS1'),
+            'naxis2': head.get('NAXIS2'),
+            'temp': None if temp is None else float(temp),
+            'date': str(head.get('DATE-OBS', ''))[0:10]}
+
+#==================================================================================
+
+def _load_index(library_path):
+
+    index_file=os.path.join(library_path, INDEX_NAME)
+    if not os.path.isfile(index_file):
+        return []
+    with open(index_file) as f:
+        return json.load(f)
+
+#==================================================================================
+
+def _save_index(library_path, entries):
+
+    # Scrittura atomica dell'indice: un crash non lascia il file a metà
+    index_file=os.path.join(library_path, INDEX_NAME)
+    tmp_file=index_file+'.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(entries, f, indent=1)
+    os.replace(tmp_file, index_file)
+
+#==================================================================================
+
+def _set_key(hashes):
+
+    """
+    Key of a bias set: hash of the sorted hashes of the input files.
+    The key does not depend on the order or on the names of the files.
+    """
+
+    return hashlib.sha1(' '.join(sorted(hashes)).encode()).hexdigest()
+
+#==================================================================================
+
+def find_master(files, library_path=LIBRARY_PATH):
+
+    """
+    Look for a master built from exactly the same bias files.
+    Input:
+    files = list of paths of the bias frames
+    Output:
+    path of the master in the library, None if the bias set is not in the library
+    """
+
+    key=_set_key([file_hash(f) for f in files])
+
+    for entry in _load_index(library_path):
+        master_file=os.path.join(library_path, entry['file'])
+        if entry['key'] == key and os.path.isfile(master_file):
+            return master_file
+
+    return None
+
+#==================================================================================
+
+def store_master(data, head, files, library_path=LIBRARY_PATH):
+
+    """
+    Save a master frame in the library and register it in the index.
+    Input:
+    data, head = master image and its header
+    files = list of paths of the bias frames used to build the master
+    Output:
+    path of the master in the library
+    """
+
+    os.makedirs(library_path, exist_ok=True)
+
+    hashes=[file_hash(f) for f in files]
+    key=_set_key(hashes)
+    master_name='master_bias_'+key[0:16]+'.fit'
+
+    # Master senza perdita, con la compressione delle immagini della pipeline
+    fio.write_image(os.path.join(library_path, master_name), data, head, quantize_level=0)
+
+    entries=[entry for entry in _load_index(library_path) if entry['key'] != key]
+    entries.append({'key': key,
+                    'file': master_name,
+                    'created': time.time(),
+                    'inputs': [{'name': os.path.basename(f), 'sha1': h} for f, h in zip(files, hashes)],
+                    'config': detector_config(head)})
+    _save_index(library_path, entries)
+
+    expire_library(library_path)
+
+    return os.path.join(library_path, master_name)
+
+#==================================================================================
+
+def _compatible(config, ref):
+
+    """
+    True if the detector configuration config can be used to calibrate frames with configuration ref.
+    """
+
+    for key in ('detector', 'xbin', 'ybin', 'naxis1', 'naxis2'):
+        if config[key] != ref[key]:
+            return False
+
+    if config['temp'] is not None and ref['temp'] is not None:
+        if abs(config['temp']-ref['temp']) > TEMP_TOLERANCE:
+            return False
+
+    return True
+
+#==================================================================================
+
+def _days_between(date1, date2):
+
+    try:
+        d1=datetime.date.fromisoformat(date1)
+        d2=datetime.date.fromisoformat(date2)
+    except ValueError:
+        return float('inf')
+
+    return abs((d1-d2).days)
+
+#==================================================================================
+
+def find_compatible_master(head, library_path=LIBRARY_PATH, max_age_days=MAX_AGE_DAYS):
+
+    """
+    Look for the master that can calibrate a frame with header head: same detector,
+    binning and frame size, CCD temperature within TEMP_TOLERANCE and not older than
+    max_age_days. Among the compatible masters the one with the nearest date of the night is chosen.
+    A frame without detector keys (DETECTOR_KEYS) cannot be matched: the frame size alone does not
+    identify the camera.
+    Input:
+    head = header of the frame to calibrate
+    Output:
+    path of the master in the library, None if there is no compatible master
+    """
+
+    ref=detector_config(head)
+    if ref['detector'] is None:
+        return None
+    now=time.time()
+
+    best=None
+    best_days=None
+    for entry in _load_index(library_path):
+        master_file=os.path.join(library_path, entry['file'])
+        if now-entry['created'] > max_age_days*86400 or not os.path.isfile(master_file):
+            continue
+        if not _compatible(entry['config'], ref):
+            continue
+        days=_days_between(entry['config']['date'], ref['date'])
+        if best is None or days < best_days or (days == best_days and entry['created'] > best['created']):
+            best=entry
+            best_days=days
+
+    if best is None:
+        return None
+
+    return os.path.join(library_path, best['file'])
+
+#==================================================================================
+
+def expire_library(library_path=LIBRARY_PATH, max_age_days=MAX_AGE_DAYS, max_entries=MAX_ENTRIES):
+
+    """
+    Delete from the library the masters older than max_age_days and the oldest
+    masters exceeding max_entries.
+    Output:
+    number of deleted masters
+    """
+
+    entries=_load_index(library_path)
+    now=time.time()
+
+    entries.sort(key=lambda entry: entry['created'], reverse=True)
+    keep=[entry for entry in entries if now-entry['created'] <= max_age_days*86400][0:max_entries]
+
+    removed=0
+    for entry in entries:
+        if entry not in keep:
+            master_file=os.path.join(library_path, entry['file'])
+            if os.path.isfile(master_file):
+                os.remove(master_file)
+            removed=removed+1
+
+    if removed > 0:
+        _save_index(library_path, keep)
+
+    return removed
+
+#==================================================================================
@@ -0,0 +1,313 @@
+# Python library for the fast reading of fits headers and for the persistent index of a night.
+#
+# The headers are read directly from the 2880 bytes blocks of the file until the END card,
+# without opening the file with astropy and without touching the pixel data. The frames of a
+# sequence are found with a single listing of the folder (no numeric probing of every file name).
+# The keys of each frame are saved in the SQLite index "Frames_index.sqlite" of the folder, so that
+# later stages and reruns can query the index instead of reading the fits headers again.
+# A frame is read again only if its size or modification time have changed. A frame without the complete
+# header or data (e.g. still being copied) is not indexed and is read again at the next scan.
+#
+# For the tile compressed frames (see "Fits_io.py") the header of the image is read from the first
+# extension, after the empty primary HDU, and given as the header of a plain fits file.
+#
+# The functions that can be used are:
+#
+# 1-"read_header(file_to_open)", header of the image read from the header blocks only
+#
+# 2-"list_frames(path0, name, ext, Ni, num_im)", frames of the sequence found in the folder
+#
+# 3-"scan_frames(path0, name, ext, Ni, num_im)", update the index and return the keys of the frames
+#
+# 4-"query_frames(path0, name, ext, Ni, num_im)", keys of the frames already in the index
+#
+# 5-"query_header(path0, file_name)", full header of a frame saved in the index
+#
+# 6-"remove_frame(path0, file_name)", remove a frame from the index
+#
+# 7-"frame_complete(file_to_open)", check if a frame being written contains the whole header and data
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+from astropy.io import fits
+import os
+import re
+import sqlite3
+
+# Name of the index file saved in the folder of the images
+INDEX_NAME='Frames_index.sqlite'
+
+# Header keys required by the pipeline
+PIPELINE_KEYS=('DATE-OBS', 'OBJECT', 'EXPTIME', 'RA', 'DEC')
+
+BLOCK_SIZE=2880
+CARD_SIZE=80
+
+# Key della tabella di un'immagine compressa che non fanno parte dell'header dell'immagine
+COMPRESSED_KEYS=re.compile(r'(XTENSION|BITPIX|NAXIS\d*|PCOUNT|GCOUNT|TFIELDS|THEAP|EXTNAME|'
+                           r'T(TYPE|FORM|UNIT|ZERO|SCAL|NULL|DISP|DIM)\d+|'
+                           r'Z(IMAGE|SIMPLE|EXTEND|TENSION|BITPIX|NAXIS\d*|TILE\d+|CMPTYPE|NAME\d+|VAL\d+|'
+                           r'QUANTIZ|DITHER0|BLOCKED|PCOUNT|GCOUNT|HECKSUM|DATASUM))$')
+
+#==================================================================================
+
+def _read_header_blocks(f):
+
+    # Header e numero di byte dei suoi blocchi, None se l'header non è completo
+    blocks=[]
+    while True:
+        block=f.read(BLOCK_SIZE)
+        if len(block) < BLOCK_SIZE:
+            return None, 0
+        blocks.append(block)
+        for i in range(0, BLOCK_SIZE, CARD_SIZE):
+            if block[i:i+8] == b'END     ':
+                header=fits.Header.fromstring(b''.join(blocks).decode('ascii', errors='replace'))
+                return header, BLOCK_SIZE*len(blocks)
+
+#==================================================================================
+
+def _data_bytes(hdr):
+
+    # Byte dei blocchi di dati di un HDU: |BITPIX|/8*GCOUNT*(PCOUNT+NAXIS1*...*NAXISn)
+    naxis=int(hdr.get('NAXIS', 0))
+    if naxis == 0:
+        return 0
+    data_bytes=1
+    for n in range(1, naxis+1):
+        data_bytes*=int(hdr['NAXIS'+str(n)])
+    data_bytes=abs(int(hdr['BITPIX']))//8*int(hdr.get('GCOUNT', 1))*(int(hdr.get('PCOUNT', 0))+data_bytes)
+
+    # I dati sono scritti in blocchi interi di 2880 byte
+    return -(-data_bytes//BLOCK_SIZE)*BLOCK_SIZE
+
+#==================================================================================
+
+def _image_header(table):
+
+    # Header dell'immagine compressa, come l'header di un fits normale
+    hdr=fits.Header([('SIMPLE', True), ('BITPIX', table['ZBITPIX']), ('NAXIS', table['ZNAXIS'])])
+    for n in range(1, int(table['ZNAXIS'])+1):
+        hdr['NAXIS'+str(n)]=table['ZNAXIS'+str(n)]
+    for card in table.cards:
+        if not COMPRESSED_KEYS.match(card.keyword):
+            hdr.append(card)
+
+    return hdr
+
+#==================================================================================
+
+def _read_image_header(f):
+
+    # Header dell'immagine e byte dell'intero HDU dell'immagine, None se non è completo.
+    # Dopo un HDU primario vuoto con EXTEND l'immagine è nella prima estensione (es. immagine compressa)
+    hdr, header_bytes = _read_header_blocks(f)
+    if hdr is None:
+        return None, 0
+    data_bytes=_data_bytes(hdr)
+    if int(hdr.get('NAXIS', 0)) > 0 or not hdr.get('EXTEND', False):
+        return hdr, header_bytes+data_bytes
+
+    f.seek(header_bytes+data_bytes)
+    ext, ext_bytes = _read_header_blocks(f)
+    if ext is None:
+        return None, 0
+    size=header_bytes+data_bytes+ext_bytes+_data_bytes(ext)
+
+    return (_image_header(ext) if ext.get('ZIMAGE', False) else ext), size
+
+#==================================================================================
+
+def read_header(file_to_open):
+
+    """
+    Read the header of the image of a fits file block by block until the END card:
+    the primary HDU or, after an empty primary HDU, the first extension (e.g. a tile
+    compressed image, given as the header of a plain fits file). The pixel data are never read.
+    Input:
+    file_to_open = path of the fits file
+    Output:
+    astropy Header, None if the file does not contain a complete header
+    """
+
+    with open(file_to_open, 'rb') as f:
+        return _read_image_header(f)[0]
+
+#==================================================================================
+
+def frame_complete(file_to_open):
+
+    """
+    Check if a fits file being written (e.g. by the camera) already contains the complete
+    image: the whole header and all the data blocks declared by BITPIX and NAXISn
+    (for a compressed image, all the blocks of the compressed table).
+    Output:
+    header of the frame if complete, None otherwise
+    """
+
+    try:
+        with open(file_to_open, 'rb') as f:
+            size=os.fstat(f.fileno()).st_size
+            hdr, hdu_bytes = _read_image_header(f)
+    except (OSError, KeyError, ValueError):
+        return None
+
+    if hdr is None:
+        return None
+
+    return hdr if size >= hdu_bytes else None
+
+#==================================================================================
+
+def list_frames(path0, name, ext, Ni, num_im):
+
+    """
+    Frames of the sequence name+NNN+ext with Ni <= NNN < Ni+num_im found with a single
+    listing of the folder path0.
+    Output:
+    list of tuples (NNN, file name) in increasing order of NNN
+    """
+
+    pattern=re.compile(re.escape(name)+r'(\d+)'+re.escape(ext)+'$')
+    Ni=int(Ni)
+    Nf=Ni+int(num_im)
+
+    frames=[]
+    with os.scandir(path0) as entries:
+        for entry in entries:
+            match=pattern.match(entry.name)
+            if match and Ni <= int(match.group(1)) < Nf and entry.is_file():
+                frames.append((int(match.group(1)), entry.name))
+    frames.sort()
+
+    return frames
+
+#==================================================================================
+
+def _connect(path0):
+
+    db=sqlite3.connect(os.path.join(path0, INDEX_NAME))
+    db.execute('CREATE TABLE IF NOT EXISTS frames ('
+               'file TEXT PRIMARY KEY, num INTEGER, size INTEGER, mtime INTEGER, valid INTEGER, '
+               'date_obs TEXT, object TEXT, exptime TEXT, ra TEXT, dec TEXT, header TEXT)')
+
+    return db
+
+#==================================================================================
+
+def _header_row(file_name, num, stat, hdr):
+
+    # I valori sono salvati come stringhe, nello stesso formato scritto in "Data_keys.txt"
+    valid=all(key in hdr for key in PIPELINE_KEYS)
+    values=[str(hdr[key]) if key in hdr else None for key in PIPELINE_KEYS]
+
+    return (file_name, num, stat.st_size, stat.st_mtime_ns, int(valid), *values, hdr.tostring())
+
+#==================================================================================
+
+def _row_dict(row):
+
+    keys=('file', 'num', 'valid', 'date_obs', 'object', 'exptime', 'ra', 'dec')
+
+    return dict(zip(keys, row))
+
+#==================================================================================
+
+def scan_frames(path0, name, ext, Ni, num_im):
+
+    """
+    Update the index of the folder path0 with the frames of the sequence and return their keys.
+    Only new or modified frames are read, the others are taken from the index.
+    Output:
+    list of dictionaries with keys file, num, valid, date_obs, object, exptime, ra, dec
+    in increasing order of frame number. valid is 1 if all the PIPELINE_KEYS are present.
+    The incomplete frames (see frame_complete) are skipped and not indexed.
+    """
+
+    frames=list_frames(path0, name, ext, Ni, num_im)
+
+    db=_connect(path0)
+    try:
+        cached={row[0]: row[1:] for row in db.execute('SELECT file, size, mtime FROM frames')}
+
+        for num, file_name in frames:
+            stat=os.stat(os.path.join(path0, file_name))
+            if cached.get(file_name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            # Immagine incompleta (es. copia in corso): non viene indicizzata, sarà letta alla prossima scansione
+            hdr=frame_complete(os.path.join(path0, file_name))
+            if hdr is None:
+                print(os.path.join(path0, file_name) + ' without complete header or data, skipped\n')
+                db.execute('DELETE FROM frames WHERE file=?', (file_name,))
+                continue
+            db.execute('INSERT OR REPLACE INTO frames VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+                       _header_row(file_name, num, stat, hdr))
+        db.commit()
+    finally:
+        db.close()
+
+    return query_frames(path0, name, ext, Ni, num_im, frames)
+
+#==================================================================================
+
+def query_frames(path0, name, ext, Ni, num_im, frames=None):
+
+    """
+    Keys of the frames of the sequence already saved in the index of the folder path0
+    (see scan_frames for the output format). frames is the optional output of list_frames.
+    """
+
+    if frames is None:
+        frames=list_frames(path0, name, ext, Ni, num_im)
+    if not os.path.isfile(os.path.join(path0, INDEX_NAME)):
+        return []
+
+    db=_connect(path0)
+    try:
+        rows=[]
+        for num, file_name in frames:
+            row=db.execute('SELECT file, num, valid, date_obs, object, exptime, ra, dec FROM frames '
+                           'WHERE file=?', (file_name,)).fetchone()
+            if row is not None:
+                rows.append(_row_dict(row))
+    finally:
+        db.close()
+
+    return rows
+
+#==================================================================================
+
+def query_header(path0, file_name):
+
+    """
+    Full header of a frame saved in the index of the folder path0 (None if not in the index).
+    """
+
+    db=_connect(path0)
+    try:
+        row=db.execute('SELECT header FROM frames WHERE file=?', (file_name,)).fetchone()
+    finally:
+        db.close()
+
+    if row is None:
+        return None
+
+    return fits.Header.fromstring(row[0])
+
+#==================================================================================
+
+def remove_frame(path0, file_name):
+
+    """
+    Remove a frame from the index of the folder path0.
+    """
+
+    db=_connect(path0)
+    try:
+        db.execute('DELETE FROM frames WHERE file=?', (file_name,))
+        db.commit()
+    finally:
+        db.close()
+
+#==================================================================================
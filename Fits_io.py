@@ -0,0 +1,264 @@
+# Python library for reading and writing the fits images of the pipeline, plain or tile compressed.
+#
+# A tile compressed image (fpack convention, compression Rice, HCOMPRESS or GZIP) is saved as a
+# compressed binary table in the first extension of the file, after an empty primary HDU. The functions
+# of this library find the image HDU of a file (primary HDU or compressed extension) so that the stages
+# read in the same way plain and compressed frames, with the same file names.
+#
+# The compression of the images written by the pipeline (master bias, calibrated and WCS frames) is
+# selected with the environment variable SST_FITS_COMPRESSION: none (default, plain fits as the
+# previous versions), rice, hcompress or gzip. The integer images are always compressed without loss.
+# The floating point images are quantized with SST_FITS_QUANTIZE levels per standard deviation of the
+# noise of each tile (default 16, as fpack); with SST_FITS_QUANTIZE=0 they are saved without loss,
+# always with GZIP because Rice and HCOMPRESS cannot compress floating point values without quantization.
+# The master bias is always saved without loss. The raw frames of the camera can be compressed
+# without loss with "fits_compress.py".
+#
+# The programs that cannot read compressed images (ASTRiDE, solve-field) receive a temporary plain copy.
+#
+# The functions that can be used are:
+#
+# 1-"image_hdu(hdul)", HDU with the image of an open fits file (primary HDU or compressed extension)
+#
+# 2-"is_compressed(file_to_open)", True if the image of the file is tile compressed
+#
+# 3-"read_header(file_to_open)", header of the image, as the header of a plain fits file
+#
+# 4-"read_image(file_to_open)", data and header of the image
+#
+# 5-"write_image(file_to_save, data, header, compression, quantize_level, scaling)", save a plain or compressed image
+#
+# 6-"image_hdus(data, header, compression, quantize_level, scaling)", HDUs of a plain or compressed image
+#
+# 7-"compress_file(file_to_open, file_to_save, compression, quantize_level)", compress (or decompress) a file
+#
+# 8-"plain_file(file_to_open)", context manager giving a plain copy of a compressed file
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+from astropy.io import fits
+
+# Compressione delle immagini scritte dalla pipeline: none, rice, hcompress, gzip
+COMPRESSION=os.environ.get('SST_FITS_COMPRESSION', 'none').strip().lower()
+
+# Livello di quantizzazione delle immagini in virgola mobile (0 = senza perdita, con GZIP)
+QUANTIZE_LEVEL=float(os.environ.get('SST_FITS_QUANTIZE', '16'))
+
+# Algoritmi di compressione a tasselli di astropy
+COMPRESSION_TYPES={'rice': 'RICE_1', 'hcompress': 'HCOMPRESS_1', 'gzip': 'GZIP_2'}
+
+# Tipi degli interi con BZERO/BSCALE, per BITPIX
+INTEGER_TYPES={8: 'uint8', 16: 'int16', 32: 'int32', 64: 'int64'}
+
+# Key della tabella compressa che non fanno parte dell'header di un'immagine primaria
+EXTENSION_KEYS=('XTENSION', 'PCOUNT', 'GCOUNT')
+
+#==================================================================================
+
+def image_hdu(hdul):
+
+    """
+    HDU with the image of an open fits file: the primary HDU if it has data,
+    otherwise the first image extension (e.g. a tile compressed image).
+    """
+
+    if hdul[0].header.get('NAXIS', 0) > 0:
+        return hdul[0]
+
+    for hdu in hdul[1:]:
+        if isinstance(hdu, (fits.CompImageHDU, fits.ImageHDU)) and hdu.header.get('NAXIS', 0) > 0:
+            return hdu
+
+    return hdul[0]
+
+#==================================================================================
+
+def primary_header(header):
+
+    """
+    Header of an image extension (e.g. of a compressed image) as the header of a primary HDU.
+    """
+
+    head=header.copy()
+    if 'XTENSION' not in head:
+        return head
+
+    for key in EXTENSION_KEYS:
+        head.remove(key, ignore_missing=True)
+    head.insert(0, ('SIMPLE', True, 'conforms to FITS standard'))
+
+    return head
+
+#==================================================================================
+
+def is_compressed(file_to_open):
+
+    """
+    True if the image of the fits file is tile compressed.
+    """
+
+    with fits.open(file_to_open) as hdul:
+        return isinstance(image_hdu(hdul), fits.CompImageHDU)
+
+#==================================================================================
+
+def read_header(file_to_open):
+
+    """
+    Header of the image of a fits file (plain or compressed), as the header of a plain fits file.
+    The pixel data are not read.
+    """
+
+    with fits.open(file_to_open) as hdul:
+        return primary_header(image_hdu(hdul).header)
+
+#==================================================================================
+
+def read_image(file_to_open):
+
+    """
+    Data and header of the image of a fits file (plain or compressed).
+    Output:
+    data (with BZERO/BSCALE applied, as fits.getdata), header as saved in the file (see read_header)
+    """
+
+    with fits.open(file_to_open) as hdul:
+        hdu=image_hdu(hdul)
+        # L'header è copiato prima di leggere i dati, astropy lo aggiorna dopo lo scaling
+        header=primary_header(hdu.header)
+        return hdu.data, header
+
+#==================================================================================
+
+def image_hdus(data, header=None, compression='none', quantize_level=QUANTIZE_LEVEL, scaling=None):
+
+    """
+    HDUs of an image: plain primary HDU or empty primary HDU and tile compressed image, one row per tile.
+    Integer images are compressed without loss; floating point images are quantized with quantize_level
+    (0 = without loss, GZIP is used whatever the compression).
+    Input:
+    scaling = optional (integer type, BSCALE, BZERO): the floating point data are saved as scaled integers
+    (e.g. the int16 calibrated frames), see stored_scaling; a copy of data is scaled, data is not changed
+    Output:
+    list of HDUs
+    """
+
+    head=primary_header(header) if header is not None else fits.Header()
+
+    # Con lo scaling gli interi salvati sono calcolati da astropy, BZERO e BSCALE sono riscritti
+    # hdu.scale converte i dati sul posto: viene scalata una copia, i dati del chiamante non cambiano
+    scaled=scaling is not None and data.dtype.kind == 'f'
+    if scaled:
+        data=data.copy()
+        head.remove('BZERO', ignore_missing=True)
+        head.remove('BSCALE', ignore_missing=True)
+
+    if compression == 'none':
+        hdu=fits.PrimaryHDU(data, head)
+        hdus=[hdu]
+    elif compression in COMPRESSION_TYPES:
+        compression_type=COMPRESSION_TYPES[compression]
+        if data.dtype.kind == 'f' and not scaled and quantize_level == 0:
+            compression_type='GZIP_2'
+        # HCOMPRESS lavora su tasselli bidimensionali, almeno 4 righe
+        tile_shape=(min(16, data.shape[0]), data.shape[1]) if compression_type == 'HCOMPRESS_1' else None
+        hdu=fits.CompImageHDU(data, head, compression_type=compression_type, quantize_level=quantize_level,
+                              tile_shape=tile_shape)
+        hdus=[fits.PrimaryHDU(), hdu]
+    else:
+        raise ValueError('Unknown compression ' + compression + ', use one of: none, ' + ', '.join(COMPRESSION_TYPES))
+
+    if scaled:
+        hdu.scale(scaling[0], bscale=scaling[1], bzero=scaling[2])
+
+    return hdus
+
+#==================================================================================
+
+def write_image(file_to_save, data, header=None, compression=None, quantize_level=None, scaling=None):
+
+    """
+    Save an image as plain or tile compressed fits file (see image_hdus).
+    Input:
+    compression = none, rice, hcompress or gzip (default COMPRESSION),
+    quantize_level = quantization of the floating point images (default QUANTIZE_LEVEL, 0 = without loss)
+    """
+
+    compression=COMPRESSION if compression is None else compression
+    quantize_level=QUANTIZE_LEVEL if quantize_level is None else quantize_level
+
+    fits.HDUList(image_hdus(data, header, compression, quantize_level, scaling)).writeto(file_to_save, overwrite=True)
+
+#==================================================================================
+
+def stored_scaling(data, header):
+
+    """
+    Scaling of the integers stored in a fits file with BZERO/BSCALE and read as floating point data
+    (e.g. int16 calibrated frames), to save again the same integers. None for the other images
+    (also for the unsigned integers of the cameras, read as unsigned integers).
+    Output:
+    (integer type, BSCALE, BZERO) or None
+    """
+
+    if data.dtype.kind != 'f' or header.get('BITPIX', 0) <= 0 or not ('BZERO' in header or 'BSCALE' in header):
+        return None
+
+    return INTEGER_TYPES[header['BITPIX']], header.get('BSCALE', 1.0), header.get('BZERO', 0.0)
+
+#==================================================================================
+
+def compress_file(file_to_open, file_to_save=None, compression='rice', quantize_level=0):
+
+    """
+    Compress (or decompress with compression='none') the image of a fits file, by default without loss.
+    The file is written in a temporary file and then renamed, so that file_to_save can be file_to_open.
+    Output:
+    size of the input and of the output file (bytes)
+    """
+
+    file_to_save=file_to_open if file_to_save is None else file_to_save
+    temp_file=file_to_save+'.tmp'
+
+    data, header = read_image(file_to_open)
+    write_image(temp_file, data, header, compression, quantize_level, stored_scaling(data, header))
+
+    size=os.path.getsize(file_to_open)
+    os.replace(temp_file, file_to_save)
+
+    return size, os.path.getsize(file_to_save)
+
+#==================================================================================
+
+@contextlib.contextmanager
+def plain_file(file_to_open, folder=None, compressed=None):
+
+    """
+    Plain copy of a compressed fits file for the programs that cannot read compressed images (e.g. ASTRiDE).
+    A plain file is given as it is. The copy has the same name of the file, in a new temporary folder
+    created in folder (default the temporary folder of the system, usually a local disk), and it is
+    deleted at the end of the block. compressed (see is_compressed) can be given by a caller that has
+    already opened the file, so that the file is not opened again only to check it.
+    """
+
+    if compressed is None:
+        compressed=is_compressed(file_to_open)
+    if not compressed:
+        yield file_to_open
+        return
+
+    temp_dir=tempfile.mkdtemp(prefix='sst_plain_', dir=folder)
+    temp_file=os.path.join(temp_dir, os.path.basename(file_to_open))
+    try:
+        with fits.open(file_to_open) as hdul:
+            hdu=image_hdu(hdul)
+            fits.writeto(temp_file, hdu.data, primary_header(hdu.header), overwrite=True)
+        yield temp_file
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,188 @@
+# Python library for the manifest of the processing of a night, used for resumable and incremental reruns.
+#
+# For each frame and stage of the pipeline (e.g. "calibration" and "streaks") the manifest records the
+# SHA1 hashes of the input files, the parameters of the stage (e.g. soglia and area_cut of ASTRiDE),
+# the output files with their size and modification time and the per-frame result (e.g. the lines of
+# "Data_headers_streaks.txt" of the frame). A rerun of the stage redoes only the frames whose inputs,
+# parameters or outputs have changed, and rebuilds the combined outputs from the results saved in
+# the manifest. Each frame is recorded as soon as it is done, so that after a crash the rerun
+# restarts from the first frame not yet recorded.
+#
+# The hashes are computed once per file: they are saved with the size and modification time of the
+# file and computed again only if these change.
+# The manifest is the SQLite file "Night_manifest.sqlite" in the folder of the images.
+# The environment variable SST_MANIFEST=0 (or enable(False)) disables the reuse of the recorded
+# frames: all the frames are processed again (and recorded).
+#
+# The functions that can be used are:
+#
+# 1-"file_digest(path0, file_name)", SHA1 hash of a file, computed again only if the file changes
+#
+# 2-"lookup(path0, stage, frame, inputs, params)", recorded result of a frame (None if it must be processed)
+#
+# 3-"record(path0, stage, frame, inputs, params, outputs, result)", record a processed frame
+#
+# 4-"forget(path0, stage=None)", remove the records of a stage (or of all the stages)
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+import Calibration_library as cl
+
+# Riuso dei frame già elaborati, SST_MANIFEST=0 lo disattiva
+ENABLED=os.environ.get('SST_MANIFEST', '1').strip().lower() not in ('0', 'off', 'no', 'false')
+
+# Nome del manifest nella cartella delle immagini
+MANIFEST_NAME='Night_manifest.sqlite'
+
+#==================================================================================
+
+def enable(flag=True):
+
+    """
+    Enable or disable the reuse of the recorded frames.
+    """
+
+    global ENABLED
+
+    ENABLED=bool(flag)
+
+#==================================================================================
+
+def _connect(path0):
+
+    db=sqlite3.connect(os.path.join(path0, MANIFEST_NAME))
+    db.execute('CREATE TABLE IF NOT EXISTS hashes (file TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, sha1 TEXT)')
+    db.execute('CREATE TABLE IF NOT EXISTS frames ('
+               'stage TEXT, frame TEXT, inputs TEXT, params TEXT, outputs TEXT, result TEXT, time TEXT, '
+               'PRIMARY KEY (stage, frame))')
+
+    return db
+
+#==================================================================================
+
+@contextlib.contextmanager
+def _manifest(path0):
+
+    # Connessione al manifest, con commit alla fine del blocco
+    db=_connect(path0)
+    try:
+        yield db
+        db.commit()
+    finally:
+        db.close()
+
+#==================================================================================
+
+def _stat(file_name):
+
+    stat=os.stat(file_name)
+
+    return stat.st_size, stat.st_mtime_ns
+
+#==================================================================================
+
+def _digest(db, file_name):
+
+    file_name=os.path.abspath(file_name)
+    size, mtime = _stat(file_name)
+    row=db.execute('SELECT size, mtime, sha1 FROM hashes WHERE file=?', (file_name,)).fetchone()
+    if row is not None and row[0:2] == (size, mtime):
+        return row[2]
+
+    sha1=cl.file_hash(file_name)
+    db.execute('INSERT OR REPLACE INTO hashes VALUES (?,?,?,?)', (file_name, size, mtime, sha1))
+
+    return sha1
+
+#==================================================================================
+
+def file_digest(path0, file_name):
+
+    """
+    SHA1 hash of the content of a file. The hash is saved in the manifest of path0 with size and
+    modification time of the file and computed again only if they change.
+    """
+
+    with _manifest(path0) as db:
+        return _digest(db, file_name)
+
+#==================================================================================
+
+def _inputs_key(db, inputs):
+
+    return json.dumps({os.path.basename(f): _digest(db, f) for f in inputs}, sort_keys=True)
+
+#==================================================================================
+
+def _outputs_unchanged(outputs):
+
+    for file_name, size, mtime in outputs:
+        if not os.path.isfile(file_name) or _stat(file_name) != (size, mtime):
+            return False
+
+    return True
+
+#==================================================================================
+
+def lookup(path0, stage, frame, inputs, params):
+
+    """
+    Result recorded for a frame of a stage, if inputs, parameters and outputs have not changed.
+    Input:
+    path0 = folder of the images (manifest), stage = name of the stage, frame = name of the frame,
+    inputs = list of input files, params = dictionary of the parameters of the stage (JSON serializable)
+    Output:
+    recorded result (string), None if the frame must be processed
+    """
+
+    if not ENABLED:
+        return None
+
+    with _manifest(path0) as db:
+        row=db.execute('SELECT inputs, params, outputs, result FROM frames WHERE stage=? AND frame=?',
+                       (stage, frame)).fetchone()
+        if row is None or row[1] != json.dumps(params, sort_keys=True):
+            return None
+        if row[0] != _inputs_key(db, inputs):
+            return None
+
+    if not _outputs_unchanged(json.loads(row[2])):
+        return None
+
+    return row[3]
+
+#==================================================================================
+
+def record(path0, stage, frame, inputs, params, outputs=(), result=''):
+
+    """
+    Record a processed frame of a stage (see lookup). outputs = list of output files of the frame,
+    result = per-frame result (string) used to rebuild the combined outputs.
+    """
+
+    with _manifest(path0) as db:
+        outputs=[(os.path.abspath(f), *_stat(f)) for f in outputs]
+        db.execute('INSERT OR REPLACE INTO frames VALUES (?,?,?,?,?,?,?)',
+                   (stage, frame, _inputs_key(db, inputs), json.dumps(params, sort_keys=True),
+                    json.dumps(outputs), result, time.strftime('%Y-%m-%dT%H:%M:%S')))
+
+#==================================================================================
+
+def forget(path0, stage=None):
+
+    """
+    Remove the records of a stage (all the stages if stage is None) from the manifest of path0.
+    """
+
+    with _manifest(path0) as db:
+        if stage is None:
+            db.execute('DELETE FROM frames')
+        else:
+            db.execute('DELETE FROM frames WHERE stage=?', (stage,))
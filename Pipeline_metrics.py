@@ -0,0 +1,273 @@
+# Python library for the instrumentation of the pipeline scripts.
+#
+# Each script starts a run with "start_run": the timers of the stages (open, read, calibrate, detect,
+# fit, wcs, write, ...), the counters (frames, streaks, skipped files, removed files, ...) and the
+# peak memory of the process are collected during the run and written as JSON lines in the log file
+# "Pipeline_metrics.jsonl" of the images folder (one "start" record, one record for each timer with
+# the frame and one "summary" record for each run). At the end of the run a summary table is printed.
+# The worker processes of multiprocessing keep their records in memory: they are returned with
+# "drain" and written by the main process with "merge".
+#
+# The instrumentation costs a few microseconds per timer and can be left on. It is disabled by the
+# environment variable SST_METRICS=0 (or with enable(False)): timers and counters do nothing.
+# The environment variable SST_METRICS_LOG selects another log file (e.g. one for the whole night).
+#
+# The functions that can be used are:
+#
+# 1-"start_run(script, path0, **params)", start the run of a script
+#
+# 2-"timer(name, frame=None)", context manager measuring a stage (of a frame, if given)
+#
+# 3-"count(name, n=1)", increase a counter
+#
+# 4-"drain()" and "merge(records)", records of the worker processes
+#
+# 5-"end_run()", write the summary in the log and print the summary table
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import atexit
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+# Metriche attive, SST_METRICS=0 le disattiva
+ENABLED=os.environ.get('SST_METRICS', '1').strip().lower() not in ('0', 'off', 'no', 'false')
+
+# Nome del file di log nella cartella delle immagini
+LOG_NAME='Pipeline_metrics.jsonl'
+
+# Stato della run del processo principale
+_run=None
+_timers={}          # name -> [count, total (s), max (s), peak RSS (MB)]
+_counters={}
+_records=[]         # record dei processi worker in attesa di merge
+
+_NULL_TIMER=contextlib.nullcontext()
+
+#==================================================================================
+
+def enable(flag=True):
+
+    """
+    Enable or disable the instrumentation of the current process.
+    """
+
+    global ENABLED
+
+    ENABLED=bool(flag)
+
+#==================================================================================
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+
+    """
+    Peak resident memory (MB) of the process (RUSAGE_SELF) or of its terminated children (RUSAGE_CHILDREN).
+    """
+
+    return resource.getrusage(who).ru_maxrss/1024.0
+
+#==================================================================================
+
+def _is_worker():
+
+    return multiprocessing.parent_process() is not None
+
+#==================================================================================
+
+def _write(record):
+
+    if _run is not None:
+        _run['log'].write(json.dumps(record)+'\n')
+
+#==================================================================================
+
+def start_run(script, path0, **params):
+
+    """
+    Start the run of a script: reset timers and counters and open the log file.
+    Input:
+    script = name of the script, path0 = folder of the images (log file LOG_NAME),
+    params = parameters of the run saved in the "start" record
+    """
+
+    global _run
+
+    if not ENABLED:
+        return
+
+    # Run precedente non chiusa (es. fase interrotta da un errore nello stesso processo)
+    if _run is not None:
+        end_run()
+
+    _timers.clear()
+    _counters.clear()
+
+    log_file=os.environ.get('SST_METRICS_LOG', os.path.join(path0, LOG_NAME))
+    _run={'script': script,
+          'id': script+'-'+str(os.getpid())+'-'+datetime.datetime.now().strftime('%Y%m%dT%H%M%S'),
+          'start': time.perf_counter(),
+          'log': open(log_file, 'a')}
+
+    _write({'event': 'start', 'run': _run['id'], 'script': script,
+            'time': datetime.datetime.now().isoformat(timespec='seconds'), 'params': params})
+
+    # Una sola registrazione anche con più run nello stesso processo
+    atexit.unregister(end_run)
+    atexit.register(end_run)
+
+#==================================================================================
+
+def add_time(name, seconds, frame=None, rss=None):
+
+    """
+    Add a measure of the stage name; with frame the measure is also written in the log.
+    """
+
+    if not ENABLED:
+        return
+
+    if rss is None:
+        rss=peak_rss_mb()
+
+    if _is_worker():
+        _records.append(('time', name, seconds, frame, rss))
+        return
+
+    t=_timers.get(name)
+    if t is None:
+        _timers[name]=[1, seconds, seconds, rss]
+    else:
+        t[0]+=1
+        t[1]+=seconds
+        t[2]=max(t[2], seconds)
+        t[3]=max(t[3], rss)
+
+    if frame is not None:
+        _write({'event': 'timer', 'run': _run['id'] if _run else None, 'name': name,
+                'frame': os.path.basename(str(frame)), 's': seconds, 'peak_rss_mb': rss})
+
+#==================================================================================
+
+@contextlib.contextmanager
+def _timed(name, frame):
+
+    t0=time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter()-t0, frame)
+
+#==================================================================================
+
+def timer(name, frame=None):
+
+    """
+    Context manager measuring the execution time of a stage, e.g.
+    with timer('read', file_to_open): ...
+    Input:
+    name = name of the stage, frame = optional frame (the measure is written in the log)
+    """
+
+    if not ENABLED:
+        return _NULL_TIMER
+
+    return _timed(name, frame)
+
+#==================================================================================
+
+def count(name, n=1):
+
+    """
+    Increase the counter name by n.
+    """
+
+    if not ENABLED:
+        return
+
+    if _is_worker():
+        _records.append(('count', name, n))
+        return
+
+    _counters[name]=_counters.get(name, 0)+n
+
+#==================================================================================
+
+def drain():
+
+    """
+    Records collected by a worker process since the last call, to be returned to the main process.
+    """
+
+    records=list(_records)
+    _records.clear()
+
+    return records
+
+#==================================================================================
+
+def merge(records):
+
+    """
+    Add to the current run the records of a worker process (output of drain).
+    """
+
+    for record in records or ():
+        if record[0] == 'time':
+            add_time(*record[1:])
+        else:
+            count(*record[1:])
+
+#==================================================================================
+
+def summary():
+
+    """
+    Summary of the current run.
+    Output:
+    dictionary with timers (count, total_s, mean_ms, max_ms, peak_rss_mb), counters and peak memory
+    """
+
+    timers={name: {'count': t[0], 'total_s': t[1], 'mean_ms': 1e3*t[1]/t[0], 'max_ms': 1e3*t[2],
+                   'peak_rss_mb': t[3]} for name, t in _timers.items()}
+
+    return {'timers': timers,
+            'counters': dict(_counters),
+            'wall_s': time.perf_counter()-_run['start'] if _run else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN)}
+
+#==================================================================================
+
+def end_run():
+
+    """
+    End the current run: write the summary record in the log and print the summary table.
+    """
+
+    global _run
+
+    if _run is None:
+        return
+
+    stats=summary()
+    _write({'event': 'summary', 'run': _run['id'], 'script': _run['script'], **stats})
+    _run['log'].close()
+
+    print('METRICS ' + _run['script'] + ': wall ' + format(stats['wall_s'], '.2f') + ' s, peak RSS ' +
+          format(stats['peak_rss_mb'], '.1f') + ' MB (workers ' + format(stats['children_peak_rss_mb'], '.1f') + ' MB)')
+    if stats['timers']:
+        print('%-16s %8s %10s %10s %10s %10s' % ('stage', 'count', 'total s', 'mean ms', 'max ms', 'peak MB'))
+        for name, t in stats['timers'].items():
+            print('%-16s %8d %10.3f %10.2f %10.2f %10.1f' % (name, t['count'], t['total_s'], t['mean_ms'],
+                  t['max_ms'], t['peak_rss_mb']))
+    if stats['counters']:
+        print('counters: ' + ', '.join(name+'='+str(n) for name, n in stats['counters'].items()))
+    print('')
+
+    _run=None
@@ -0,0 +1,480 @@
+# Python library for the vectorized computation of the ephemeris of the satellites with the SGP4 model.
+#
+# The SGP4 propagation and the topocentric coordinates are the same of "SGP4_Ephemeris.m" and of the
+# function "sgp4.m" of the folder SST_SGP4 (Spacetrack Report #3, adapted from Mahooti M., 2021):
+# position in the TEME system, observer on the WGS84 ellipsoid rotated with the Greenwich mean sidereal
+# time of "JD2GMST.m", topocentric RA and DEC of date. The transformation to J2000 is the one of
+# "EQ2EQ2000_B.m" (Boulet, 1991) used by "GEO_selector_astrometry_filter.m".
+#
+# Instead of one call per observation (reading the TLE file and propagating a single epoch each time)
+# all the epochs of all the satellites are propagated in one pass with array operations: either the grid
+# satellites x epochs or one satellite per epoch (e.g. the NORAD number of each streak measurement).
+#
+# The functions that can be used are:
+#
+# 1-"read_tle(tle_file)", elements of all the TLEs of a file (with or without the name lines)
+#
+# 2-"read_site(settings_file)", longitude, latitude and height of the observer from "Settings_BASP.txt"
+#
+# 3-"sgp4(elements, tsince)", TEME position (km) and velocity (km/s), vectorized
+#
+# 4-"closest_tle(elements, norad, mjd)", TLE of each observation with the epoch closest to the observation
+#
+# 5-"topocentric_radec(elements, mjd, site, norad=None)", topocentric RA and DEC of date (degree)
+#
+# 6-"eq2000(ar, dec, jd)", equatorial coordinates of date to J2000 (degree), from Sky_coordinates
+#
+# 7-"ephemeris_j2000(elements, mjd, site, norad=None, jd_ref=None)", topocentric RA and DEC J2000 (degree)
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import re
+
+import numpy as np
+
+from Sky_coordinates import eq2000
+
+# Costanti del modello SGP4 (come in sgp4.m)
+AE=1.0
+XJ3=-2.53881e-6
+E6A=1.0e-6
+XKMPER=6378.135                       # Raggio equatoriale terrestre (km)
+GE=398600.8                           # Costante gravitazionale terrestre (km^3/s^2)
+CK2=1.0826158e-3/2.0
+CK4=-3.0*-1.65597e-6/8.0
+XKE=np.sqrt(3600.0*GE/XKMPER**3)
+S0=AE+78.0/XKMPER
+QOMS2T=((AE+120.0/XKMPER-S0)**2)**2
+
+MINUTES_PER_DAY=1440.0
+
+# Ellissoide WGS84 per la posizione dell'osservatore
+WGS84_A=6378137.0                     # Semiasse maggiore (m)
+WGS84_F=1.0/298.257223563             # Schiacciamento
+
+# Epoca J2000.0
+JD_J2000=2451545.0
+
+#==================================================================================
+
+def tle_elements(line1, line2):
+
+    """
+    Elements of a two-line element set, read with the same columns of SGP4_Ephemeris.m.
+    Output:
+    dictionary with norad, epoch_mjd and the SGP4 elements xmo, xnodeo, omegao, xincl, eo, xno (rad/min),
+    bstar
+    """
+
+    year=int(line1[18:20])
+    doy=float(line1[20:32])
+    bstar=float(line1[53:59])*1e-5*10**int(line1[59:61])
+
+    # Epoca del TLE in MJD
+    year=year+2000 if year < 57 else year+1900
+    epoch_mjd=mjday(year, 1, 1)+doy-1.0
+
+    d2r=np.pi/180.0
+    return {'norad': int(line1[2:7]),
+            'epoch_mjd': epoch_mjd,
+            'xincl': float(line2[8:16])*d2r,
+            'xnodeo': float(line2[17:25])*d2r,
+            'eo': float('0.'+line2[26:33].strip()),
+            'omegao': float(line2[34:42])*d2r,
+            'xmo': float(line2[43:51])*d2r,
+            'xno': float(line2[52:63])*2*np.pi/MINUTES_PER_DAY,
+            'bstar': bstar}
+
+#==================================================================================
+
+def read_tle(tle_file):
+
+    """
+    Read all the TLEs of a file. The name lines (e.g. of celestrak) are skipped.
+    Output:
+    dictionary of arrays (see tle_elements), one element per TLE in the order of the file
+    """
+
+    with open(tle_file) as f:
+        lines=[line.rstrip() for line in f if line.strip()]
+
+    sets=[]
+    for k in range(len(lines)-1):
+        if lines[k].startswith('1 ') and lines[k+1].startswith('2 '):
+            sets.append(tle_elements(lines[k], lines[k+1]))
+    if not sets:
+        raise ValueError('No TLE found in ' + tle_file)
+
+    return {key: np.array([s[key] for s in sets]) for key in sets[0]}
+
+#==================================================================================
+
+def read_site(settings_file='Settings_BASP.txt'):
+
+    """
+    Longitude E (degree), latitude (degree) and height (m) of the observer, read as in BASP.m.
+    """
+
+    with open(settings_file) as f:
+        settings=re.split(r'\$+', f.read())
+
+    return float(settings[24].strip()), float(settings[27].strip()), float(settings[30].strip())
+
+#==================================================================================
+
+def mjday(year, month, day, hour=0, minute=0, sec=0.0):
+
+    """
+    Modified julian day of a date (years 1900-2100), vectorized version of Mjday.m.
+    """
+
+    year=np.asarray(year)
+    month=np.asarray(month)
+    jd=(367*year-np.floor((7*(year+np.floor((month+9)/12)))*0.25)+np.floor(275*month/9)+day+1721013.5+
+        ((sec/60.0+minute)/60.0+hour)/24.0)
+
+    return jd-2400000.5
+
+#==================================================================================
+
+def sgp4(elements, tsince):
+
+    """
+    SGP4 propagation of the satellites, vectorized version of sgp4.m.
+    Input:
+    elements = dictionary of arrays (see read_tle), broadcastable with tsince
+    tsince = minutes from the epoch of the TLE
+    Output:
+    pos, vel = TEME position (km) and velocity (km/s), arrays with shape tsince.shape+(3,)
+    """
+
+    xmo=elements['xmo']
+    xnodeo=elements['xnodeo']
+    omegao=elements['omegao']
+    xincl=elements['xincl']
+    eo=elements['eo']
+    xno=elements['xno']
+    bstar=elements['bstar']
+    tsince=np.asarray(tsince, dtype=float)
+
+    # Inizializzazione (dipende solo dagli elementi)
+    a1=(XKE/xno)**(2.0/3.0)
+    cosio=np.cos(xincl)
+    theta2=cosio**2
+    x3thm1=3.0*theta2-1.0
+    eosq=eo**2
+    betao2=1.0-eosq
+    betao=np.sqrt(betao2)
+    del1=1.5*CK2*x3thm1/(a1**2*betao*betao2)
+    ao=a1*(1.0-del1*((1.0/3.0)+del1*(1.0+(134.0/81.0)*del1)))
+    delo=1.5*CK2*x3thm1/(ao**2*betao*betao2)
+    xnodp=xno/(1.0+delo)
+    aodp=ao/(1.0-delo)
+
+    # Perigeo sotto 220 km: equazioni troncate
+    isimp=(aodp*(1.0-eo)/AE) < (220.0/XKMPER+AE)
+
+    # Perigeo sotto 156 km: s e qoms2t modificati
+    perige=(aodp*(1.0-eo)-AE)*XKMPER
+    s4=np.where(perige <= 98, 20.0, perige-78.0)
+    qoms24=np.where(perige < 156, ((120.0-s4)*AE/XKMPER)**4.0, QOMS2T)
+    s4=np.where(perige < 156, s4/XKMPER+AE, S0)
+
+    pinvsq=1.0/(aodp**2*betao2**2)
+    tsi=1.0/(aodp-s4)
+    eta=aodp*eo*tsi
+    etasq=eta**2
+    eeta=eo*eta
+    psisq=np.abs(1.0-etasq)
+    coef=qoms24*tsi**4.0
+    coef1=coef/psisq**3.5
+    c2=coef1*xnodp*(aodp*(1.0+1.5*etasq+eeta*(4.0+etasq))+0.75*CK2*tsi/psisq*x3thm1*(8.0+3.0*etasq*(8.0+etasq)))
+    c1=bstar*c2
+    sinio=np.sin(xincl)
+    a3ovk2=-XJ3/CK2*AE**3.0
+    # Orbite circolari (eo=0): termini nulli invece di NaN
+    circular=(eo == 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c3=np.where(circular, 0.0, coef*tsi*a3ovk2*xnodp*AE*sinio/eo)
+        xmcof=np.where(circular, 0.0, -(2.0/3.0)*coef*bstar*AE/eeta)
+    x1mth2=1.0-theta2
+    c4=2.0*xnodp*coef1*aodp*betao2*(eta*(2.0+0.5*etasq)+eo*(0.5+2.0*etasq)-2.0*CK2*tsi/(aodp*psisq)*
+       (-3.0*x3thm1*(1.0-2.0*eeta+etasq*(1.5-0.5*eeta))+0.75*x1mth2*(2.0*etasq-eeta*(1.0+etasq))*np.cos(2.0*omegao)))
+    c5=2.0*coef1*aodp*betao2*(1.0+2.75*(etasq+eeta)+eeta*etasq)
+    theta4=theta2**2
+    temp1=3.0*CK2*pinvsq*xnodp
+    temp2=temp1*CK2*pinvsq
+    temp3=1.25*CK4*pinvsq*pinvsq*xnodp
+    xmdot=xnodp+0.5*temp1*betao*x3thm1+0.0625*temp2*betao*(13.0-78.0*theta2+137.0*theta4)
+    x1m5th=1.0-5.0*theta2
+    omgdot=-0.5*temp1*x1m5th+0.0625*temp2*(7.0-114.0*theta2+395.0*theta4)+temp3*(3.0-36.0*theta2+49.0*theta4)
+    xhdot1=-temp1*cosio
+    xnodot=xhdot1+(0.5*temp2*(4.0-19.0*theta2)+2.0*temp3*(3.0-7.0*theta2))*cosio
+    omgcof=bstar*c3*np.cos(omegao)
+    xnodcf=3.5*betao2*xhdot1*c1
+    t2cof=1.5*c1
+    xlcof=0.125*a3ovk2*sinio*(3.0+5.0*cosio)/(1.0+cosio)
+    aycof=0.25*a3ovk2*sinio
+    delmo=(1.0+eta*np.cos(xmo))**3
+    sinmo=np.sin(xmo)
+    x7thm1=7.0*theta2-1.0
+    c1sq=c1**2
+    d2=4.0*aodp*tsi*c1sq
+    temp=d2*tsi*c1/3.0
+    d3=(17.0*aodp+s4)*temp
+    d4=0.5*temp*aodp*tsi*(221.0*aodp+31.0*s4)*c1
+    t3cof=d2+2.0*c1sq
+    t4cof=0.25*(3.0*d3+c1*(12.0*d2+10.0*c1sq))
+    t5cof=0.2*(3.0*d4+12.0*c1*d3+6.0*d2*d2+15.0*c1sq*(2.0*d2+c1sq))
+
+    # Termini secolari di gravità e resistenza atmosferica
+    xmdf=xmo+xmdot*tsince
+    omgadf=omegao+omgdot*tsince
+    xnoddf=xnodeo+xnodot*tsince
+    tsq=tsince**2
+    xnode=xnoddf+xnodcf*tsq
+    tcube=tsq*tsince
+    tfour=tsince*tcube
+    delm=np.where(isimp, 0.0, xmcof*((1.0+eta*np.cos(xmdf))**3.0-delmo))
+    temp=np.where(isimp, 0.0, omgcof*tsince+delm)
+    xmp=xmdf+temp
+    omega=omgadf-temp
+    tempa=1.0-c1*tsince-np.where(isimp, 0.0, d2*tsq+d3*tcube+d4*tfour)
+    tempe=bstar*c4*tsince+np.where(isimp, 0.0, bstar*c5*(np.sin(xmp)-sinmo))
+    templ=t2cof*tsq+np.where(isimp, 0.0, t3cof*tcube+tfour*(t4cof+tsince*t5cof))
+
+    a=aodp*tempa**2
+    e=eo-tempe
+    xl=xmp+omega+xnode+xnodp*templ
+    beta=np.sqrt(1.0-e**2)
+    xn=XKE/a**1.5
+
+    # Termini periodici di lungo periodo
+    axn=e*np.cos(omega)
+    temp=1.0/(a*beta**2)
+    xll=temp*xlcof*axn
+    aynl=temp*aycof
+    xlt=xl+xll
+    ayn=e*np.sin(omega)+aynl
+
+    # Equazione di Keplero, al massimo 10 iterazioni per elemento come in sgp4.m; come in sgp4.m i termini
+    # successivi usano seno e coseno dell'iterazione precedente all'ultima correzione
+    capu=np.mod(xlt-xnode, 2*np.pi)
+    capu, axn, ayn = np.broadcast_arrays(capu, axn, ayn)
+    epw=capu.copy()
+    sinepw=np.empty(capu.shape)
+    cosepw=np.empty(capu.shape)
+    active=np.ones(capu.shape, dtype=bool)
+    for i in range(10):
+        sin_k=np.sin(epw[active])
+        cos_k=np.cos(epw[active])
+        sinepw[active]=sin_k
+        cosepw[active]=cos_k
+        new=((capu[active]-ayn[active]*cos_k+axn[active]*sin_k-epw[active])/
+             (1.0-axn[active]*cos_k-ayn[active]*sin_k)+epw[active])
+        converged=np.abs(new-epw[active]) <= E6A
+        epw[active]=new
+        active[active]=~converged
+        if not active.any():
+            break
+
+    # Termini preliminari di corto periodo
+    temp3=axn*sinepw
+    temp4=ayn*cosepw
+    temp5=axn*cosepw
+    temp6=ayn*sinepw
+    ecose=temp5+temp6
+    esine=temp3-temp4
+    elsq=axn**2+ayn**2
+    temp=1.0-elsq
+    pl=a*temp
+    r=a*(1.0-ecose)
+    temp1=1.0/r
+    rdot=XKE*np.sqrt(a)*esine*temp1
+    rfdot=XKE*np.sqrt(pl)*temp1
+    temp2=a*temp1
+    betal=np.sqrt(temp)
+    temp3=1.0/(1.0+betal)
+    cosu=temp2*(cosepw-axn+ayn*esine*temp3)
+    sinu=temp2*(sinepw-ayn-axn*esine*temp3)
+    u=np.mod(np.arctan2(sinu, cosu), 2*np.pi)
+    sin2u=2.0*sinu*cosu
+    cos2u=2.0*cosu**2-1.0
+    temp=1.0/pl
+    temp1=CK2*temp
+    temp2=temp1*temp
+
+    # Termini di corto periodo
+    rk=r*(1.0-1.5*temp2*betal*x3thm1)+0.5*temp1*x1mth2*cos2u
+    uk=u-0.25*temp2*x7thm1*sin2u
+    xnodek=xnode+1.5*temp2*cosio*sin2u
+    xinck=xincl+1.5*temp2*cosio*sinio*cos2u
+    rdotk=rdot-xn*temp1*x1mth2*sin2u
+    rfdotk=rfdot+xn*temp1*(x1mth2*cos2u+1.5*x3thm1)
+
+    # Vettori di orientamento
+    mv=np.stack(np.broadcast_arrays(-np.sin(xnodek)*np.cos(xinck), np.cos(xnodek)*np.cos(xinck), np.sin(xinck)), axis=-1)
+    nv=np.stack(np.broadcast_arrays(np.cos(xnodek), np.sin(xnodek), np.zeros_like(xnodek)), axis=-1)
+    sinuk=np.sin(uk)[..., None]
+    cosuk=np.cos(uk)[..., None]
+    uv=mv*sinuk+nv*cosuk
+    vv=mv*cosuk-nv*sinuk
+
+    pos=rk[..., None]*uv*XKMPER
+    vel=(rdotk[..., None]*uv+rfdotk[..., None]*vv)*XKMPER/60.0
+
+    return pos, vel
+
+#==================================================================================
+
+def gmst_deg(jd):
+
+    """
+    Greenwich mean sidereal time (degree) of the julian days jd (UT), as JD2GMST.m.
+    """
+
+    jd=np.asarray(jd, dtype=float)
+    jd0=np.floor(jd)-0.5
+    jd0=np.where(jd > np.floor(jd)+0.5, np.floor(jd)+0.5, jd0)
+    h=(jd-jd0)*24.0
+    d=jd-JD_J2000
+    d0=jd0-JD_J2000
+    t=d/36525.0
+
+    return np.mod(6.697374558+0.06570982441908*d0+1.00273790935*h+0.000026*t**2, 24)*15.0
+
+#==================================================================================
+
+def observer_geocentric(site):
+
+    """
+    Geocentric latitude (rad) and distance from the center of the Earth (km) of the observer,
+    as geod2geoc and geocradius of SGP4_Ephemeris.m (WGS84).
+    Input:
+    site = (longitude E (degree), latitude (degree), height (m))
+    """
+
+    lat=np.radians(site[1])
+    h=site[2]
+
+    # Latitudine geocentrica del punto al suolo e raggio dell'ellissoide
+    ls=np.arctan((1.0-WGS84_F)**2*np.tan(lat))
+    rs=np.sqrt(WGS84_A**2/(1.0+(1.0/(1.0-WGS84_F)**2-1.0)*np.sin(ls)**2))
+
+    # Latitudine geocentrica alla quota h e raggio geocentrico della stazione (geocradius)
+    lat_geo=np.arctan((rs*np.sin(ls)+h*np.sin(lat))/(rs*np.cos(ls)+h*np.cos(lat)))
+    r_o=np.sqrt(WGS84_A**2/(1.0+(1.0/(1.0-WGS84_F)**2-1.0)*np.sin(lat_geo)**2))
+
+    return lat_geo, (r_o+h)/1000.0
+
+#==================================================================================
+
+def closest_tle(elements, norad, mjd):
+
+    """
+    For each observation, index of the TLE of the same satellite with the epoch closest to the observation.
+    Input:
+    elements = TLE elements (see read_tle), also several TLEs of the same satellite,
+    norad, mjd = arrays with NORAD number and epoch (MJD) of each observation
+    Output:
+    array of indices of elements, -1 where there is no TLE of the satellite
+    """
+
+    norad=np.asarray(norad)
+    mjd=np.broadcast_to(np.asarray(mjd, dtype=float), norad.shape)
+    k=np.full(norad.shape, -1)
+
+    for n in np.unique(norad):
+        idx=np.flatnonzero(elements['norad'] == n)
+        if len(idx) == 0:
+            continue
+        obs=(norad == n)
+        if len(idx) == 1:
+            k[obs]=idx[0]
+            continue
+
+        # Epoca precedente e successiva all'osservazione, si sceglie la più vicina
+        idx=idx[np.argsort(elements['epoch_mjd'][idx], kind='stable')]
+        epochs=elements['epoch_mjd'][idx]
+        j=np.clip(np.searchsorted(epochs, mjd[obs]), 1, len(idx)-1)
+        j=np.where(np.abs(epochs[j-1]-mjd[obs]) <= np.abs(epochs[j]-mjd[obs]), j-1, j)
+        k[obs]=idx[j]
+
+    return k
+
+#==================================================================================
+
+def _select(elements, mjd, norad):
+
+    # Elementi e tsince: griglia satelliti x epoche, oppure un satellite per ogni epoca
+    mjd=np.asarray(mjd, dtype=float)
+    if norad is None:
+        selected={key: value[:, None] for key, value in elements.items()}
+        mjd=np.broadcast_to(mjd, (len(elements['norad']),)+mjd.shape)
+    else:
+        norad=np.asarray(norad)
+        k=closest_tle(elements, norad, mjd)
+        if np.any(k < 0):
+            missing=np.unique(norad[k < 0])
+            raise KeyError('No TLE for NORAD ' + ', '.join(str(n) for n in missing))
+        selected={key: value[k] for key, value in elements.items()}
+
+    return selected, mjd
+
+#==================================================================================
+
+def topocentric_radec(elements, mjd, site, norad=None):
+
+    """
+    Topocentric RA and DEC of date of the satellites, as SGP4_Ephemeris.m.
+    Input:
+    elements = TLE elements (see read_tle), mjd = array of the epochs (MJD, UTC),
+    site = (longitude E (degree), latitude (degree), height (m)) of the observer,
+    norad = optional array of the NORAD number of each epoch (the TLE with the closest epoch is used)
+    Output:
+    AR, DEC (degree); shape (number of TLE, number of epochs) without norad, shape of mjd with norad
+    """
+
+    selected, mjd = _select(elements, mjd, norad)
+    tsince=(mjd-selected['epoch_mjd'])*MINUTES_PER_DAY
+    rteme, vteme = sgp4(selected, tsince)
+
+    # Coordinate rettangolari geocentriche dell'osservatore (km), ruotate con il tempo siderale
+    lat_geo, r_o = observer_geocentric(site)
+    ts_o=np.radians(site[0]+gmst_deg(mjd+2400000.5))
+    xo=r_o*np.cos(lat_geo)*np.cos(ts_o)
+    yo=r_o*np.cos(lat_geo)*np.sin(ts_o)
+    zo=r_o*np.sin(lat_geo)
+
+    # Coordinate rettangolari topocentriche del satellite
+    xs=rteme[..., 0]-xo
+    ys=rteme[..., 1]-yo
+    zs=rteme[..., 2]-zo
+    rho=np.sqrt(xs**2+ys**2+zs**2)
+
+    dec=np.degrees(np.arcsin(zs/rho))
+    ar=np.degrees(np.mod(np.arctan2(ys, xs), 2*np.pi))
+
+    return ar, dec
+
+#==================================================================================
+
+def ephemeris_j2000(elements, mjd, site, norad=None, jd_ref=None):
+
+    """
+    Topocentric RA and DEC J2000 of the satellites at all the epochs mjd (see topocentric_radec).
+    As in GEO_selector_astrometry_filter.m the equinox of date is the mean epoch of mjd, unless
+    jd_ref is given (a julian day, or 'each' for the epoch of every position).
+    Output:
+    AR2000, DEC2000 (degree)
+    """
+
+    ar, dec = topocentric_radec(elements, mjd, site, norad)
+
+    if jd_ref is None:
+        jd_ref=2400000.5+np.mean(mjd)
+    elif isinstance(jd_ref, str) and jd_ref == 'each':
+        jd_ref=2400000.5+np.asarray(mjd, dtype=float)
+
+    return eq2000(ar, dec, jd_ref)
@@ -12,8 +12,61 @@
 # A partire dalla versione del 6 luglio 2022 calcola le coordinate RA e DEC del centro 
 # della traccia usando una funzione della libreria "Track_best_fit.py". 
 #
+# Dalla versione del 17 ottobre 2026 l'header e le costanti WCS di ogni immagine vengono letti
+# una sola volta e condivisi da rilevazione, calcolo del centro delle tracce e scrittura dei risultati.
+# Le righe di "Data_headers_streaks.txt" sono scritte direttamente dai centri calcolati, senza
+# riaprire l'immagine per ogni traccia; il formato del file non cambia. Per ogni immagine viene
+# stampato il numero di aperture del file fits (incluse quelle fatte internamente da ASTRiDE), contate
+# sostituendo fits.open per tutto il processo durante l'elaborazione dell'immagine (non thread-safe).
+#
+# Con il parametro opzionale n_proc > 1 le immagini vengono elaborate in parallelo da n_proc processi.
+# I risultati vengono comunque scritti in "Data_headers_streaks.txt" nell'ordine delle immagini e
+# nello stesso formato letto da BASP.m. Se l'elaborazione di un'immagine fallisce, l'errore viene
+# stampato e l'immagine viene saltata senza interrompere l'analisi della notte.
+#
+# Gli output diagnostici di ASTRiDE (grafici png e file di testo nella cartella di ogni immagine) sono
+# separati dalla rilevazione: con il parametro opzionale diagnostics possono essere scritti subito,
+# in background, non scritti affatto (modalità veloce) oppure generati in seguito solo per le immagini
+# selezionate. Il file "streaks_center.txt" viene sempre scritto.
+#
+# Con il parametro opzionale center_method il centro delle tracce può essere calcolato anche con
+# il best fit della superellisse di "Track_best_fit.py" invece che con track_center2.
+#
+# I tempi di apertura, rilevazione, best fit, WCS e scrittura di ogni immagine (anche dei processi
+# paralleli) e i contatori di immagini e tracce sono registrati con "Pipeline_metrics.py" nel log
+# "Pipeline_metrics.jsonl" della cartella delle immagini (SST_METRICS=0 li disattiva).
+#
+# Le misure di ogni immagine sono registrate nel manifest della notte ("Night_manifest.py") con l'hash
+# dell'immagine WCS e i parametri soglia, area_cut e center_method. Rieseguendo lo script vengono
+# elaborate solo le immagini nuove o modificate (o tutte se cambiano i parametri) e "Data_headers_streaks.txt"
+# viene ricostruito con le misure salvate nel manifest: dopo un'interruzione l'analisi riparte dalla
+# prima immagine non registrata (SST_MANIFEST=0 le rielabora tutte).
+#
+# Dalla versione del 17 ottobre 2026 le misure di tutte le immagini sono salvate anche nella tabella
+# binaria "Data_streaks.fits" ("Streak_table.py"): AR e DEC in doppia precisione (senza il taglio a 37
+# caratteri del file di testo), centro delle tracce in pixel e qualità del contorno e del best fit.
+# "Data_headers_streaks.txt" e "streaks_center.txt" sono scritti dalle stesse misure, con il formato di sempre.
+#
+# Le immagini WCS possono essere fits compressi a tasselli ("Fits_io.py"): ASTRiDE legge solo fits normali
+# e riceve una copia temporanea decompressa dell'immagine; i suoi output diagnostici sono scritti nella
+# cartella dell'immagine, la stessa di "streaks_center.txt".
+#
+# Con il parametro opzionale roi la rilevazione è guidata dalle effemeridi del satellite dell'header (OBJECT):
+# con i TLE (catalogo locale "TLE_store.py" o file dei TLE) e le costanti WCS viene prevista la traccia del
+# satellite in ogni immagine ("Target_roi.py") e ASTRiDE analizza solo un ritaglio intorno alla traccia prevista,
+# con un margine che cresce con l'età del TLE e con la velocità apparente del satellite. Il tempo di rilevazione
+# scala con l'area del ritaglio e le tracce di altri satelliti fuori dal ritaglio non vengono misurate. Se la
+# previsione manca il bersaglio (nessun TLE, ritaglio fuori dall'immagine o nessuna traccia del ritaglio entro il
+# margine dalla traccia prevista) viene analizzata l'immagine intera, come senza roi. Gli output diagnostici di
+# ASTRiDE mostrano il solo ritaglio. Il contenuto del file dei TLE (o del catalogo locale) fa parte degli input
+# del manifest: aggiornando i TLE le immagini vengono rielaborate.
+# I tempi "detect_roi" e "detect" e i contatori roi_* delle metriche confrontano le due rilevazioni.
+#
+# Lo script può essere importato: "extract_sequence" esegue lo stesso lavoro della riga di comando
+# (vedi "SST_pipeline.py").
+#
 # Albino Carbognani, INAF-OAS
-# Versione del 4 Agosto 2022
+# Versione del 17 ottobre 2026
 
 # Import astropy.io library.
 from astropy.io import fits
@@ -30,114 +83,631 @@ import numpy as np
 # Importa libreria per input multipli da riga di comando
 import sys
 
+# Importa libreria per i record delle immagini nel manifest della notte
+import json
+
 # Importa libreria per lavorare con i path dei file
 import os.path
 
+# Importa libreria per il calcolo parallelo
+import multiprocessing
+
+# Importa libreria per la scrittura in background degli output diagnostici
+import queue
+
+# Importa libreria per il conteggio delle aperture dei file fits
+import contextlib
+
 # Importa funzione di best fit per le tracce
 import Track_best_fit as tbf
 
-# Parametri di input:
-#
-# Nome script, SST_Astride_TDM.py
-# path0, path della cartella con le immagini calibrate WCS (esempio: path0='/home/albino/Test/')
-# name = parte comune nome file fit (esempio: SST20201102_WCS_ )
-# ext = estensione (esempio: .fit)
-# Ni = numero iniziale immagine da analizzare (esempio: 112)
-# num_im = numero immagini da analizzare (esempio: 8)
-# soglia = soglia di sensibilità di ASTRiDE (1 per i satelliti deboli, 2 o 3 per quelli brillanti)
-# Esempio di input da riga di comando: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1
-
-print('                                                                      ')
-print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
-print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
-print('%               FITS.WCS2HEADERS.ARDEC - SST PROJECT OAS             %')
-print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
-print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
-print('%                                                                    %')
-print('%                  by Albino Carbognani (INAF-OAS)                   %')
-print('%                         Linux Version                              %')
-print('%                           Aug 2022                                 %')
-print('%                                                                    %')
-print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
-print('   \n')
-
-# Input dei dati da riga di comando
-nome_script, path0, name, ext, Ni, num_im, soglia=sys.argv  
-
-# Estrazione header e tracce dei satelliti dalle immagini WCS
-print('HEADERS AND STREAKS SATELLITES EXTRACTION   \n')
-
-with open(path0+'Data_headers_streaks.txt', 'w') as g:
-   for j in range(0, int(num_im)):
-
-        num_file=str(j+int(Ni))
-
-        file_to_open=path0+name+num_file+ext
-
-        # Verifica l'esistenza dell'immagine da cui estrarre le tracce
-        if os.path.isfile(file_to_open):
-
-              print('Extract satellite streak from ' + file_to_open + '\n')
-   
-              # Read a fits image and create a Streak instance.
-              #streak = Streak(file_to_open, area_cut=50, contour_threshold=3.0, shape_cut=0.07)
-              #streak = Streak(file_to_open, area_cut=700, shape_cut=0.40)
-              streak = Streak(file_to_open, area_cut=600, contour_threshold=float(soglia))
-
-              # Detect streaks.
-              streak.detect()
-   
-              # Write outputs and save figures.
-              streak.write_outputs() 
-              streak.plot_figures() 
-
-              # Save in a file the best fit coordinates RA and DEC of all the tracks
-              with open(path0 + name + num_file + '/streaks_center.txt', 'w') as ii:
-                  ii.write('#    RA (deg)        DEC (deg)   \n')
-                  N_tracks=len(streak.streaks) # Numero delle tracce rilevate nell'immagine
-                  head = fits.getheader(file_to_open)
-                  w = WCS(head)   # Legge costanti WCS nell'header dell'immagine
-                  if N_tracks >= 1:                  
-                      for jj in range(N_tracks):
-                          # Track inclination from ASTRiDE (radiant)
-                          theta=(streak.streaks[jj]['slope']) # Serve quando si usa la funzione tbf.track_center(x, y, phi)
-
-                          # Compute and save best fit coordinates of the tracks's center in RA and DEC
-                          X, Y = tbf.track_center2(streak.streaks[jj]['x'], streak.streaks[jj]['y'])
-                          ra, dec = w.wcs_pix2world(X, Y, 1)          # Trasforma da pixel a RA e DEC (gradi)
-                          coordinates=str(ra)+','+" "+str(dec)+'\n'   # Coordinate di best fit del centro tracce rivelate nell'immagine
-                          ii.write(coordinates) 
-           
-              # Estrazione delle coordinate delle tracce di tutti i satelliti trovati da ASTRiDE sull'immagine
-              path = path0 + name + num_file + '/streaks_center.txt' # Path del file con i dati del centro delle tracce
-              with open(path) as f:
-                    dati_streak = f.readline()
-                    while dati_streak:
-                          dati_streak = f.readline()
-                          coordinates2=dati_streak[0:37] # Estrazione AR e DEC (gradi) dalla n-esima riga del file streaks.txt
-                          
-                          # Se dati_streaks è una stringa vuota perché la traccia non è stata 
-                          # riconosciuta da ASTRiDE mette NaN in AR e DEC
-                          if not dati_streak:
-                                 coordinates2='NaN'+','+'\t'+'NaN' # il carattere \t equivale a un tab
-
-                          hdul = fits.open(file_to_open) # Legge header del file in modo da assegnare le stesse keys alle diverse tracce
-                          # Salva data e ora in Data_headers_streaks.txt
-                          g.write(hdul[0].header['DATE-OBS']+','+' ')
-                          # Salva nome oggetto in Data_headers_streaks.txt
-                          g.write(str(hdul[0].header['OBJECT'])+','+' ')
-                          # Salva tempo di esposizione (s) in Data_headers_streaks.txt
-                          g.write(str(hdul[0].header['EXPTIME'])+','+' ')
-                          # Save center coordinates satellite's streak (degree) in Data_headers_streaks.txt
-                          g.write(coordinates2 +'\n')
-                          
-
-        else:
+# Importa la libreria delle metriche della pipeline
+import Pipeline_metrics as pm
+
+# Importa la libreria del manifest della notte
+import Night_manifest as nm
+
+# Importa la libreria della tabella binaria delle tracce
+import Streak_table as st
+
+# Importa la libreria dei fits compressi
+import Fits_io as fio
+
+# Importa le librerie per la lettura degli header e per la regione di interesse del satellite
+import Fits_header_index as fhi
+import Target_roi as tr
+
+# Code e processo per la scrittura in background degli output diagnostici di ASTRiDE
+_diagnostics_queue=None
+_metrics_queue=None
+_diagnostics_process=None
+
+# Immagini in attesa degli output diagnostici in background: con la coda piena la rilevazione aspetta
+DIAGNOSTICS_QUEUE_SIZE=4
+
+# Area minima (pixel) dei contorni accettati da ASTRiDE
+AREA_CUT=600
+
+# Modalità di scrittura degli output diagnostici di ASTRiDE
+DIAGNOSTICS=('inline', 'background', 'off', 'only')
+
+# Funzioni di "Track_best_fit.py" per il calcolo del centro delle tracce
+CENTER_METHODS={'median2': tbf.track_center2,
+                'superellipse': lambda x, y: tbf.track_center_superellipse(x, y, method='lsq'),
+                'superellipse_grid': tbf.track_center_superellipse}
+
+#==================================================================================
+
+@contextlib.contextmanager
+def counting_opens(file_to_open):
+
+    """
+    Count the openings of the fits file file_to_open (or of its temporary copies, same name) in the block.
+    ASTRiDE calls fits.open through the astropy module and cannot be given another function, so
+    astropy.io.fits.open is temporarily replaced for the whole process during the block and restored
+    at the end: it is not thread-safe, the block must not run while other threads open fits files
+    (process_frame_safe runs in the main thread of the script or of a worker process).
+    Output:
+    dictionary with the number of openings in 'opens'
+    """
+
+    key=os.path.basename(file_to_open)
+    counter={'opens': 0}
+    open_function=fits.open
+
+    def fits_open(name, *args, **kwargs):
+        if os.path.basename(str(name)) == key:
+            counter['opens']+=1
+        return open_function(name, *args, **kwargs)
+
+    fits.open=fits_open
+    try:
+        yield counter
+    finally:
+        fits.open=open_function
+
+#==================================================================================
+
+def load_frame_header(file_to_open):
+
+    """
+    Read header and WCS of a frame with a single opening of the fits file.
+    Output:
+    head = header of the image (primary HDU or compressed image), w = WCS of the frame,
+    compressed = True if the image is tile compressed (see Fits_io.is_compressed)
+    """
+
+    with fits.open(file_to_open) as hdul:
+        hdu=fio.image_hdu(hdul)
+        head=fio.primary_header(hdu.header)
+        compressed=isinstance(hdu, fits.CompImageHDU)
+
+    return head, WCS(head), compressed
+
+#==================================================================================
+
+def streak_centers(streak, w, center_method='median2', frame=None, offset=(0, 0)):
+
+    """
+    Best fit coordinates of the center of all the tracks detected by ASTRiDE.
+    Input:
+    streak = ASTRiDE Streak after detect(), w = WCS of the frame,
+    center_method = name of the best fit function in CENTER_METHODS,
+    frame = optional name of the frame for the metrics log,
+    offset = (column, row) of the first pixel of the image analysed by ASTRiDE in the frame (cutout)
+    Output:
+    list of dictionaries, one per track, with the columns of Streak_table.STREAK_COLUMNS:
+    best fit center (pixel), RA and DEC (degree) and quality of the contour and of the fit
+    """
+
+    centers=[]
+    for jj in range(len(streak.streaks)):
+        track=streak.streaks[jj]
+        # Coordinate del contorno nell'immagine intera
+        x=track['x']+offset[0]
+        y=track['y']+offset[1]
+        # Compute best fit coordinates of the tracks's center in RA and DEC
+        with pm.timer('fit', frame):
+            X, Y = CENTER_METHODS[center_method](x, y)
+        with pm.timer('wcs', frame):
+            ra, dec = w.wcs_pix2world(X, Y, 1)          # Trasforma da pixel a RA e DEC (gradi)
+
+        # Distanza fra il centro del best fit e il centro del contorno di ASTRiDE
+        x_center=track.get('x_center', np.mean(track['x']))+offset[0]
+        y_center=track.get('y_center', np.mean(track['y']))+offset[1]
+        centers.append({'x': float(X), 'y': float(Y), 'ra': float(ra), 'dec': float(dec),
+                        'area': track.get('area', np.nan), 'shape_factor': track.get('shape_factor', np.nan),
+                        'radius_deviation': track.get('radius_deviation', np.nan), 'n_points': len(x),
+                        'fit_offset': float(np.hypot(X-x_center, Y-y_center))})
+
+    return centers
+
+#==================================================================================
+
+def run_astride(file_to_open, image_file, soglia):
+
+    """
+    ASTRiDE detection on image_file, the WCS frame file_to_open or a temporary copy of it
+    (plain copy of a compressed frame or cutout). The outputs of ASTRiDE are always in the folder of the frame.
+    Output:
+    ASTRiDE Streak after detect()
+    """
+
+    # Read a fits image and create a Streak instance.
+    #streak = Streak(file_to_open, area_cut=50, contour_threshold=3.0, shape_cut=0.07)
+    #streak = Streak(file_to_open, area_cut=700, shape_cut=0.40)
+    if image_file == file_to_open:
+        streak = Streak(file_to_open, area_cut=AREA_CUT, contour_threshold=float(soglia))
+    else:
+        output_path=os.path.splitext(file_to_open)[0]+'/'
+        streak = Streak(image_file, area_cut=AREA_CUT, contour_threshold=float(soglia), output_path=output_path)
+
+    # Detect streaks.
+    streak.detect()
+
+    return streak
+
+#==================================================================================
+
+def detect_roi(file_to_open, soglia, head, w, prediction):
+
+    """
+    ASTRiDE detection in the cutout around the predicted streak of the target (see Target_roi.py).
+    Input:
+    file_to_open = WCS frame, soglia = ASTRiDE contour threshold, head, w = header and WCS of the frame,
+    prediction = predicted positions of the target (see Target_roi.predict_frames)
+    Output:
+    streak = ASTRiDE Streak after detect(), None if the prediction misses (no cutout, or no streak of the cutout
+    within the margin of the predicted streak),
+    offset = (column, row) of the first pixel of the cutout in the frame
+    """
+
+    track=tr.pixel_track(prediction, w)
+    margin=None if track is None else tr.roi_margin(prediction, track, w)
+    box=None if track is None else tr.roi_box(track, margin, (head['NAXIS2'], head['NAXIS1']))
+    if box is None:
+        pm.count('roi_full_frame')
+        return None, (0, 0)
+
+    with pm.timer('detect_roi', file_to_open), tr.cutout_file(file_to_open, box) as cutout:
+        streak=run_astride(file_to_open, cutout, soglia)
+
+    # La previsione è confermata solo da una traccia entro il margine dalla traccia prevista
+    # (coordinate del ritaglio di ASTRiDE riportate all'immagine, origine 0 come pixel_track)
+    x=[s.get('x_center', np.mean(s['x']))+box[2] for s in streak.streaks]
+    y=[s.get('y_center', np.mean(s['y']))+box[0] for s in streak.streaks]
+    if not np.any(tr.track_distance(track, x, y) <= margin):
+        pm.count('roi_fallbacks')
+        return None, (0, 0)
+
+    pm.count('roi_frames')
+    pm.count('roi_pixels', (box[1]-box[0])*(box[3]-box[2]))
+    pm.count('frame_pixels', head['NAXIS1']*head['NAXIS2'])
+
+    return streak, (box[2], box[0])
+
+#==================================================================================
+
+def detect_frame(file_to_open, soglia, center_method='median2', prediction=None):
+
+    """
+    ASTRiDE detection and best fit center of the tracks of a WCS frame, kept in memory.
+    With the prediction of the target only the cutout around the predicted streak is analysed,
+    the whole frame if the prediction misses (see detect_roi).
+    Input:
+    file_to_open = WCS frame, soglia = ASTRiDE contour threshold,
+    center_method = name of the best fit function in CENTER_METHODS,
+    prediction = optional predicted positions of the target (see Target_roi.predict_frames)
+    Output:
+    head = header of the frame, streak = ASTRiDE Streak after detect(),
+    record = measurements of the frame (see Streak_table.frame_record)
+    """
+
+    # Header e costanti WCS letti una sola volta per immagine
+    with pm.timer('open', file_to_open):
+        head, w, compressed = load_frame_header(file_to_open)
+
+    streak, offset = (None, (0, 0)) if prediction is None else detect_roi(file_to_open, soglia, head, w, prediction)
+
+    # Immagine intera. Un'immagine compressa viene letta da ASTRiDE in una copia temporanea
+    if streak is None:
+        with pm.timer('detect', file_to_open), fio.plain_file(file_to_open, compressed=compressed) as plain_file:
+            streak=run_astride(file_to_open, plain_file, soglia)
+
+    # Best fit coordinates RA and DEC of all the tracks
+    centers=streak_centers(streak, w, center_method, file_to_open, offset)
+    pm.count('streaks', len(centers))
+
+    return head, streak, st.frame_record(os.path.basename(file_to_open), head, centers)
+
+#==================================================================================
+
+def write_diagnostics(streak):
+
+    """
+    ASTRiDE diagnostic outputs of a frame: text outputs and png figures in the frame folder.
+    """
+
+    # Write outputs and save figures.
+    with pm.timer('diagnostics'):
+        streak.write_outputs() 
+        streak.plot_figures() 
+
+#==================================================================================
+
+def diagnostics_worker(diagnostics_queue, metrics_queue):
+
+    """
+    Background process rendering the diagnostic outputs of the frames put in diagnostics_queue
+    as tuples (file_to_open, streak), so that pyplot is used only in the main thread of a process.
+    A None in the queue stops the process, which puts its metrics records in metrics_queue.
+    A failure in the diagnostics of a frame is only printed.
+    """
+
+    item=diagnostics_queue.get()
+    while item is not None:
+        try:
+            write_diagnostics(item[1])
+        except Exception as exc:
+            print('ERROR in diagnostics of ' + item[0] + ': ' + type(exc).__name__ + ': ' + str(exc) + '\n')
+        item=diagnostics_queue.get()
+
+    metrics_queue.put(pm.drain())
+
+#==================================================================================
+
+def queue_diagnostics(file_to_open, streak):
+
+    """
+    Put a frame in the queue of the background process (None stops the process). While the queue is full
+    the detection waits (at most DIAGNOSTICS_QUEUE_SIZE frames in memory); if the process has stopped
+    the outputs are written immediately.
+    """
+
+    item=None if file_to_open is None else (file_to_open, streak)
+    while _diagnostics_process.is_alive():
+        try:
+            _diagnostics_queue.put(item, timeout=1.0)
+            return
+        except queue.Full:
+            continue
+
+    if item is not None:
+        write_diagnostics(streak)
+
+#==================================================================================
+
+def process_frame(file_to_open, soglia, output_dir, diagnostics='inline', center_method='median2', prediction=None):
+
+    """
+    Streak extraction from a WCS frame: ASTRiDE detection, best fit center of the tracks
+    and "streaks_center.txt" in output_dir. The diagnostic outputs of ASTRiDE are written
+    according to diagnostics: 'inline' (immediately), 'background' (queued to the background
+    process, see start_diagnostics) or 'off' (not written).
+    Input:
+    file_to_open = WCS frame, soglia = ASTRiDE contour threshold, output_dir = folder of the frame outputs,
+    prediction = optional predicted positions of the target (see detect_frame)
+    Output:
+    measurements of the frame (see Streak_table.frame_record)
+    """
+
+    head, streak, record = detect_frame(file_to_open, soglia, center_method, prediction)
+
+    if diagnostics == 'inline':
+        write_diagnostics(streak)
+    elif diagnostics == 'background' and _diagnostics_queue is not None:
+        queue_diagnostics(file_to_open, streak)
+    elif diagnostics == 'background':
+        write_diagnostics(streak)
+
+    # Save in a file the best fit coordinates RA and DEC of all the tracks
+    with pm.timer('write', file_to_open):
+        os.makedirs(output_dir, exist_ok=True)
+        with open(output_dir + '/streaks_center.txt', 'w') as ii:
+            ii.writelines(st.center_lines(record))
+
+    # Data e ora, nome oggetto, tempo di esposizione (s) e misure delle tracce
+    return record
+
+#==================================================================================
+
+def start_diagnostics():
+
+    """
+    Start the background process for the diagnostic outputs of the current process,
+    with a queue of at most DIAGNOSTICS_QUEUE_SIZE frames.
+    """
+
+    global _diagnostics_queue, _metrics_queue, _diagnostics_process
+
+    _diagnostics_queue=multiprocessing.Queue(DIAGNOSTICS_QUEUE_SIZE)
+    _metrics_queue=multiprocessing.Queue()
+    _diagnostics_process=multiprocessing.Process(target=diagnostics_worker, args=(_diagnostics_queue, _metrics_queue))
+    _diagnostics_process.start()
+
+#==================================================================================
+
+def stop_diagnostics():
+
+    """
+    Wait until all the queued diagnostic outputs are written and stop the background process.
+    Its metrics records are added to the current run.
+    """
+
+    global _diagnostics_queue, _metrics_queue, _diagnostics_process
+
+    if _diagnostics_queue is None:
+        return
+
+    queue_diagnostics(None, None)
+    while _diagnostics_process.is_alive() or not _metrics_queue.empty():
+        try:
+            pm.merge(_metrics_queue.get(timeout=1.0))
+            break
+        except queue.Empty:
+            continue
+    _diagnostics_process.join()
+    _diagnostics_queue=None
+    _metrics_queue=None
+    _diagnostics_process=None
+
+#==================================================================================
+
+def render_diagnostics(frames, soglia):
+
+    """
+    Write on demand the ASTRiDE diagnostic outputs of the selected frames only,
+    without changing "Data_headers_streaks.txt".
+    Input:
+    frames = list of tuples (WCS frame, output folder of the frame), soglia = ASTRiDE contour threshold
+    """
+
+    for file_to_open, output_dir in frames:
+        print('Diagnostic outputs for ' + file_to_open + '\n')
+        head, streak, record = detect_frame(file_to_open, soglia)
+        write_diagnostics(streak)
+
+#==================================================================================
+
+def process_frame_safe(args):
+
+    """
+    Run process_frame isolating the failures: an exception in a frame is returned as a message
+    instead of stopping the night. Used both sequentially and by the worker processes.
+    Input:
+    args = (file_to_open, soglia, output_dir, diagnostics, center_method[, prediction])
+    Output:
+    (file_to_open, measurements of the frame (see Streak_table.frame_record) or None,
+    error message or None, fits opens of the frame, metrics records of the worker process, see Pipeline_metrics.drain)
+    """
+
+    file_to_open=args[0]
+    with counting_opens(file_to_open) as counter:
+        try:
+            record=process_frame(*args)
+            error=None
+        except Exception as exc:
+            record=None
+            error=type(exc).__name__+': '+str(exc)
+
+    return file_to_open, record, error, counter['opens'], pm.drain()
+
+#==================================================================================
+
+def extract_streaks(frames, soglia, data_file, n_proc=1, diagnostics='inline', center_method='median2', roi='off'):
+
+    """
+    Extract the streaks from the frames and write data_file ("Data_headers_streaks.txt").
+    With n_proc > 1 the frames are processed by n_proc worker processes; the results are
+    written in the order of the frames list as soon as they are available.
+    A frame that fails is logged and skipped. The frames recorded in the night manifest with the same
+    input frame, soglia, AREA_CUT and center_method (and with roi the same TLE file or TLE store) are not
+    processed again: their measurements are taken from the manifest (and their diagnostic outputs are not
+    written again).
+    The measurements of all the frames are also saved in the binary table "Data_streaks.fits"
+    (see Streak_table.py) in the folder of data_file.
+    With diagnostics='background' the ASTRiDE outputs are rendered by a background process while the
+    detection goes on; in the parallel mode they are rendered by the worker processes themselves.
+    With roi the positions of the target of all the frames to be processed are predicted before the
+    detection (see Target_roi.predict_frames) and ASTRiDE analyses the cutout around the predicted streak.
+    Input:
+    frames = list of tuples (WCS frame, output folder of the frame)
+    soglia = ASTRiDE contour threshold, n_proc = number of processes
+    diagnostics = 'inline', 'background' or 'off' (see process_frame)
+    center_method = name of the best fit function in CENTER_METHODS
+    roi = 'off' (whole frames), 'store' (TLEs of the local TLE store) or TLE file of the targets
+    Output:
+    list of the frames that failed
+    """
+
+    # Immagini già elaborate con gli stessi parametri, le cui righe sono prese dal manifest della notte
+    path0=os.path.dirname(os.path.abspath(data_file))
+    params={'soglia': float(soglia), 'area_cut': AREA_CUT, 'center_method': center_method, 'format': st.VERSION}
+    tle_inputs=[]
+    if roi != 'off':
+        params['roi']=roi
+        tle_inputs=tr.tle_files(roi)
+    cached={}
+    for file_to_open, output_dir in frames:
+        result=nm.lookup(path0, 'streaks', os.path.basename(file_to_open), [file_to_open]+tle_inputs, params)
+        if result is not None:
+            cached[file_to_open]=json.loads(result)
+
+    # Posizioni previste del satellite di tutte le immagini da elaborare, in un solo calcolo
+    predictions={}
+    if roi != 'off':
+        todo=[file_to_open for file_to_open, output_dir in frames if file_to_open not in cached]
+        with pm.timer('predict'):
+            predictions=dict(zip(todo, tr.predict_frames([fhi.read_header(f) for f in todo], roi)))
+        n_predicted=sum(prediction is not None for prediction in predictions.values())
+        print('Predicted position of the target in ' + str(n_predicted) + ' of ' + str(len(todo)) + ' frames\n')
+        pm.count('roi_no_prediction', len(todo)-n_predicted)
+
+    jobs=[(file_to_open, soglia, output_dir, diagnostics, center_method, predictions.get(file_to_open))
+          for file_to_open, output_dir in frames if file_to_open not in cached]
+    failed=[]
+    records=[]
+
+    if n_proc > 1 and len(jobs) > 1:
+        pool=multiprocessing.Pool(n_proc)
+        results=pool.imap(process_frame_safe, jobs, chunksize=1)
+    else:
+        pool=None
+        results=map(process_frame_safe, jobs)
+        if diagnostics == 'background':
+            start_diagnostics()
+
+    try:
+        with open(data_file, 'w') as g:
+            for frame, output_dir in frames:
+                if frame in cached:
+                    print('Satellite streak of ' + frame + ' from the night manifest\n')
+                    g.writelines(st.legacy_lines(cached[frame]))
+                    records.append(cached[frame])
+                    pm.count('cached_frames')
+                    continue
+                file_to_open, record, error, n_opens, metrics = next(results)
+                pm.merge(metrics)
+                print('Extract satellite streak from ' + file_to_open + '\n')
+                if error is not None:
+                    print('ERROR in ' + file_to_open + ': ' + error + ', frame skipped\n')
+                    failed.append(file_to_open)
+                    pm.count('failed_frames')
+                    continue
+                g.writelines(st.legacy_lines(record))
+                records.append(record)
+                nm.record(path0, 'streaks', os.path.basename(file_to_open), [file_to_open]+tle_inputs, params,
+                          [output_dir+'/streaks_center.txt'], json.dumps(record))
+                pm.count('frames')
+                print('FITS opens for ' + os.path.basename(file_to_open) + ': ' + str(n_opens) + '\n')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        stop_diagnostics()
+
+    # Tabella binaria delle misure di tutte le immagini, nello stesso ordine di data_file
+    with pm.timer('table'):
+        st.write_table(os.path.join(path0, st.TABLE_NAME), records)
+
+    return failed
+
+#==================================================================================
+
+def extract_sequence(path0, name, ext, Ni, num_im, soglia, n_proc=1, diagnostics='inline', center_method='median2',
+                     roi='off'):
+
+    """
+    Extract the satellite streaks of the WCS frames name+NNN+ext, Ni <= NNN < Ni+num_im, of the folder path0
+    and write "Data_headers_streaks.txt" (missing frames are skipped).
+    Input:
+    path0 = folder of the frames, name, ext = common part of the file names and extension,
+    Ni, num_im = first frame number and number of frames, soglia = threshold of ASTRiDE,
+    n_proc = number of processes, diagnostics = one of DIAGNOSTICS, center_method = one of CENTER_METHODS,
+    roi = 'off', 'store' or TLE file (see extract_streaks)
+    Output:
+    list of the frames skipped because of errors
+    """
+
+    if diagnostics not in DIAGNOSTICS:
+         raise ValueError('Unknown diagnostics mode ' + diagnostics + ', use one of: ' + ', '.join(DIAGNOSTICS))
+    if center_method not in CENTER_METHODS:
+         raise ValueError('Unknown center method ' + center_method + ', use one of: ' + ', '.join(CENTER_METHODS))
+    if roi not in ('off', 'store') and not os.path.isfile(roi):
+         raise ValueError('Unknown region of interest mode ' + roi + ', use off, store or a TLE file')
+
+    pm.start_run('SST_Astride_TDM', path0, name=name, ext=ext, Ni=Ni, num_im=num_im, soglia=soglia,
+                 n_proc=n_proc, diagnostics=diagnostics, center_method=center_method, roi=roi)
+
+    # Estrazione header e tracce dei satelliti dalle immagini WCS
+    print('HEADERS AND STREAKS SATELLITES EXTRACTION   \n')
+
+    frames=[]
+    for j in range(0, int(num_im)):
+
+         num_file=str(j+int(Ni))
+
+         file_to_open=path0+name+num_file+ext
+
+         # Verifica l'esistenza dell'immagine da cui estrarre le tracce
+         if os.path.isfile(file_to_open):
+              frames.append((file_to_open, path0 + name + num_file))
+         else:
               print(file_to_open + ' does not exist ' + '\n')
+              pm.count('skipped_files')
               continue # Se il file non esiste passa a quello successivo
- 
-# Chiusura del file Data_headers_streaks.txt con keys header e coordinate del centro delle tracce dei satelliti
-g.close()
 
+    # Solo output diagnostici delle immagini selezionate
+    if diagnostics == 'only':
+         render_diagnostics(frames, soglia)
+         pm.end_run()
+         return []
+
+    failed=extract_streaks(frames, soglia, path0+'Data_headers_streaks.txt', n_proc, diagnostics, center_method, roi)
+
+    if failed:
+         print(str(len(failed)) + ' frames skipped because of errors: ' + ' '.join(failed) + '\n')
+
+    pm.end_run()
+
+    return failed
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Parametri di input:
+    #
+    # Nome script, SST_Astride_TDM.py
+    # path0, path della cartella con le immagini calibrate WCS (esempio: path0='/home/albino/Test/')
+    # name = parte comune nome file fit (esempio: SST20201102_WCS_ )
+    # ext = estensione (esempio: .fit)
+    # Ni = numero iniziale immagine da analizzare (esempio: 112)
+    # num_im = numero immagini da analizzare (esempio: 8)
+    # soglia = soglia di sensibilità di ASTRiDE (1 per i satelliti deboli, 2 o 3 per quelli brillanti)
+    # n_proc = (opzionale) numero di processi paralleli per la rilevazione delle tracce (default 1)
+    # diagnostics = (opzionale) output diagnostici di ASTRiDE (png e file di testo nella cartella dell'immagine):
+    #               inline = scritti subito (default), background = scritti da un processo in background,
+    #               off = non scritti, only = scrive solo gli output diagnostici delle immagini selezionate
+    #               senza modificare "Data_headers_streaks.txt"
+    # center_method = (opzionale) metodo per il centro delle tracce: median2 = track_center2 (default),
+    #                 superellipse = superellisse con fit ai minimi quadrati, superellipse_grid = superellisse
+    #                 con la ricerca a griglia originale
+    # roi = (opzionale) rilevazione nella regione di interesse del satellite dell'header: off = immagine intera
+    #       (default), store = TLE del catalogo locale ("TLE_store.py"), oppure file dei TLE
+    # Esempio di input da riga di comando: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1
+    # Esempio con 8 processi: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1 8
+    # Esempio senza output diagnostici: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1 8 off
+    # Esempio con il centro da superellisse: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1 8 off superellipse
+    # Esempio con la regione di interesse dai TLE del catalogo locale: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8 1 8 off median2 store
+    # Esempio con i grafici della sola immagine 115: > python3 SST_Astride_TDM.py /home/albino/Test/ SST20201102_WCS_ .fit 115 1 1 1 only
+
+    print('                                                                      ')
+    print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
+    print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
+    print('%               FITS.WCS2HEADERS.ARDEC - SST PROJECT OAS             %')
+    print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
+    print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
+    print('%                                                                    %')
+    print('%                  by Albino Carbognani (INAF-OAS)                   %')
+    print('%                         Linux Version                              %')
+    print('%                           Oct 2026                                 %')
+    print('%                                                                    %')
+    print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
+    print('   \n')
+
+    # Input dei dati da riga di comando
+    nome_script, path0, name, ext, Ni, num_im, soglia=sys.argv[0:7]
+    n_proc=int(sys.argv[7]) if len(sys.argv) > 7 else 1
+    diagnostics=sys.argv[8] if len(sys.argv) > 8 else 'inline'
+    center_method=sys.argv[9] if len(sys.argv) > 9 else 'median2'
+    roi=sys.argv[10] if len(sys.argv) > 10 else 'off'
 
+    if diagnostics not in DIAGNOSTICS:
+         sys.exit('Unknown diagnostics mode ' + diagnostics + ', use one of: ' + ', '.join(DIAGNOSTICS))
+    if center_method not in CENTER_METHODS:
+         sys.exit('Unknown center method ' + center_method + ', use one of: ' + ', '.join(CENTER_METHODS))
+    if roi not in ('off', 'store') and not os.path.isfile(roi):
+         sys.exit('Unknown region of interest mode ' + roi + ', use off, store or a TLE file')
 
+    extract_sequence(path0, name, ext, Ni, num_im, soglia, n_proc, diagnostics, center_method, roi)
@@ -0,0 +1,353 @@
+# Python script for the association of the satellite streaks to the predicted positions of the satellites.
+#
+# GEO_selector_astrometry_filter.m picks the target GEO of a "flottiglia" (group of co-located GEO satellites)
+# comparing each observation with the ephemeris of the satellite in the header, one pair at a time.
+# This script reads the streaks of "Data_streaks.fits" (written by SST_Astride_TDM.py with RA and DEC in double
+# precision, see Streak_table.py) or of "Data_headers_streaks.txt" if the table is missing, groups them
+# per frame (epoch at the middle of the exposure, as in BASP.m) and computes with "SGP4_ephemeris.py" the
+# topocentric J2000 positions of all the candidate satellites at all the epochs in one pass. For each epoch
+# the predicted positions are indexed with a k-d tree of the unit vectors on the sphere: only the pairs
+# streak-satellite closer than the gating radius are found (no comparison of every streak with every
+# satellite) and each streak is labelled with the nearest satellite, one streak per satellite per frame.
+# The streaks without a satellite within the gating radius are left unlabelled (NORAD 0).
+#
+# The labelled measurements are saved in "Data_streaks_associated.txt", one line per streak:
+# date, NORAD of the header, exposure (s), AR and DEC of the streak (degree), NORAD of the associated
+# satellite (0 if none), distance from the predicted position (arcsec, NaN if none).
+#
+# The candidates are all the TLEs of a file (e.g. the GEO catalogue of celestrak, name lines optional)
+# or all the satellites of the local TLE store ("TLE_store.py") with a TLE not stale during the night.
+# With dmw=1 (as the option DMW of BASP.m) the streaks inside the Milky Way belt are removed before the
+# association with the bulk filter of "Sky_coordinates.py" (dmw=2 removes also the winter Milky Way).
+#
+# Parametri di input:
+#
+# Nome script, SST_association.py
+# path0, path della cartella con "Data_streaks.fits" o "Data_headers_streaks.txt" (esempio: path0='/home/albino/Test/')
+# tle = file dei TLE dei satelliti candidati, oppure "store" per il catalogo locale dei TLE
+# gate = (opzionale) raggio di associazione in arcsec (default 120)
+# dmw = (opzionale) 1 elimina le tracce nella Via Lattea, 2 anche nella Via Lattea invernale, 0 no (default 0)
+# Esempio di input da riga di comando: > python3 SST_association.py /home/albino/Test/ geo.txt 120
+# Esempio con il catalogo locale: > python3 SST_association.py /home/albino/Test/ store
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import os
+import sys
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Importa le librerie della pipeline
+import Pipeline_metrics as pm
+import SGP4_ephemeris as se
+import Sky_coordinates as sc
+import Streak_table as st
+
+# File di input e di output nella cartella delle immagini
+STREAKS_NAME='Data_headers_streaks.txt'
+OUTPUT_NAME='Data_streaks_associated.txt'
+
+# Raggio di associazione di default (arcsec)
+GATE_ARCSEC=120.0
+
+# Cartella degli script della pipeline (con "Settings_BASP.txt")
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+#==================================================================================
+
+def read_streaks(file_to_open):
+
+    """
+    Streaks of "Data_headers_streaks.txt"; the lines without coordinates (NaN) are skipped.
+    Output:
+    dictionary of arrays: date (string), norad (header), exposure (s), ra, dec (degree),
+    mjd (middle of the exposure, UTC)
+    """
+
+    rows=[]
+    with open(file_to_open) as f:
+        for line in f:
+            fields=[field.strip() for field in line.split(',')]
+            if len(fields) < 5 or fields[3] == 'NaN' or fields[4] == 'NaN':
+                continue
+            rows.append(fields)
+
+    date=np.array([row[0] for row in rows], dtype=str)
+    streaks={'date': date,
+             'norad': np.array([int(row[1]) for row in rows], dtype=int),
+             'exposure': np.array([float(row[2]) for row in rows]),
+             'ra': np.array([float(row[3]) for row in rows]),
+             'dec': np.array([float(row[4]) for row in rows])}
+
+    streaks['mjd']=mid_exposure(date, streaks['exposure'])
+
+    return streaks
+
+#==================================================================================
+
+def read_streaks_table(file_to_open):
+
+    """
+    Streaks of the binary table "Data_streaks.fits" (Streak_table.py), with RA and DEC in double precision.
+    The header keys are converted once per frame.
+    Output:
+    see read_streaks
+    """
+
+    frames, table = st.read_table(file_to_open)
+    frame=table['frame_id']
+
+    norad=np.array([int(obj) for obj in frames['object']], dtype=int)
+    mjd=mid_exposure(frames['date_obs'], frames['exptime'])
+
+    streaks={'date': table['date_obs'],
+             'norad': norad[frame],
+             'exposure': table['exptime'],
+             'ra': table['ra'],
+             'dec': table['dec'],
+             'mjd': mjd[frame]}
+
+    return streaks
+
+#==================================================================================
+
+def mid_exposure(date, exposure):
+
+    """
+    MJD (UTC) of the middle of the exposures.
+    Input:
+    date = array of DATE-OBS strings, start of the exposure (yyyy-mm-ddTHH:MM:SS.sss), exposure = exposure time (s)
+    """
+
+    # Data e ora di inizio esposizione e tempo medio dell'esposizione
+    year=np.array([int(d[0:4]) for d in date], dtype=int)
+    month=np.array([int(d[5:7]) for d in date], dtype=int)
+    day=np.array([int(d[8:10]) for d in date], dtype=int)
+    hour=np.array([int(d[11:13]) for d in date], dtype=int)
+    minute=np.array([int(d[14:16]) for d in date], dtype=int)
+    sec=np.array([float(d[17:]) for d in date])
+
+    return se.mjday(year, month, day, hour, minute, sec+np.asarray(exposure, dtype=float)/2)
+
+#==================================================================================
+
+def unit_vectors(ra, dec):
+
+    """
+    Unit vectors on the celestial sphere of the coordinates ra, dec (degree).
+    """
+
+    ra=np.radians(ra)
+    dec=np.radians(dec)
+
+    return np.stack((np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)), axis=-1)
+
+#==================================================================================
+
+def associate_epoch(pred_ra, pred_dec, obs_ra, obs_dec, gate_arcsec=GATE_ARCSEC):
+
+    """
+    Association of the streaks of one frame to the predicted positions of the satellites.
+    The pairs closer than the gating radius are found with a k-d tree and assigned from the closest one,
+    so that each streak and each satellite are used at most once.
+    Input:
+    pred_ra, pred_dec = predicted positions of the satellites (degree), obs_ra, obs_dec = streaks (degree)
+    Output:
+    index of the satellite of each streak (-1 if none), distance (arcsec, NaN if none)
+    """
+
+    sat=np.full(len(obs_ra), -1)
+    offset=np.full(len(obs_ra), np.nan)
+
+    valid=np.flatnonzero(np.isfinite(pred_ra) & np.isfinite(pred_dec))
+    if len(valid) == 0 or len(obs_ra) == 0:
+        return sat, offset
+
+    # Corda sulla sfera unitaria corrispondente al raggio di associazione
+    chord=2*np.sin(np.radians(gate_arcsec/3600.0)/2)
+
+    pred_tree=cKDTree(unit_vectors(pred_ra[valid], pred_dec[valid]))
+    obs_tree=cKDTree(unit_vectors(obs_ra, obs_dec))
+    pairs=obs_tree.sparse_distance_matrix(pred_tree, chord, output_type='ndarray')
+    if len(pairs) == 0:
+        return sat, offset
+
+    used=np.zeros(len(valid), dtype=bool)
+    for pair in pairs[np.argsort(pairs['v'], kind='stable')]:
+        i, j = pair['i'], pair['j']
+        if sat[i] >= 0 or used[j]:
+            continue
+        sat[i]=valid[j]
+        used[j]=True
+        offset[i]=3600.0*np.degrees(2*np.arcsin(pair['v']/2))
+
+    return sat, offset
+
+#==================================================================================
+
+def candidates_from_file(tle_file, mjd):
+
+    """
+    Elements of the candidate satellites of a TLE file: for each satellite the TLE with the epoch closest to mjd.
+    """
+
+    elements=se.read_tle(tle_file)
+    norads=np.unique(elements['norad'])
+    k=se.closest_tle(elements, norads, mjd)
+
+    return {key: value[k] for key, value in elements.items()}
+
+#==================================================================================
+
+def associate(streaks, elements, site, gate_arcsec=GATE_ARCSEC):
+
+    """
+    Association of all the streaks of a night to the candidate satellites.
+    Input:
+    streaks = see read_streaks, elements = TLE elements of the candidates (one TLE per satellite),
+    site = (longitude E (degree), latitude (degree), height (m)) of the observer, gate_arcsec = gating radius
+    Output:
+    NORAD number of the associated satellite of each streak (0 if none), distance (arcsec, NaN if none)
+    """
+
+    norad=np.zeros(len(streaks['mjd']), dtype=int)
+    offset=np.full(len(streaks['mjd']), np.nan)
+    if len(streaks['mjd']) == 0 or len(elements['norad']) == 0:
+        return norad, offset
+
+    # Posizioni previste di tutti i candidati a tutte le epoche, griglia satelliti x epoche
+    epochs, frame = np.unique(streaks['mjd'], return_inverse=True)
+    with pm.timer('ephemeris'):
+        with np.errstate(invalid='ignore'):
+            pred_ra, pred_dec = se.ephemeris_j2000(elements, epochs, site)
+
+    with pm.timer('associate'):
+        order=np.argsort(frame, kind='stable')
+        bounds=np.searchsorted(frame[order], np.arange(len(epochs)+1))
+        for j in range(len(epochs)):
+            obs=order[bounds[j]:bounds[j+1]]
+            sat, dist = associate_epoch(pred_ra[:, j], pred_dec[:, j], streaks['ra'][obs], streaks['dec'][obs],
+                                        gate_arcsec)
+            found=sat >= 0
+            norad[obs[found]]=elements['norad'][sat[found]]
+            offset[obs[found]]=dist[found]
+
+    return norad, offset
+
+#==================================================================================
+
+def write_associated(file_to_write, streaks, norad, offset):
+
+    """
+    Save the labelled streaks, one line per streak (see the description of the script).
+    """
+
+    with open(file_to_write, 'w') as f:
+        for i in range(len(norad)):
+            f.write(streaks['date'][i] + ', ' + str(streaks['norad'][i]) + ', ' + str(streaks['exposure'][i]) + ', ' +
+                    str(streaks['ra'][i]) + ', ' + str(streaks['dec'][i]) + ', ' + str(norad[i]) + ', ' +
+                    ('NaN' if np.isnan(offset[i]) else format(offset[i], '.2f')) + '\n')
+
+#==================================================================================
+
+def read_associated(file_to_open, associated_only=True):
+
+    """
+    Labelled streaks of "Data_streaks_associated.txt" (see write_associated).
+    Input:
+    associated_only = skip the streaks without an associated satellite
+    Output:
+    dictionary of arrays as read_streaks, with norad_assoc (NORAD of the associated satellite, 0 if none)
+    and offset (arcsec, NaN if none)
+    """
+
+    rows=[]
+    with open(file_to_open) as f:
+        for line in f:
+            fields=[field.strip() for field in line.split(',')]
+            if len(fields) < 7 or (associated_only and int(fields[5]) == 0):
+                continue
+            rows.append(fields)
+
+    date=np.array([row[0] for row in rows], dtype=str)
+    streaks={'date': date,
+             'norad': np.array([int(row[1]) for row in rows], dtype=int),
+             'exposure': np.array([float(row[2]) for row in rows]),
+             'ra': np.array([float(row[3]) for row in rows]),
+             'dec': np.array([float(row[4]) for row in rows]),
+             'norad_assoc': np.array([int(row[5]) for row in rows], dtype=int),
+             'offset': np.array([float(row[6]) for row in rows])}
+    streaks['mjd']=mid_exposure(date, streaks['exposure'])
+
+    return streaks
+
+#==================================================================================
+
+def associate_night(path0, tle='store', gate_arcsec=GATE_ARCSEC, dmw=0):
+
+    """
+    Association of the streaks of "Data_streaks.fits" (or "Data_headers_streaks.txt") of the folder path0,
+    saved in "Data_streaks_associated.txt".
+    Input:
+    tle = TLE file of the candidates or 'store' for the local TLE store, gate_arcsec = gating radius (arcsec),
+    dmw = 1 to remove the streaks inside the Milky Way, 2 also inside the winter Milky Way
+    Output:
+    number of streaks, number of associated streaks
+    """
+
+    path0=os.path.join(path0, '')
+    pm.start_run('SST_association', path0, tle=tle, gate_arcsec=gate_arcsec, dmw=dmw)
+
+    try:
+        with pm.timer('read'):
+            if os.path.isfile(path0+st.TABLE_NAME):
+                streaks=read_streaks_table(path0+st.TABLE_NAME)
+            else:
+                streaks=read_streaks(path0+STREAKS_NAME)
+
+        # Filtro della Via Lattea su tutte le tracce della notte
+        if dmw in (1, 2):
+            with pm.timer('milky_way'):
+                streaks, keep = sc.milky_way_filter(streaks, winter=(dmw == 2))
+            print('Milky Way filter: ' + str(int(np.sum(~keep))) + ' streaks removed\n')
+            pm.count('milky_way', int(np.sum(~keep)))
+        mjd_ref=float(np.mean(streaks['mjd'])) if len(streaks['mjd']) > 0 else 0.0
+
+        with pm.timer('tle'):
+            if tle == 'store':
+                import TLE_store
+                elements=TLE_store.catalogue(mjd_ref)
+            else:
+                elements=candidates_from_file(tle, mjd_ref)
+        print('Candidate satellites: ' + str(len(elements['norad'])) + ', streaks: ' + str(len(streaks['mjd'])) + '\n')
+
+        site=se.read_site(os.path.join(SCRIPT_DIR, 'Settings_BASP.txt'))
+        norad, offset = associate(streaks, elements, site, gate_arcsec)
+
+        with pm.timer('write'):
+            write_associated(path0+OUTPUT_NAME, streaks, norad, offset)
+
+        n_associated=int(np.sum(norad > 0))
+        pm.count('streaks', len(norad))
+        pm.count('associated', n_associated)
+
+    finally:
+        pm.end_run()
+
+    return len(norad), n_associated
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    nome_script, path0, tle = sys.argv[0:3]
+    gate_arcsec=float(sys.argv[3]) if len(sys.argv) > 3 else GATE_ARCSEC
+    dmw=int(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    n_streaks, n_associated = associate_night(path0, tle, gate_arcsec, dmw)
+
+    print('Associated streaks: ' + str(n_associated) + ' of ' + str(n_streaks) + ', saved in ' + OUTPUT_NAME)
+    print('  ')
@@ -0,0 +1,249 @@
+# Python script running the Python stages of BASP in a single process.
+#
+# BASP.m runs fits_master_bias.py, fits_calibration.py, fits_keys_reader.py (twice) and SST_Astride_TDM.py
+# as separate python3 commands: each command pays again the start of the interpreter and the import of
+# astropy, scipy and ASTRiDE. This script imports the stage functions of the same scripts and runs the
+# sequence in one process, with the same output files:
+#
+# bias (fits_master_bias.py) -> calibration (fits_calibration.py) -> keys_cal (fits_keys_reader.py, _cal) ->
+# astrometry (solve-field) -> keys_wcs (fits_keys_reader.py, _WCS_) -> streaks (SST_Astride_TDM.py)
+#
+# The stages can be selected: "reduction" (bias, calibration, keys_cal) and "extraction" (keys_wcs, streaks)
+# are the two blocks run by BASP.m before and after the astrometric calibration made by Matlab,
+# "all" runs the whole sequence, including solve-field with the settings of "Settings_Astrometry.txt".
+# A comma separated list of stages (e.g. "keys_wcs,streaks") is also accepted.
+# The modules of a stage are imported only when the stage is run (ASTRiDE only for "streaks").
+#
+# solve-field reads only plain fits files: a compressed calibrated frame (see "Fits_io.py") is given as a
+# temporary plain copy and, with SST_FITS_COMPRESSION, the WCS frame written by solve-field is compressed.
+#
+# Parametri di input:
+#
+# Nome script, SST_pipeline.py
+# path0, path della cartella con le immagini SST e i bias (esempio: path0='/home/albino/Test/')
+# image_prefix = nome comune delle immagini (esempio: SST20201102)
+# NBmin, NBmax = numero minimo e massimo dei bias (esempio: 1 10)
+# Nmin, Nmax = numero minimo e massimo delle immagini SST (esempio: 101 120)
+# soglia = soglia di sensibilità di ASTRiDE (1 per i satelliti deboli, 2 o 3 per quelli brillanti)
+# stages = (opzionale) fasi da eseguire: all (default), reduction, extraction o lista separata da virgole
+# n_proc = (opzionale) numero di processi paralleli per calibrazione ed estrazione delle tracce (default 1)
+# Esempio di input da riga di comando: > python3 SST_pipeline.py /home/albino/Test/ SST20201102 1 10 101 120 1
+# Esempio con le sole fasi prima dell'astrometria: > python3 SST_pipeline.py /home/albino/Test/ SST20201102 1 10 101 120 1 reduction
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# Fasi della pipeline nell'ordine di BASP.m
+STAGES=('bias', 'calibration', 'keys_cal', 'astrometry', 'keys_wcs', 'streaks')
+
+# Gruppi di fasi
+STAGE_GROUPS={'all': STAGES,
+              'reduction': ('bias', 'calibration', 'keys_cal'),
+              'extraction': ('keys_wcs', 'streaks')}
+
+# Cartella degli script della pipeline (con "Settings_Astrometry.txt")
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+#==================================================================================
+
+def parse_stages(stages):
+
+    """
+    Stages to run, in the order of STAGES.
+    Input:
+    stages = name of a group of STAGE_GROUPS or comma separated list of STAGES
+    """
+
+    if stages in STAGE_GROUPS:
+        return STAGE_GROUPS[stages]
+
+    selected=[stage.strip() for stage in stages.split(',') if stage.strip()]
+    unknown=[stage for stage in selected if stage not in STAGES]
+    if unknown or not selected:
+        raise ValueError('Unknown stages ' + stages + ', use one of: ' + ', '.join(STAGE_GROUPS) +
+                         ' or a comma separated list of: ' + ', '.join(STAGES))
+
+    return tuple(stage for stage in STAGES if stage in selected)
+
+#==================================================================================
+
+def astrometry_settings(settings_file=os.path.join(SCRIPT_DIR, 'Settings_Astrometry.txt')):
+
+    """
+    Lower and upper limit of the image scale for solve-field, read as in BASP.m.
+    Output:
+    InfScale, SupScale = options of solve-field (e.g. '-L 0.5', '-H 0.7')
+    """
+
+    with open(settings_file) as f:
+        set2=re.split(r'\$+', f.read())
+
+    return set2[4].strip(), set2[7].strip()
+
+#==================================================================================
+
+def solve_frame(path0, image_name, image_name_WCS, ra, dec, InfScale, SupScale):
+
+    """
+    Astrometric calibration of a frame of the folder path0 with solve-field (local astrometry.net).
+    Input:
+    image_name = calibrated frame, image_name_WCS = output WCS frame, ra, dec = center of the frame
+    (header strings, e.g. '19:09:57.4', '-06:43:55.9'), InfScale, SupScale = see astrometry_settings
+    Output:
+    True if the WCS frame has been written
+    """
+
+    import Fits_io as fio
+
+    print('Astrometry.net processing ' + image_name + '\n')
+
+    # Copia decompressa e file ausiliari di solve-field in una cartella temporanea
+    with tempfile.TemporaryDirectory() as temp_dir, fio.plain_file(path0+image_name, temp_dir) as plain_file:
+        image=image_name if plain_file == path0+image_name else plain_file
+        command=['solve-field', *InfScale.split(), *SupScale.split(), '-u', 'arcsecperpix', '--ra', ra,
+                 '--dec', dec, '--radius', '0.5', image, '-N', image_name_WCS]
+        subprocess.run(command, cwd=path0)
+
+    if not os.path.isfile(path0+image_name_WCS):
+        return False
+
+    if fio.COMPRESSION != 'none':
+        fio.compress_file(path0+image_name_WCS, compression=fio.COMPRESSION, quantize_level=fio.QUANTIZE_LEVEL)
+
+    return True
+
+#==================================================================================
+
+def solve_field(path0, image_prefix, Nmin, Nmax):
+
+    """
+    Astrometric calibration of the frames image_prefix_NNN_cal.fit with the local astrometry.net, as in BASP.m.
+    The center of each frame is taken from "Data_keys.txt" (written by the keys_cal stage) and the
+    WCS frames are saved as image_prefix_WCS_NNN.fit.
+    Output:
+    number of WCS frames found after the calibration
+    """
+
+    InfScale, SupScale = astrometry_settings()
+
+    # Coordinate del centro delle immagini, una riga per ogni immagine _cal esistente
+    with open(path0+'Data_keys.txt') as f:
+        centers=[line.split()[3:5] for line in f if line.strip()]
+
+    kk=0 # Indice delle coordinate del centro immagine
+    for i in range(int(Nmin), int(Nmax)+1):
+
+        image_name=image_prefix+'_'+str(i)+'_cal.fit'
+
+        # Se il file da calibrare non esiste si passa all'immagine successiva
+        if not os.path.isfile(path0+image_name):
+            continue
+
+        image_name_WCS=image_prefix+'_WCS_'+str(i)+'.fit'
+        ra, dec = centers[kk]
+
+        solve_frame(path0, image_name, image_name_WCS, ra, dec, InfScale, SupScale)
+
+        kk=kk+1
+
+    # Verifica dell'esistenza delle immagini WCS
+    file_WCS=0
+    for i in range(int(Nmin), int(Nmax)+1):
+
+        image_name0=image_prefix+'_WCS_'+str(i)+'.fit'
+        if os.path.isfile(path0+image_name0):
+            print('File ' + image_name0 + ' exist')
+            file_WCS=file_WCS+1
+        else:
+            print('File ' + image_name0 + ' does not exist')
+
+    return file_WCS
+
+#==================================================================================
+
+def run_pipeline(path0, image_prefix, NBmin, NBmax, Nmin, Nmax, soglia, stages='all', n_proc=1):
+
+    """
+    Run the selected stages of the pipeline in the current process.
+    Input:
+    path0 = folder of the images, image_prefix = common name of the images (e.g. SST20201102),
+    NBmin, NBmax = first and last bias number, Nmin, Nmax = first and last image number,
+    soglia = threshold of ASTRiDE, stages = see parse_stages, n_proc = number of processes
+    Output:
+    dictionary with the execution time (s) of each stage run
+    """
+
+    stages=parse_stages(stages)
+    path0=os.path.join(path0, '')
+    NBmin, NBmax, Nmin, Nmax = int(NBmin), int(NBmax), int(Nmin), int(Nmax)
+    num_bias=str(NBmax-NBmin+1)
+    num_im=str(Nmax-Nmin+1)
+
+    times={}
+    for stage in stages:
+
+        t0=time.perf_counter()
+
+        # I moduli di ogni fase sono importati solo se la fase viene eseguita
+        if stage == 'bias':
+            print('COMPUTE MASTER BIAS FRAME\n')
+            import fits_master_bias
+            fits_master_bias.create_master_bias(path0, image_prefix+'_BIAS_', '.fit', str(NBmin), num_bias)
+
+        elif stage == 'calibration':
+            print('RAW IMAGES CALIBRATION (MASTER BIAS SUBTRACTION)\n')
+            import fits_calibration
+            fits_calibration.calibrate_sequence(path0, image_prefix+'_', '.fit', str(Nmin), num_im, n_proc)
+
+        elif stage == 'keys_cal':
+            print('READ HEADERS KEYS FROM CALIBRATED IMAGES\n')
+            import fits_keys_reader
+            fits_keys_reader.read_keys(path0, image_prefix+'_', '_cal.fit', str(Nmin), num_im)
+
+        elif stage == 'astrometry':
+            print('IMAGES ASTROMETRY CALIBRATION WITH ASTROMETRY.NET\n')
+            if solve_field(path0, image_prefix, Nmin, Nmax) == 0:
+                print('Files WCS does not exist')
+                times[stage]=time.perf_counter()-t0
+                break
+
+        elif stage == 'keys_wcs':
+            print('READ HEADERS KEYS FROM CALIBRATED WCS IMAGES\n')
+            import fits_keys_reader
+            fits_keys_reader.read_keys(path0, image_prefix+'_WCS_', '.fit', str(Nmin), num_im)
+
+        elif stage == 'streaks':
+            print('START SATELLITES TRACE EXTRACTION WITH ASTRiDE\n')
+            import SST_Astride_TDM
+            SST_Astride_TDM.extract_sequence(path0, image_prefix+'_WCS_', '.fit', str(Nmin), num_im, str(soglia),
+                                             n_proc)
+
+        times[stage]=time.perf_counter()-t0
+
+    return times
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    nome_script, path0, image_prefix, NBmin, NBmax, Nmin, Nmax, soglia = sys.argv[0:8]
+    stages=sys.argv[8] if len(sys.argv) > 8 else 'all'
+    n_proc=int(sys.argv[9]) if len(sys.argv) > 9 else 1
+
+    try:
+        parse_stages(stages)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    times=run_pipeline(path0, image_prefix, NBmin, NBmax, Nmin, Nmax, soglia, stages, n_proc)
+
+    print('PIPELINE STAGES: ' + ', '.join(stage + ' ' + format(dt, '.2f') + ' s' for stage, dt in times.items()))
+    print('  ')
@@ -0,0 +1,362 @@
+# Python script writing the astrometric reports of a night: the extended MPC file and one CCSDS TDM per satellite.
+#
+# BASP.m reads again "Data_headers_streaks.txt" with "readtable", splits the dates in vectors of year, month,
+# day, hour, minute and second and writes "MPC_YYYYMMDD.txt" and the files "IT_CASSINI_YYYYMMDDThhmmss_NORAD.tdm"
+# with a loop over all the observations for each satellite. This script takes the measurements directly from
+# the Python pipeline ("Data_streaks.fits" of SST_Astride_TDM.py, or "Data_headers_streaks.txt" if the table
+# is missing, or the streaks labelled by SST_association.py) and writes the same files in a single pass:
+# the observations are sorted by NORAD number (stable sort, as sortrows of BASP.m) and each TDM is written
+# from the contiguous group of observations of its satellite, while the MPC file is written line by line.
+#
+# The format of the lines is the one of BASP.m: epoch at the middle of the exposure, MPC header from
+# "Settings_MPC.txt", NORAD number with 7 digits, RA and DEC J2000 truncated (not rounded) as in Matlab,
+# TDM angles with 4 decimals. The observations are not filtered with find_orb (Ephem_comp=3 of BASP.m):
+# with source "associated" only the streaks associated to a satellite by SST_association.py are reported,
+# with the NORAD number of the associated satellite instead of the one of the header.
+# With dmw=1 (as the option DMW of BASP.m) the streaks inside the Milky Way belt are removed
+# (dmw=2 removes also the winter Milky Way).
+#
+# Parametri di input:
+#
+# Nome script, SST_reports.py
+# path0, path della cartella con le misure della notte (esempio: path0='/home/albino/Test/')
+# source = (opzionale) misure da riportare: header = tutte le tracce con il NORAD dell'header (default),
+#          associated = solo le tracce associate da SST_association.py, con il NORAD del satellite associato
+# dmw = (opzionale) 1 elimina le tracce nella Via Lattea, 2 anche nella Via Lattea invernale, 0 no (default 0)
+# Esempio di input da riga di comando: > python3 SST_reports.py /home/albino/Test/
+# Esempio con le tracce associate: > python3 SST_reports.py /home/albino/Test/ associated
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+# Importa le librerie della pipeline
+import Pipeline_metrics as pm
+import SST_association as sa
+import Sky_coordinates as sc
+import Streak_table as st
+
+# Cartella degli script della pipeline (con "Settings_MPC.txt")
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+# Campi di "Settings_MPC.txt" (posizione dopo lo split sui caratteri $, come in BASP.m)
+MPC_SETTINGS={'mpc': 4, 'code': 7, 'address': 10, 'observers': 13, 'measurers': 16, 'telescope': 19,
+              'star_catalog': 22, 'comments': 25}
+
+# Magnitudine e banda scritte per tutte le osservazioni, come in BASP.m
+MAGNITUDE='15.5 G'
+
+# Partecipante e autore dei TDM
+PARTICIPANT='IT_CASSINI'
+ORIGINATOR='INAF-OAS'
+
+#==================================================================================
+
+def read_mpc_settings(settings_file=os.path.join(SCRIPT_DIR, 'Settings_MPC.txt')):
+
+    """
+    Settings of the MPC header, as BASP.m.
+    Output:
+    dictionary with the keys of MPC_SETTINGS (e.g. mpc = IAU code, code = line 'COD ...')
+    """
+
+    with open(settings_file) as f:
+        items=re.split(r'\$+', f.read())
+
+    return {key: items[k].strip() for key, k in MPC_SETTINGS.items()}
+
+#==================================================================================
+
+def mean_times(date, exposure):
+
+    """
+    Date and time at the middle of the exposures, as BASP.m (seconds and minutes carried to the next
+    minute and hour as in Matlab). The day is carried with the calendar, also at the end of the month.
+    Input:
+    date = array of DATE-OBS strings (yyyy-mm-ddTHH:MM:SS.sss), exposure = exposure time (s)
+    Output:
+    year, month, day, hour, minute (integer arrays), sec (seconds with decimals)
+    """
+
+    date=np.asarray(date, dtype=str)
+    hour=np.array([int(d[11:13]) for d in date], dtype=int)
+    minute=np.array([int(d[14:16]) for d in date], dtype=int)
+    sec=np.array([float(d[17:]) for d in date])+np.asarray(exposure, dtype=float)/2
+
+    # Secondi e minuti >= 60 riportati al minuto e all'ora successivi
+    carry=sec >= 60
+    sec=np.where(carry, 60*(sec/60-np.floor(sec/60)), sec)
+    minute=minute+carry
+    carry=minute >= 60
+    minute=np.where(carry, minute-60, minute)
+    hour=hour+carry
+    carry=hour >= 24
+    hour=np.where(carry, hour-24, hour)
+
+    days=np.array([d[0:10] for d in date], dtype='datetime64[D]')+carry.astype(int)
+    months=days.astype('datetime64[M]')
+    years=days.astype('datetime64[Y]')
+
+    return (years.astype(int)+1970, (months-years).astype(int)+1, (days-months).astype(int)+1,
+            hour, minute, sec)
+
+#==================================================================================
+
+def format_seconds(sec):
+
+    """
+    Seconds in the format SS.sssss (5 decimals truncated), as format_seconds.m.
+    """
+
+    sec_int=int(sec)
+
+    return format(sec_int, '02d') + '.' + format(int(100000*(sec-sec_int)), '05d')
+
+#==================================================================================
+
+def degrees2dms(angle):
+
+    """
+    Degrees, minutes and seconds (with decimals) of a positive angle.
+    """
+
+    d=int(angle)
+    minutes=(angle-d)*60
+    m=int(minutes)
+
+    return d, m, (minutes-m)*60
+
+#==================================================================================
+
+def mpc_header(settings):
+
+    """
+    Header lines of the MPC file, as BASP.m.
+    """
+
+    lines=[settings[key] + ' \n' for key in ('code', 'address', 'observers', 'measurers', 'telescope')]
+    lines.append('ACK MPCReport file updated ' + time.strftime('%d-%b-%Y %H:%M:%S') + ' \n')
+    lines.extend(settings[key] + ' \n' for key in ('star_catalog', 'comments'))
+
+    return lines
+
+#==================================================================================
+
+def mpc_line(norad, year, month, day, hour, minute, sec, ra, dec, mpc):
+
+    """
+    Line of an observation in the extended MPC format, as BASP.m.
+    Input:
+    norad = NORAD number, epoch of the observation, ra, dec = J2000 (degree), mpc = IAU code of the observatory
+    """
+
+    # Giorno con 6 decimali (UT)
+    data=day+sec/86400+minute/1440+hour/24
+    data_s=format(int(data), '02d') + '.' + format(int(1000000*(data-int(data))), '06d')
+
+    # AR in h m s, secondi con 3 decimali
+    ar=degrees2dms(ra/15)
+    ar3=format(int(ar[2]), '02d') + '.' + format(int(1000*(ar[2]-int(ar[2]))), '03d')
+
+    # DEC in gradi ' ", secondi d'arco con 2 decimali
+    segno='+' if dec >= 0 else '-'
+    de=degrees2dms(abs(dec))
+    dec3=format(int(de[2]), '02d') + '.' + format(int(100*(de[2]-int(de[2]))), '02d')
+
+    return ('     %s %s %02d %s%02d %02d %s%s%02d %02d %s         %s      %s\n' %
+            (str(norad).zfill(7), 'KC'+str(year), month, data_s, ar[0], ar[1], ar3, segno, de[0], de[1], dec3,
+             MAGNITUDE, mpc))
+
+#==================================================================================
+
+def tdm_epoch(year, month, day, hour, minute, sec):
+
+    # Epoca nel formato dei TDM, yyyy-mm-ddTHH:MM:SS.sssss
+    return '%04d-%02d-%02dT%02d:%02d:%s' % (year, month, day, hour, minute, format_seconds(sec))
+
+#==================================================================================
+
+def tdm_file_name(norad, year, month, day, hour, minute, sec):
+
+    """
+    Name of the TDM of a satellite, from the epoch of its first observation: IT_CASSINI_YYYYMMDDThhmmss_NORAD.tdm
+    """
+
+    return PARTICIPANT + '_%04d%02d%02dT%02d%02d%02d_%d.tdm' % (year, month, day, hour, minute, int(sec), norad)
+
+#==================================================================================
+
+def write_tdm(f, norad, epochs, ra, dec):
+
+    """
+    Write the TDM of a satellite, as BASP.m.
+    Input:
+    f = open file, norad = NORAD number, epochs = TDM epochs of the observations (see tdm_epoch),
+    ra, dec = J2000 coordinates of the observations (degree)
+    """
+
+    creation=time.time()
+    f.write('CCSDS_TDM_VERS = 1.0 \n')
+    f.write('   \n')
+    f.write('CREATION_DATE = ' + time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(creation)) +
+            '.%03d' % int(1000*(creation % 1)) + ' \n')
+    f.write('ORIGINATOR = ' + ORIGINATOR + ' \n')
+    f.write('   \n')
+    f.write('META_START   \n')
+    f.write('TIME_SYSTEM = UTC \n')
+    f.write('START_TIME = ' + epochs[0] + ' \n')
+    f.write('STOP_TIME = ' + epochs[-1] + ' \n')
+    f.write('PARTICIPANT_1 = ' + PARTICIPANT + ' \n')
+    f.write('PARTICIPANT_2 = %d \n' % norad)
+    f.write('MODE = SEQUENTIAL \n')
+    f.write('PATH = 2,1 \n')
+    f.write('ANGLE_TYPE = RADEC \n')
+    f.write('REFERENCE_FRAME = EME2000 \n')
+    f.write('   \n')
+    f.write('META_STOP \n')
+    f.write('   \n')
+    f.write('DATA_START \n')
+    f.write('   \n')
+    for k in range(len(epochs)):
+        f.write('ANGLE_1 = %s %03.4f \n' % (epochs[k], ra[k]))
+        f.write('ANGLE_2 = %s %02.4f \n' % (epochs[k], dec[k]))
+        f.write('   \n')
+    f.write('   \n')
+    f.write('DATA_STOP \n')
+
+#==================================================================================
+
+def write_reports(path0, streaks, settings=None):
+
+    """
+    Write the MPC file and the TDMs of the observations of a night in the folder path0.
+    Input:
+    streaks = dictionary of arrays with date (DATE-OBS), exposure (s), ra, dec (J2000, degree) and norad
+    (e.g. output of SST_association.read_streaks), settings = see read_mpc_settings
+    Output:
+    name of the MPC file (None if there are no observations), list of the names of the TDMs
+    """
+
+    if settings is None:
+        settings=read_mpc_settings()
+
+    # Osservazioni con coordinate, ordinate per numero NORAD (ordinamento stabile come sortrows)
+    valid=np.isfinite(streaks['ra']) & np.isfinite(streaks['dec'])
+    order=np.flatnonzero(valid)[np.argsort(np.asarray(streaks['norad'])[valid], kind='stable')]
+    if len(order) == 0:
+        return None, []
+
+    norad=np.asarray(streaks['norad'])[order]
+    ra=np.asarray(streaks['ra'], dtype=float)[order]
+    dec=np.asarray(streaks['dec'], dtype=float)[order]
+    year, month, day, hour, minute, sec = mean_times(np.asarray(streaks['date'])[order],
+                                                     np.asarray(streaks['exposure'])[order])
+
+    # Gruppi di osservazioni contigue dello stesso satellite
+    bounds=np.concatenate(([0], np.flatnonzero(np.diff(norad))+1, [len(norad)]))
+
+    mpc_file='MPC_%04d%02d%02d.txt' % (year[0], month[0], day[0])
+    tdm_files=[]
+    with open(os.path.join(path0, mpc_file), 'w') as g:
+        g.writelines(mpc_header(settings))
+        for j in range(len(bounds)-1):
+            first, last = bounds[j], bounds[j+1]
+            epochs=[]
+            for i in range(first, last):
+                g.write(mpc_line(norad[i], year[i], month[i], day[i], hour[i], minute[i], sec[i], ra[i], dec[i],
+                                 settings['mpc']))
+                epochs.append(tdm_epoch(year[i], month[i], day[i], hour[i], minute[i], sec[i]))
+
+            # TDM del satellite, con il nome dato dalla prima osservazione
+            print('Save TDM file for satellite number ' + str(norad[first]) + '\n')
+            tdm_file=tdm_file_name(norad[first], year[first], month[first], day[first], hour[first], minute[first],
+                                   sec[first])
+            with open(os.path.join(path0, tdm_file), 'w') as f:
+                write_tdm(f, norad[first], epochs, ra[first:last], dec[first:last])
+            tdm_files.append(tdm_file)
+
+    return mpc_file, tdm_files
+
+#==================================================================================
+
+def read_measurements(path0, source='header'):
+
+    """
+    Measurements of a night to be reported.
+    Input:
+    source = 'header' for all the streaks of "Data_streaks.fits" (or "Data_headers_streaks.txt") with the NORAD
+    number of the header, 'associated' for the streaks associated by SST_association.py
+    Output:
+    dictionary of arrays, see SST_association.read_streaks
+    """
+
+    if source == 'associated':
+        streaks=sa.read_associated(path0+sa.OUTPUT_NAME)
+        streaks['norad']=streaks['norad_assoc']
+    elif source == 'header':
+        if os.path.isfile(path0+st.TABLE_NAME):
+            streaks=sa.read_streaks_table(path0+st.TABLE_NAME)
+        else:
+            streaks=sa.read_streaks(path0+sa.STREAKS_NAME)
+    else:
+        raise ValueError('Unknown source ' + source + ', use one of: header, associated')
+
+    return streaks
+
+#==================================================================================
+
+def report_night(path0, source='header', dmw=0):
+
+    """
+    Write the MPC file and the TDMs of the night of the folder path0 (see the description of the script).
+    Output:
+    name of the MPC file (None if there are no observations), list of the names of the TDMs
+    """
+
+    path0=os.path.join(path0, '')
+    pm.start_run('SST_reports', path0, source=source, dmw=dmw)
+
+    try:
+        with pm.timer('read'):
+            streaks=read_measurements(path0, source)
+
+        # Filtro della Via Lattea su tutte le tracce della notte
+        if dmw in (1, 2):
+            with pm.timer('milky_way'):
+                streaks, keep = sc.milky_way_filter(streaks, winter=(dmw == 2))
+            print('Milky Way filter: ' + str(int(np.sum(~keep))) + ' streaks removed\n')
+            pm.count('milky_way', int(np.sum(~keep)))
+
+        with pm.timer('write'):
+            mpc_file, tdm_files = write_reports(path0, streaks, read_mpc_settings())
+
+        pm.count('observations', len(streaks['ra']))
+        pm.count('tdm', len(tdm_files))
+
+    finally:
+        pm.end_run()
+
+    return mpc_file, tdm_files
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    nome_script, path0 = sys.argv[0:2]
+    source=sys.argv[2] if len(sys.argv) > 2 else 'header'
+    dmw=int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    mpc_file, tdm_files = report_night(path0, source, dmw)
+
+    if mpc_file is None:
+        print('EXIT SST_reports: no satellites traces found!')
+    else:
+        print('Astrometry saved in ' + mpc_file + ' and ' + str(len(tdm_files)) + ' TDM files')
+    print('  ')
@@ -0,0 +1,333 @@
+# Python script for the live processing of a night: the images folder is watched and every new frame
+# is processed as soon as the camera has finished writing it, instead of waiting for the end of the night.
+#
+# For each new frame image_prefix_NNN.fit the script runs the same steps of BASP.m:
+# calibration with the current master bias (path0+'master_bias.fit', or the library master compatible with the frame,
+# reloaded if it changes) -> astrometric calibration with solve-field -> header keys of the WCS frame ->
+# ASTRiDE detection and best fit center of the tracks. The lines of the frame are then appended to
+# "Data_keys.txt" and "Data_headers_streaks.txt", with the same format of fits_keys_reader.py and
+# SST_Astride_TDM.py. A frame is processed when its header and all its data blocks have been written
+# (Fits_header_index.frame_complete) and the file has not been modified for SETTLE_S seconds.
+# The camera can write tile compressed frames (Fits_io.py): a compressed frame is complete when all the
+# blocks of the compressed image have been written.
+#
+# The frames already processed and the size of the output files after each frame are saved in
+# "Watch_state.json" (written with an atomic rename after the output lines are on disk). After a crash
+# the script can be started again: the output files are cut back to the last saved size, so that a
+# frame written only in part is removed, and the frames not yet saved in the state are processed again.
+# Without "Watch_state.json" the output files are written from the beginning: if they are not empty (e.g. the
+# output of a batch run of the night) the script does not start, they must be moved or removed first.
+# If any step of a frame fails (e.g. a corrupt frame or a WCS header without the pipeline keys) the error
+# is printed and the frame is saved in the state as 'failed', without stopping the watch.
+# The delay between the last write of the camera and the append of the streak coordinates is
+# registered as timer "latency" in "Pipeline_metrics.jsonl".
+# The binary table "Data_streaks.fits" (Streak_table.py) is not written in watch mode: it is written by
+# SST_Astride_TDM.py, e.g. when the night is processed again at the end (the frames are taken from the manifest).
+#
+# Parametri di input:
+#
+# Nome script, SST_watch.py
+# path0, path della cartella dove la camera scrive le immagini (esempio: path0='/home/albino/Test/')
+# image_prefix = nome comune delle immagini (esempio: SST20201102)
+# soglia = soglia di sensibilità di ASTRiDE (1 per i satelliti deboli, 2 o 3 per quelli brillanti)
+# poll_s = (opzionale) intervallo in secondi fra due letture della cartella (default 1)
+# idle_s = (opzionale) termina dopo idle_s secondi senza nuove immagini (default 0, non termina: Ctrl-C per uscire)
+# diagnostics = (opzionale) output diagnostici di ASTRiDE: off (default), inline, background
+# center_method = (opzionale) metodo per il centro delle tracce (vedi SST_Astride_TDM.py, default median2)
+# Esempio di input da riga di comando: > python3 SST_watch.py /home/albino/Test/ SST20201102 1
+# Esempio che termina dopo 30 minuti senza immagini: > python3 SST_watch.py /home/albino/Test/ SST20201102 1 1 1800
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import json
+import os
+import sys
+import time
+
+# Importa le librerie e le funzioni delle fasi della pipeline
+import Calibration_library as cl
+import Fits_header_index as fhi
+import Fits_io as fio
+import Pipeline_metrics as pm
+import SST_Astride_TDM as sat
+import SST_pipeline as sp
+import Streak_table as st
+import fits_calibration
+
+# File di stato della modalità watch nella cartella delle immagini
+STATE_NAME='Watch_state.json'
+
+# File di output scritti in append, una riga per immagine o per traccia
+OUTPUT_FILES=('Data_keys.txt', 'Data_headers_streaks.txt')
+
+# Tempo (s) senza modifiche del file prima di elaborare un'immagine
+SETTLE_S=1.0
+
+# Intervallo di default (s) fra due letture della cartella
+POLL_S=1.0
+
+# Master bias caricati, path -> (mtime, dati)
+_masters={}
+
+#==================================================================================
+
+def save_state(path0, state):
+
+    """
+    Save the state of the watch mode with an atomic rename: after a crash the file contains
+    either the previous or the new state, never a partial one.
+    """
+
+    file_state=path0+STATE_NAME
+    with open(file_state+'.tmp', 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(file_state+'.tmp', file_state)
+
+#==================================================================================
+
+def load_state(path0):
+
+    """
+    State of the watch mode (frames already processed and size of the output files).
+    The output files are cut back to the sizes of the state, removing the lines of a frame
+    written only in part before a crash; without a state they are written from the beginning.
+    Raise ValueError if there is no state and an output file is not empty (e.g. the output of a batch
+    run of the night), so that it is not overwritten.
+    Output:
+    dictionary with keys frames (file name -> status) and sizes (output file -> bytes)
+    """
+
+    if os.path.isfile(path0+STATE_NAME):
+        with open(path0+STATE_NAME) as f:
+            state=json.load(f)
+    else:
+        for name in OUTPUT_FILES:
+            if os.path.isfile(path0+name) and os.path.getsize(path0+name) > 0:
+                raise ValueError(path0+name + ' is not empty and there is no ' + STATE_NAME +
+                                 ': move or remove it before starting the watch mode')
+        state={'frames': {}, 'sizes': {name: 0 for name in OUTPUT_FILES}}
+
+    for name in OUTPUT_FILES:
+        with open(path0+name, 'a') as f:
+            f.truncate(state['sizes'].get(name, 0))
+
+    save_state(path0, state)
+
+    return state
+
+#==================================================================================
+
+def append_lines(file_to_write, lines):
+
+    """
+    Append the lines of a frame to an output file and wait until they are on disk.
+    Output:
+    size of the file (bytes) after the append
+    """
+
+    with open(file_to_write, 'a') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+#==================================================================================
+
+def current_master(path0, head):
+
+    """
+    Master bias for a frame: path0+'master_bias.fit' if it exists, otherwise the master of the
+    calibration library compatible with the header. The data are loaded again only if the file changes.
+    Output:
+    master_file, master_bias (None, None if no master bias exists yet)
+    """
+
+    master_file=path0+'master_bias.fit'
+    if not os.path.isfile(master_file):
+        master_file=cl.find_compatible_master(head)
+    if master_file is None or not os.path.isfile(master_file):
+        return None, None
+
+    mtime=os.stat(master_file).st_mtime_ns
+    cached=_masters.get(master_file)
+    if cached is None or cached[0] != mtime:
+        with pm.timer('master_bias'):
+            cached=(mtime, fio.read_image(master_file)[0])
+        _masters[master_file]=cached
+        print('Calibration with master bias ' + master_file + '\n')
+
+    return master_file, cached[1]
+
+#==================================================================================
+
+def process_new_frame(path0, image_prefix, file_name, head, soglia, settings, diagnostics='off', center_method='median2'):
+
+    """
+    Calibration, astrometry, header keys and streak extraction of a new frame.
+    Input:
+    path0 = images folder, image_prefix = common name of the images, file_name = raw frame image_prefix_NNN.fit
+    (as listed in the folder, NNN can be zero padded),
+    head = header of the raw frame, soglia = threshold of ASTRiDE, settings = (InfScale, SupScale) of solve-field,
+    diagnostics, center_method = see SST_Astride_TDM.process_frame
+    Output:
+    status ('done', 'invalid', 'no_wcs', 'failed'; None if there is no master bias yet),
+    dictionary output file -> lines to append
+    """
+
+    # Nomi derivati da quello dell'immagine, con lo stesso numero NNN (anche con gli zeri iniziali)
+    raw_name=file_name
+    number=file_name[len(image_prefix)+1:-len('.fit')]
+    cal_name=image_prefix+'_'+number+'_cal.fit'
+    wcs_name=image_prefix+'_WCS_'+number+'.fit'
+
+    # Senza le key richieste dalla pipeline l'immagine non viene elaborata
+    if not all(key in head for key in fhi.PIPELINE_KEYS):
+        print(raw_name + ' without correct header!' + '\n')
+        return 'invalid', {}
+
+    master_file, master_bias = current_master(path0, head)
+    if master_bias is None:
+        return None, {}
+
+    fits_calibration.calibrate_frame(path0+raw_name, path0+cal_name, master_bias)
+
+    with pm.timer('astrometry', raw_name):
+        solved=sp.solve_frame(path0, cal_name, wcs_name, str(head['RA']), str(head['DEC']), *settings)
+    if not solved:
+        print('File ' + wcs_name + ' does not exist' + '\n')
+        return 'no_wcs', {}
+
+    # Data e ora, nome oggetto, tempo di esposizione (s), AR (hh:mm:ss), DEC (dd:mm:ss), come in fits_keys_reader.py
+    hdr=fhi.read_header(path0+wcs_name)
+    keys=' '.join(str(hdr[key]) for key in fhi.PIPELINE_KEYS)+'\n'
+
+    print('Extract satellite streak from ' + path0+wcs_name + '\n')
+    file_to_open, record, error, n_opens, records = sat.process_frame_safe((path0+wcs_name, soglia,
+                                                      path0+wcs_name[:-len('.fit')], diagnostics, center_method))
+    pm.merge(records)
+    if error is not None:
+        print('ERROR in ' + file_to_open + ': ' + error + ', frame skipped\n')
+        return 'failed', {'Data_keys.txt': [keys]}
+
+    return 'done', {'Data_keys.txt': [keys], 'Data_headers_streaks.txt': st.legacy_lines(record)}
+
+#==================================================================================
+
+def process_new_frame_safe(path0, image_prefix, file_name, head, soglia, settings, diagnostics='off', center_method='median2'):
+
+    """
+    Run process_new_frame isolating the failures: an exception in any step of the frame (e.g. a corrupt
+    raw frame or a WCS header without the pipeline keys) is printed and the frame gets the status 'failed',
+    so that it is saved in "Watch_state.json" and not processed again after a restart.
+    Output:
+    see process_new_frame
+    """
+
+    try:
+        return process_new_frame(path0, image_prefix, file_name, head, soglia, settings, diagnostics, center_method)
+    except Exception as exc:
+        print('ERROR in ' + path0+file_name + ': ' + type(exc).__name__ + ': ' + str(exc) + ', frame skipped\n')
+        return 'failed', {}
+
+#==================================================================================
+
+def watch(path0, image_prefix, soglia, poll_s=POLL_S, idle_s=0, diagnostics='off', center_method='median2'):
+
+    """
+    Watch the folder path0 and process the new frames image_prefix_NNN.fit as soon as they are complete.
+    Input:
+    path0 = images folder, image_prefix = common name of the images, soglia = threshold of ASTRiDE,
+    poll_s = interval between two listings of the folder (s), idle_s = stop after idle_s seconds
+    without new frames (0 = never), diagnostics, center_method = see SST_Astride_TDM.process_frame
+    Output:
+    state of the watch mode (see load_state)
+    """
+
+    if diagnostics not in ('off', 'inline', 'background'):
+         raise ValueError('Unknown diagnostics mode ' + diagnostics + ', use one of: off, inline, background')
+    if center_method not in sat.CENTER_METHODS:
+         raise ValueError('Unknown center method ' + center_method + ', use one of: ' + ', '.join(sat.CENTER_METHODS))
+
+    path0=os.path.join(path0, '')
+    state=load_state(path0)
+    settings=sp.astrometry_settings()
+
+    pm.start_run('SST_watch', path0, image_prefix=image_prefix, soglia=soglia, poll_s=poll_s, idle_s=idle_s,
+                 diagnostics=diagnostics, center_method=center_method)
+    if diagnostics == 'background':
+        sat.start_diagnostics()
+
+    print('WATCH FOLDER ' + path0 + ' FOR NEW FRAMES ' + image_prefix + '_NNN.fit (' +
+          str(len(state['frames'])) + ' frames already processed)\n')
+
+    waiting_master=False
+    last_frame=time.monotonic()
+    try:
+        while True:
+
+            for num, file_name in fhi.list_frames(path0, image_prefix+'_', '.fit', 0, 10**9):
+
+                if file_name in state['frames']:
+                    continue
+
+                # L'immagine deve essere completa e non più modificata dalla camera
+                stat=os.stat(path0+file_name)
+                if time.time()-stat.st_mtime < SETTLE_S:
+                    continue
+                head=fhi.frame_complete(path0+file_name)
+                if head is None:
+                    continue
+
+                status, lines = process_new_frame_safe(path0, image_prefix, file_name, head, soglia, settings, diagnostics,
+                                                       center_method)
+                if status is None:
+                    if not waiting_master:
+                        print('Waiting for the master bias to calibrate ' + file_name + '\n')
+                    waiting_master=True
+                    break
+                waiting_master=False
+
+                # Prima le righe sul disco, poi lo stato: dopo un crash la parte non salvata viene rifatta
+                with pm.timer('append', file_name):
+                    for name in OUTPUT_FILES:
+                        state['sizes'][name]=append_lines(path0+name, lines.get(name, []))
+                    state['frames'][file_name]=status
+                    save_state(path0, state)
+
+                pm.add_time('latency', time.time()-stat.st_mtime, file_name)
+                pm.count(status)
+                last_frame=time.monotonic()
+
+            if idle_s > 0 and time.monotonic()-last_frame > idle_s:
+                print('No new frames for ' + str(idle_s) + ' s, exit from watch mode\n')
+                break
+
+            time.sleep(poll_s)
+
+    except KeyboardInterrupt:
+        print('Watch mode stopped\n')
+
+    finally:
+        sat.stop_diagnostics()
+        pm.end_run()
+
+    return state
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    nome_script, path0, image_prefix, soglia = sys.argv[0:4]
+    poll_s=float(sys.argv[4]) if len(sys.argv) > 4 else POLL_S
+    idle_s=float(sys.argv[5]) if len(sys.argv) > 5 else 0
+    diagnostics=sys.argv[6] if len(sys.argv) > 6 else 'off'
+    center_method=sys.argv[7] if len(sys.argv) > 7 else 'median2'
+
+    try:
+        watch(path0, image_prefix, soglia, poll_s, idle_s, diagnostics, center_method)
+    except ValueError as error:
+        sys.exit(str(error))
@@ -0,0 +1,151 @@
+# Python library for the vectorized transformations and filters of the equatorial coordinates of the streaks.
+#
+# The functions work on whole arrays of RA and DEC (e.g. the columns of "Data_headers_streaks.txt" written by
+# SST_Astride_TDM.py), instead of one observation at a time as the Matlab functions:
+#
+# - EQ2EQ2000_B.m, equatorial coordinates from the equinox of date to J2000.0 (Boulet, 1991), used after
+#   the SGP4 ephemeris
+# - equat2galactic.m, galactic coordinates and selection of the positions outside the Milky Way belt
+#   (option DMW of BASP.m), where the crowded star fields make the astrometry of the streaks difficult
+#
+# The belts of the Milky Way are the ones of equat2galactic.m: between Cepheus and Sagittarius, between
+# Perseus and Cassiopeia, between Scorpius and Ophiuchus; the winter belt between Auriga and Norma is
+# filtered only on request (winter=True), as described in equat2galactic.m.
+#
+# The selection deliberately follows the behaviour described in equat2galactic.m, not its literal code.
+# In the Matlab function the block of the winter belt is commented out and no other branch keeps the
+# positions with galactic longitude in (163, 340], so all of them are removed whatever their latitude;
+# here they are kept with winter=False, and with winter=True only those with |beta| <= 8 are removed
+# (the Matlab block once activated). The galactic longitude is in [0, 360): lambda=360, kept by no
+# branch of the Matlab code, is the same as lambda=0 (first belt).
+#
+# The functions that can be used are:
+#
+# 1-"eq2000(ar, dec, jd)", equatorial coordinates of date to J2000 (degree)
+#
+# 2-"galactic(ar, dec)", galactic longitude and latitude of J2000 coordinates (degree)
+#
+# 3-"milky_way_mask(ar, dec, winter=False)", True for the positions outside the Milky Way belt
+#
+# 4-"milky_way_filter(columns, winter=False)", bulk filter of the measurements of a night
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import numpy as np
+
+# Epoca J2000.0
+JD_J2000=2451545.0
+
+# Polo nord galattico (J2000.0) e longitudine galattica del polo celeste nord (gradi)
+ALPHA_NGP=192.85
+DELTA_NGP=27.13
+L_NCP=122.89167
+
+# Fasce della Via Lattea: longitudine galattica (min, max] e latitudini [b_min, b_max] da escludere
+# (lambda è in [0, 360), la prima fascia include lambda=0)
+MILKY_WAY_BELTS=((-1.0, 109.0, -13.0, 13.0),      # Fra Cefeo e Sagittario
+                 (109.0, 163.0, -12.0, 5.0),      # Fra Perseo e Cassiopea
+                 (340.0, 360.0, -20.0, 20.0))     # Fra Scorpione e Ofiuco
+WINTER_BELT=(163.0, 340.0, -8.0, 8.0)             # Via Lattea invernale fra Auriga e Squadra
+
+#==================================================================================
+
+def eq2000(ar, dec, jd):
+
+    """
+    Transformation of the equatorial coordinates from the equinox of date jd to J2000.0, as EQ2EQ2000_B.m
+    (D. Boulet, Methods of orbit determination for microcomputer, 1991). Vectorized, jd can be an array.
+    Input:
+    ar, dec = coordinates of date (degree), jd = julian day of the equinox of date
+    Output:
+    ar2000, dec2000 = coordinates J2000.0 (degree)
+    """
+
+    ar=np.asarray(ar, dtype=float)
+    dec=np.asarray(dec, dtype=float)
+    t=(np.asarray(jd, dtype=float)-JD_J2000)/36525.0
+
+    m=1.28123227+0.000775867*(t/2)-0.000000077*(t*t/4)
+    n=0.55675303-0.000237030*(t/2)-0.000000060*(t*t/4)
+
+    # Tre iterazioni
+    ar_k, dec_k = ar, dec
+    for k in range(2):
+        ar1=ar-(m+n*np.sin(np.radians(ar_k))*np.tan(np.radians(dec_k)))*t
+        dec1=dec-(n*np.cos(np.radians(ar_k)))*t
+        ar_k, dec_k = (ar1+ar)/2, (dec1+dec)/2
+
+    ar2000=ar-(m+n*np.sin(np.radians(ar_k))*np.tan(np.radians(dec_k)))*t
+    dec2000=dec-(n*np.cos(np.radians(ar_k)))*t
+
+    return ar2000, dec2000
+
+#==================================================================================
+
+def galactic(ar, dec):
+
+    """
+    Galactic coordinates of equatorial J2000 coordinates, as equat2galactic.m.
+    Input:
+    ar, dec = RA and DEC J2000 (degree)
+    Output:
+    lambda in [0, 360), beta (degree)
+    """
+
+    ar=np.radians(np.asarray(ar, dtype=float)-ALPHA_NGP)
+    dec=np.radians(np.asarray(dec, dtype=float))
+    d_ngp=np.radians(DELTA_NGP)
+
+    sb=np.sin(d_ngp)*np.sin(dec)+np.cos(d_ngp)*np.cos(dec)*np.cos(ar)
+    y=np.cos(dec)*np.sin(ar)
+    x=np.cos(d_ngp)*np.sin(dec)-np.sin(d_ngp)*np.cos(dec)*np.cos(ar)
+
+    lam=np.mod(L_NCP-np.degrees(np.arctan2(y, x)), 360.0)
+    beta=np.degrees(np.arcsin(np.clip(sb, -1.0, 1.0)))
+
+    return lam, beta
+
+#==================================================================================
+
+def milky_way_mask(ar, dec, winter=False):
+
+    """
+    Positions outside the belt of the Milky Way.
+    Input:
+    ar, dec = RA and DEC J2000 (degree), winter = True to exclude also the winter Milky Way
+    Output:
+    boolean array, True for the positions outside the Milky Way
+    """
+
+    lam, beta = galactic(ar, dec)
+
+    outside=np.ones(lam.shape, dtype=bool)
+    for l_min, l_max, b_min, b_max in MILKY_WAY_BELTS+((WINTER_BELT,) if winter else ()):
+        inside=(lam > l_min) & (lam <= l_max) & (beta >= b_min) & (beta <= b_max)
+        outside=outside & ~inside
+
+    return outside
+
+#==================================================================================
+
+def milky_way_filter(columns, winter=False, ra='ra', dec='dec'):
+
+    """
+    Remove the measurements of a night inside the Milky Way. If no measurement survives the filter
+    all the measurements are kept (with a warning), as equat2galactic.m.
+    Input:
+    columns = dictionary of arrays with the same length (e.g. output of SST_association.read_streaks),
+    ra, dec = keys of the columns of RA and DEC J2000 (degree), winter = see milky_way_mask
+    Output:
+    dictionary with the filtered arrays, boolean array of the kept measurements
+    """
+
+    keep=milky_way_mask(columns[ra], columns[dec], winter)
+
+    if len(keep) > 0 and not keep.any():
+        print('Milky Way filter: no observations survived after Milky Way filter!')
+        print('Milky Way filter WARNING: filtering canceled - manual orbit computation recommended')
+        keep=np.ones(len(keep), dtype=bool)
+
+    return {key: np.asarray(value)[keep] for key, value in columns.items()}, keep
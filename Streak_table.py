@@ -0,0 +1,232 @@
+# Python library for the binary table of the satellite streaks of a night.
+#
+# SST_Astride_TDM.py writes the streaks in "Data_headers_streaks.txt", a text file made for the "readtable"
+# command of Matlab: a comma after every field, a line 'NaN,<tab>NaN' at the end of each frame and the
+# coordinates cut at 37 characters (the last digits of the declination are lost). The same measurements are
+# saved in "Data_streaks.fits", a FITS file with two binary tables:
+#
+# - FRAMES, one row per frame: FRAME (name of the WCS frame), DATE_OBS, OBJECT, EXPTIME (s), N_STREAKS,
+#   FIRST_STREAK (index of the first streak of the frame in STREAKS)
+# - STREAKS, one row per streak: FRAME_ID (row of the frame in FRAMES), X, Y (best fit center, pixel, origin 1),
+#   RA, DEC (degree, full double precision), quality of the contour and of the fit: AREA, SHAPE_FACTOR,
+#   RADIUS_DEVIATION (from ASTRiDE, NaN if not available), N_POINTS (points of the contour),
+#   FIT_OFFSET (distance in pixel between the best fit center and the center of the contour of ASTRiDE)
+#
+# The table is read with numpy arrays, without parsing text. The legacy text files are produced from the
+# frame records (see frame_record) or from the table, with the same format of the previous versions.
+#
+# The functions that can be used are:
+#
+# 1-"frame_record(frame, head, streaks)", per-frame record of the measurements (also saved in the night manifest)
+#
+# 2-"legacy_lines(record)", lines of "Data_headers_streaks.txt" of a frame
+#
+# 3-"center_lines(record)", lines of "streaks_center.txt" of a frame
+#
+# 4-"write_table(table_file, records)", save the records of a night in the FITS table
+#
+# 5-"read_table(table_file)", columns of the frames and of the streaks (numpy arrays)
+#
+# 6-"table_records(table_file)", records of the frames saved in the FITS table
+#
+# 7-"export_legacy(table_file, text_file, centers=False)", legacy text files from the FITS table
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import os
+
+import numpy as np
+from astropy.io import fits
+
+# Nome della tabella nella cartella delle immagini
+TABLE_NAME='Data_streaks.fits'
+
+# Versione del formato dei record (salvata nella tabella e nei parametri del manifest)
+VERSION=1
+
+# Colonne delle tracce: nome nel record, nome e formato FITS, unità
+STREAK_COLUMNS=(('x', 'X', 'D', 'pixel'),
+                ('y', 'Y', 'D', 'pixel'),
+                ('ra', 'RA', 'D', 'deg'),
+                ('dec', 'DEC', 'D', 'deg'),
+                ('area', 'AREA', 'D', 'pixel'),
+                ('shape_factor', 'SHAPE_FACTOR', 'D', ''),
+                ('radius_deviation', 'RADIUS_DEVIATION', 'D', ''),
+                ('n_points', 'N_POINTS', 'J', ''),
+                ('fit_offset', 'FIT_OFFSET', 'D', 'pixel'))
+
+#==================================================================================
+
+def frame_record(frame, head, streaks):
+
+    """
+    Record of the measurements of a frame, serializable with json.
+    Input:
+    frame = name of the WCS frame, head = header of the frame,
+    streaks = list of dictionaries of the streaks with the keys of STREAK_COLUMNS
+    Output:
+    dictionary with frame, date_obs, object, exptime and the columns of the streaks (lists)
+    """
+
+    record={'frame': frame, 'date_obs': head['DATE-OBS'], 'object': str(head['OBJECT']), 'exptime': head['EXPTIME']}
+    for key, name, form, unit in STREAK_COLUMNS:
+        record[key]=[(int(s[key]) if form == 'J' else float(s[key])) for s in streaks]
+
+    return record
+
+#==================================================================================
+
+def legacy_lines(record):
+
+    """
+    Lines of "Data_headers_streaks.txt" of a frame, as in the previous versions: header keys and coordinates
+    of each track cut at 37 characters and a final line with NaN coordinates, always added for each frame.
+    """
+
+    keys=record['date_obs']+','+' '+record['object']+','+' '+str(record['exptime'])+','+' '
+    lines=[keys+(str(ra)+','+" "+str(dec)+'\n')[0:37]+'\n' for ra, dec in zip(record['ra'], record['dec'])]
+
+    # Riga con AR e DEC NaN, scritta quando finiscono le tracce riconosciute da ASTRiDE
+    lines.append(keys+'NaN'+','+'\t'+'NaN'+'\n') # il carattere \t equivale a un tab
+
+    return lines
+
+#==================================================================================
+
+def center_lines(record):
+
+    """
+    Lines of "streaks_center.txt" of a frame: RA and DEC (degree) of the center of each track.
+    """
+
+    lines=['#    RA (deg)        DEC (deg)   \n']
+    lines.extend(str(ra)+','+" "+str(dec)+'\n' for ra, dec in zip(record['ra'], record['dec']))
+
+    return lines
+
+#==================================================================================
+
+def _string_column(name, values):
+
+    # Colonna di stringhe di lunghezza fissa (almeno 1 carattere)
+    width=max([len(v) for v in values]+[1])
+
+    return fits.Column(name=name, format=str(width)+'A', array=np.array(values, dtype='U'+str(width)))
+
+#==================================================================================
+
+def write_table(table_file, records):
+
+    """
+    Save the records of the frames of a night (see frame_record) in the FITS table, in the order of records.
+    The file is written in a temporary file and then renamed, so that a reader never finds a partial table.
+    """
+
+    n_streaks=np.array([len(r['ra']) for r in records], dtype=np.int32)
+    first=np.concatenate(([0], np.cumsum(n_streaks)[:-1])).astype(np.int64) if len(records) > 0 else n_streaks
+
+    frames=fits.BinTableHDU.from_columns([
+        _string_column('FRAME', [r['frame'] for r in records]),
+        _string_column('DATE_OBS', [r['date_obs'] for r in records]),
+        _string_column('OBJECT', [r['object'] for r in records]),
+        fits.Column(name='EXPTIME', format='D', unit='s', array=np.array([float(r['exptime']) for r in records])),
+        fits.Column(name='N_STREAKS', format='J', array=n_streaks),
+        fits.Column(name='FIRST_STREAK', format='K', array=first)], name='FRAMES')
+
+    columns=[fits.Column(name='FRAME_ID', format='J', array=np.repeat(np.arange(len(records), dtype=np.int32), n_streaks))]
+    for key, name, form, unit in STREAK_COLUMNS:
+        values=[v for r in records for v in r[key]]
+        columns.append(fits.Column(name=name, format=form, unit=unit or None,
+                                   array=np.array(values, dtype=np.int32 if form == 'J' else np.float64)))
+    streaks=fits.BinTableHDU.from_columns(columns, name='STREAKS')
+
+    primary=fits.PrimaryHDU()
+    primary.header['SSTTABLE']=('STREAKS', 'satellite streaks of a night')
+    primary.header['SSTVERS']=(VERSION, 'version of the format')
+
+    temp_file=table_file+'.tmp'
+    fits.HDUList([primary, frames, streaks]).writeto(temp_file, overwrite=True)
+    os.replace(temp_file, table_file)
+
+#==================================================================================
+
+def read_table(table_file):
+
+    """
+    Read the FITS table of the streaks.
+    Output:
+    frames = dictionary of arrays: frame, date_obs, object, exptime, n_streaks, first_streak
+    streaks = dictionary of arrays: frame_id and the keys of STREAK_COLUMNS, with date_obs, object and
+    exptime of the frame of each streak
+    """
+
+    with fits.open(table_file) as hdul:
+        table=hdul['FRAMES'].data
+        frames={'frame': np.asarray(table['FRAME'], dtype=str),
+                'date_obs': np.asarray(table['DATE_OBS'], dtype=str),
+                'object': np.asarray(table['OBJECT'], dtype=str),
+                'exptime': np.array(table['EXPTIME'], dtype=np.float64),
+                'n_streaks': np.array(table['N_STREAKS'], dtype=int),
+                'first_streak': np.array(table['FIRST_STREAK'], dtype=int)}
+
+        table=hdul['STREAKS'].data
+        streaks={'frame_id': np.array(table['FRAME_ID'], dtype=int)}
+        for key, name, form, unit in STREAK_COLUMNS:
+            streaks[key]=np.array(table[name], dtype=int if form == 'J' else np.float64)
+
+    for key in ('date_obs', 'object', 'exptime'):
+        streaks[key]=frames[key][streaks['frame_id']]
+
+    return frames, streaks
+
+#==================================================================================
+
+def table_records(table_file):
+
+    """
+    Records of the frames (see frame_record) of the FITS table, in the order of the table.
+    """
+
+    frames, streaks = read_table(table_file)
+
+    records=[]
+    for k in range(len(frames['frame'])):
+        rows=slice(frames['first_streak'][k], frames['first_streak'][k]+frames['n_streaks'][k])
+        record={'frame': str(frames['frame'][k]), 'date_obs': str(frames['date_obs'][k]),
+                'object': str(frames['object'][k]), 'exptime': float(frames['exptime'][k])}
+        for key, name, form, unit in STREAK_COLUMNS:
+            record[key]=streaks[key][rows].tolist()
+        records.append(record)
+
+    return records
+
+#==================================================================================
+
+def export_legacy(table_file, text_file, centers=False):
+
+    """
+    Write the legacy "Data_headers_streaks.txt" (text_file) from the FITS table, with the format read by BASP.m.
+    The exposure is saved in the table as a double: an integer EXPTIME of the header is written as e.g. '8.0'.
+    Input:
+    centers = True to write also "streaks_center.txt" in the folder of each frame
+    (the frame name without extension, in the folder of the table)
+    Output:
+    number of frames
+    """
+
+    records=table_records(table_file)
+
+    with open(text_file, 'w') as g:
+        for record in records:
+            g.writelines(legacy_lines(record))
+
+    if centers:
+        path0=os.path.dirname(os.path.abspath(table_file))
+        for record in records:
+            output_dir=os.path.join(path0, os.path.splitext(record['frame'])[0])
+            os.makedirs(output_dir, exist_ok=True)
+            with open(output_dir + '/streaks_center.txt', 'w') as ii:
+                ii.writelines(center_lines(record))
+
+    return len(records)
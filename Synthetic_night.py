@@ -0,0 +1,205 @@
+# Python library for the generation of synthetic SST nights.
+#
+# A synthetic night contains bias frames and science frames with a star field, injected satellite
+# streaks and the header keys used by the pipeline (DATE-OBS, OBJECT, EXPTIME, RA, DEC), saved as
+# unsigned 16 bit integers as the frames of the SST camera. The astrometric calibration with
+# solve-field can be replaced by "inject_wcs", that writes the _WCS_ frames with a TAN WCS built from
+# the RA and DEC of the header: no astrometry.net index files and no network are needed.
+#
+# The functions that can be used are:
+#
+# 1-"generate_night(work_dir, n_frames, size, n_bias, seed, compression)", bias and science frames of the night
+#   (plain or tile compressed without loss, see "Fits_io.py")
+#
+# 2-"inject_wcs(path0, name, ext, Ni, num_im)", _WCS_ frames from the calibrated frames
+#
+# The positions of the injected streaks are saved in "Synthetic_truth.json" in the folder of the night.
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+from astropy.io import fits
+from astropy.coordinates import Angle
+import astropy.units as u
+import numpy as np
+
+import datetime
+import json
+import os
+
+import Fits_io as fio
+
+# Nomi dei file della notte sintetica (come in BASP.m)
+PREFIX='SYN20261017'
+FIRST_FRAME=101                 # Numero della prima immagine scientifica
+
+# Parametri del rivelatore e del cielo
+BIAS_LEVEL=1000.0               # Livello medio del bias (ADU)
+READ_NOISE=8.0                  # Rumore di lettura (ADU)
+SKY_LEVEL=300.0                 # Fondo cielo (ADU)
+PIXEL_SCALE=1.0                 # Scala (arcsec/pixel)
+PSF_SIGMA=1.5                   # Sigma della PSF di stelle e tracce (pixel)
+N_STARS=300                     # Stelle per immagine
+N_STREAKS=(1, 3)                # Numero minimo e massimo di tracce per immagine
+STREAK_PEAK=(150.0, 600.0)      # Intervallo del picco delle tracce (ADU)
+EXPTIME=8.0                     # Tempo di esposizione (s)
+CADENCE=120.0                   # Intervallo fra le immagini (s)
+
+#==================================================================================
+
+def bias_pattern(size, rng):
+
+    """
+    Fixed structure of the bias: constant level plus a column pattern.
+    """
+
+    return BIAS_LEVEL+rng.normal(0, 3.0, size)[np.newaxis, :]*np.ones((size, 1))
+
+#==================================================================================
+
+def add_star(image, x, y, flux):
+
+    """
+    Add a gaussian star with total flux flux centred in (x, y).
+    """
+
+    r=int(4*PSF_SIGMA)+1
+    x1, x2 = max(int(x)-r, 0), min(int(x)+r+1, image.shape[1])
+    y1, y2 = max(int(y)-r, 0), min(int(y)+r+1, image.shape[0])
+    if x1 >= x2 or y1 >= y2:
+        return
+    yy, xx = np.mgrid[y1:y2, x1:x2]
+    image[y1:y2, x1:x2]+=flux/(2*np.pi*PSF_SIGMA**2)*np.exp(-((xx-x)**2+(yy-y)**2)/(2*PSF_SIGMA**2))
+
+#==================================================================================
+
+def add_streak(image, x1, y1, x2, y2, peak):
+
+    """
+    Add a streak from (x1, y1) to (x2, y2) with gaussian profile of height peak.
+    """
+
+    r=4*PSF_SIGMA
+    xa, xb = int(max(min(x1, x2)-r, 0)), int(min(max(x1, x2)+r+1, image.shape[1]))
+    ya, yb = int(max(min(y1, y2)-r, 0)), int(min(max(y1, y2)+r+1, image.shape[0]))
+    yy, xx = np.mgrid[ya:yb, xa:xb]
+
+    # Distanza dei pixel dal segmento
+    dx, dy = x2-x1, y2-y1
+    t=np.clip(((xx-x1)*dx+(yy-y1)*dy)/(dx*dx+dy*dy), 0, 1)
+    d2=(xx-x1-t*dx)**2+(yy-y1-t*dy)**2
+
+    image[ya:yb, xa:xb]+=peak*np.exp(-d2/(2*PSF_SIGMA**2))
+
+#==================================================================================
+
+def write_frame(file_to_save, image, head, compression='none'):
+
+    """
+    Save a frame as unsigned 16 bit integers (BZERO=32768), as the SST camera,
+    plain or tile compressed without loss.
+    """
+
+    data=np.clip(np.round(image), 0, 65535).astype(np.uint16)
+    fio.write_image(file_to_save, data, head, compression)
+
+#==================================================================================
+
+def generate_night(work_dir, n_frames, size, n_bias, seed=2026, compression='none'):
+
+    """
+    Create the bias and science frames of the synthetic night in work_dir: bias frames
+    PREFIX+'_BIAS_'+N+'.fit' with N from 1 and science frames PREFIX+'_'+N+'.fit' with N from FIRST_FRAME.
+    With compression = rice, hcompress or gzip the frames are tile compressed (without loss).
+    The arguments can also be strings (command line).
+    Output:
+    list of dictionaries with the injected streaks (frame, x1, y1, x2, y2, x_center, y_center)
+    """
+
+    n_frames, size, n_bias, seed = int(n_frames), int(size), int(n_bias), int(seed)
+    rng=np.random.default_rng(seed)
+    pattern=bias_pattern(size, rng)
+
+    head=fits.Header()
+    head['INSTRUME']='SYNTHETIC'
+    head['DETNAME']='SYNTHETIC'
+
+    for i in range(1, n_bias+1):
+        head['DATE-OBS']='2026-10-17'
+        head['EXPTIME']=0.0
+        head['IMAGETYP']='zero'
+        head['OBJECT']=' '
+        write_frame(os.path.join(work_dir, PREFIX+'_BIAS_'+str(i)+'.fit'),
+                    pattern+rng.normal(0, READ_NOISE, (size, size)), head, compression)
+
+    start=datetime.datetime(2026, 10, 17, 20, 0, 0)
+    ra0=Angle('19:09:57.4', unit=u.hourangle)
+    dec=Angle('-06:43:55.9', unit=u.deg)
+
+    truth=[]
+    for k in range(n_frames):
+        num=FIRST_FRAME+k
+        image=pattern+SKY_LEVEL+rng.normal(0, np.sqrt(READ_NOISE**2+SKY_LEVEL), (size, size))
+
+        for x, y, flux in zip(rng.uniform(0, size, N_STARS), rng.uniform(0, size, N_STARS),
+                              rng.lognormal(8.0, 1.0, N_STARS)):
+            add_star(image, x, y, flux)
+
+        for s in range(int(rng.integers(N_STREAKS[0], N_STREAKS[1]+1))):
+            length=rng.uniform(0.05, 0.3)*size
+            phi=rng.uniform(0, np.pi)
+            xc, yc = rng.uniform(0.2*size, 0.8*size, 2)
+            x1, y1 = xc-0.5*length*np.cos(phi), yc-0.5*length*np.sin(phi)
+            x2, y2 = xc+0.5*length*np.cos(phi), yc+0.5*length*np.sin(phi)
+            add_streak(image, x1, y1, x2, y2, rng.uniform(*STREAK_PEAK))
+            truth.append({'frame': num, 'x1': float(x1), 'y1': float(y1), 'x2': float(x2), 'y2': float(y2),
+                          'x_center': float(xc), 'y_center': float(yc)})
+
+        # Il telescopio è fermo: l'AR del centro cresce con il tempo siderale
+        date_obs=start+datetime.timedelta(seconds=k*CADENCE)
+        ra=ra0+Angle(k*CADENCE*1.00273791/3600.0, unit=u.hourangle)
+
+        head['DATE-OBS']=date_obs.isoformat(timespec='milliseconds')
+        head['EXPTIME']=EXPTIME
+        head['IMAGETYP']='object'
+        head['OBJECT']='44800'
+        head['RA']=ra.wrap_at(360*u.deg).to_string(unit=u.hourangle, sep=':', precision=1, pad=True)
+        head['DEC']=dec.to_string(unit=u.deg, sep=':', precision=1, pad=True, alwayssign=True)
+        write_frame(os.path.join(work_dir, PREFIX+'_'+str(num)+'.fit'), image, head, compression)
+
+    with open(os.path.join(work_dir, 'Synthetic_truth.json'), 'w') as f:
+        json.dump(truth, f, indent=1)
+
+    return truth
+
+#==================================================================================
+
+def inject_wcs(path0, name, ext, Ni, num_im):
+
+    """
+    Stage that replaces solve-field: for each calibrated frame path0+name+NNN+'_cal'+ext write
+    the frame path0+name+'WCS_'+NNN+ext with a TAN WCS centred on the RA and DEC of the header,
+    with the compression of the images of the pipeline (Fits_io.COMPRESSION).
+    """
+
+    for i in range(int(Ni), int(Ni)+int(num_im)):
+        file_to_open=path0+name+str(i)+'_cal'+ext
+        if not os.path.isfile(file_to_open):
+            continue
+
+        data, head = fio.read_image(file_to_open)
+
+        head['CTYPE1']='RA---TAN'
+        head['CTYPE2']='DEC--TAN'
+        head['CRVAL1']=Angle(head['RA'], unit=u.hourangle).deg
+        head['CRVAL2']=Angle(head['DEC'], unit=u.deg).deg
+        head['CRPIX1']=(data.shape[1]+1)/2.0
+        head['CRPIX2']=(data.shape[0]+1)/2.0
+        head['CD1_1']=-PIXEL_SCALE/3600.0
+        head['CD1_2']=0.0
+        head['CD2_1']=0.0
+        head['CD2_2']=PIXEL_SCALE/3600.0
+
+        fio.write_image(path0+name+'WCS_'+str(i)+ext, data, head)
+
+#==================================================================================
@@ -0,0 +1,340 @@
+# Python library for the local catalogue of the TLEs of the satellites.
+#
+# GEO_selector_astrometry_filter.m downloads from celestrak the TLE of each satellite, one request per
+# NORAD number, and uses the files "TLE_NORAD.txt" of the data folder when the download fails. The store
+# keeps instead all the TLEs imported from files (also big catalogues with thousands of satellites and
+# several epochs of the same satellite) indexed by NORAD number and epoch, so that the ephemeris of a night
+# can be computed offline with the TLE closest to each observation.
+# A TLE is stale when its epoch is more than max_age_days from the observation: stale TLEs are not used.
+#
+# The download is a source that can be replaced: a source is a function receiving a list of NORAD
+# numbers and returning the text of the TLEs found. "celestrak_source" downloads from celestrak,
+# "folder_source(folder)" reads the TLE files of a local folder (e.g. the files "TLE_NORAD.txt" or a
+# folder prepared for the tests). "refresh" asks the source only the satellites without a TLE in the store.
+#
+# The functions that can be used are:
+#
+# 1-"import_tle(files)", bulk import of TLE files or folders (name lines optional)
+#
+# 2-"closest(norad, mjd)", lines of the TLE closest to each observation (None if missing or stale)
+#
+# 3-"elements(norad, mjd)", SGP4 elements of the closest TLEs, for SGP4_ephemeris
+#
+# 4-"catalogue(mjd)", SGP4 elements of all the satellites with a TLE not stale at the epoch mjd
+#
+# 5-"refresh(norad, mjd, source)", import from a source the TLEs missing or stale in the store
+#
+# 6-"expire_store(before_mjd)", delete the TLEs with epoch before before_mjd
+#
+# The store is the SQLite file "tle_store.sqlite" in the store folder.
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import contextlib
+import glob
+import os
+import sqlite3
+import time
+import urllib.request
+
+import numpy as np
+
+import SGP4_ephemeris as se
+
+# Cartella di default del catalogo, accanto agli script e condivisa da tutte le notti.
+# La variabile d'ambiente SST_TLE_STORE seleziona un'altra cartella (es. per test e benchmark)
+STORE_PATH=os.environ.get('SST_TLE_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TLE_store'))
+
+STORE_NAME='tle_store.sqlite'
+
+# Massima distanza (giorni) fra l'epoca del TLE e l'osservazione
+MAX_AGE_DAYS=float(os.environ.get('SST_TLE_MAX_AGE_DAYS', '15'))
+
+# Query dei TLE di celestrak, un satellite per richiesta
+CELESTRAK_URL='https://celestrak.org/NORAD/elements/gp.php?FORMAT=TLE&CATNR='
+TIMEOUT_S=30
+
+#==================================================================================
+
+def _connect(store_path):
+
+    os.makedirs(store_path, exist_ok=True)
+    db=sqlite3.connect(os.path.join(store_path, STORE_NAME))
+    db.execute('CREATE TABLE IF NOT EXISTS tle (norad INTEGER, epoch_mjd REAL, name TEXT, line1 TEXT, line2 TEXT, '
+               'source TEXT, imported TEXT, PRIMARY KEY (norad, epoch_mjd))')
+
+    return db
+
+#==================================================================================
+
+@contextlib.contextmanager
+def _store(store_path):
+
+    # Connessione al catalogo, con commit alla fine del blocco
+    db=_connect(store_path)
+    try:
+        yield db
+        db.commit()
+    finally:
+        db.close()
+
+#==================================================================================
+
+def checksum_ok(line):
+
+    """
+    Check the modulo 10 checksum (last column) of a TLE line.
+    """
+
+    total=sum(int(c) if c.isdigit() else (1 if c == '-' else 0) for c in line[0:68])
+
+    return len(line) >= 69 and line[68].isdigit() and total % 10 == int(line[68])
+
+#==================================================================================
+
+def parse_tle(text, check=True):
+
+    """
+    TLEs of a text (e.g. a file or the answer of celestrak), with or without the name lines.
+    Input:
+    check = skip the TLEs with wrong checksum
+    Output:
+    list of (norad, epoch_mjd, name, line1, line2), number of skipped TLEs
+    """
+
+    lines=[line.rstrip() for line in text.splitlines() if line.strip()]
+
+    sets=[]
+    skipped=0
+    for k in range(len(lines)-1):
+        line1, line2 = lines[k], lines[k+1]
+        if not (line1.startswith('1 ') and line2.startswith('2 ')):
+            continue
+        name=lines[k-1].strip() if k > 0 and not lines[k-1].startswith(('1 ', '2 ')) else ''
+        if name.startswith('0 '):
+            name=name[2:]
+        try:
+            if check and not (checksum_ok(line1) and checksum_ok(line2)):
+                raise ValueError('checksum')
+            tle=se.tle_elements(line1, line2)
+        except ValueError:
+            skipped=skipped+1
+            continue
+        sets.append((tle['norad'], float(tle['epoch_mjd']), name, line1, line2))
+
+    return sets, skipped
+
+#==================================================================================
+
+def _insert(db, sets, source):
+
+    before=db.total_changes
+    imported=time.strftime('%Y-%m-%dT%H:%M:%S')
+    db.executemany('INSERT OR IGNORE INTO tle VALUES (?,?,?,?,?,?,?)',
+                   [(*tle, source, imported) for tle in sets])
+
+    return db.total_changes-before
+
+#==================================================================================
+
+def import_tle(files, store_path=STORE_PATH, check=True):
+
+    """
+    Bulk import of TLE files in the store. The TLEs already present (same NORAD and epoch) are ignored.
+    Input:
+    files = list of TLE files and folders (all the files *.txt and *.tle of a folder are imported)
+    check = skip the TLEs with wrong checksum
+    Output:
+    number of new TLEs, number of skipped TLEs
+    """
+
+    if isinstance(files, str):
+        files=[files]
+
+    names=[]
+    for file_name in files:
+        if os.path.isdir(file_name):
+            names.extend(sorted(glob.glob(os.path.join(file_name, '*.txt'))+glob.glob(os.path.join(file_name, '*.tle'))))
+        else:
+            names.append(file_name)
+
+    new=0
+    skipped=0
+    with _store(store_path) as db:
+        for file_name in names:
+            with open(file_name, errors='replace') as f:
+                sets, bad = parse_tle(f.read(), check)
+            new=new+_insert(db, sets, os.path.abspath(file_name))
+            skipped=skipped+bad
+
+    return new, skipped
+
+#==================================================================================
+
+def _candidates(db, norads):
+
+    # Tutti i TLE dei satelliti richiesti (norad, epoch_mjd, line1, line2)
+    rows=[]
+    norads=[int(n) for n in norads]
+    for k in range(0, len(norads), 500):
+        chunk=norads[k:k+500]
+        rows.extend(db.execute('SELECT norad, epoch_mjd, line1, line2 FROM tle WHERE norad IN (' +
+                               ','.join('?'*len(chunk)) + ')', chunk).fetchall())
+
+    return rows
+
+#==================================================================================
+
+def closest(norad, mjd, store_path=STORE_PATH, max_age_days=MAX_AGE_DAYS):
+
+    """
+    TLE of each observation: the TLE of the same satellite with the epoch closest to the observation.
+    Input:
+    norad, mjd = arrays (or scalars) with NORAD number and epoch (MJD) of the observations
+    max_age_days = maximum distance (days) between epoch of the TLE and observation
+    Output:
+    list with (line1, line2) for each observation, None if there is no TLE or the TLE is stale
+    """
+
+    norad=np.atleast_1d(norad).astype(int)
+    mjd=np.broadcast_to(np.atleast_1d(np.asarray(mjd, dtype=float)), norad.shape)
+
+    with _store(store_path) as db:
+        rows=_candidates(db, np.unique(norad))
+    if not rows:
+        return [None]*len(norad)
+
+    table={'norad': np.array([row[0] for row in rows]), 'epoch_mjd': np.array([row[1] for row in rows])}
+    k=se.closest_tle(table, norad, mjd)
+
+    result=[]
+    for i in range(len(norad)):
+        if k[i] < 0 or abs(table['epoch_mjd'][k[i]]-mjd[i]) > max_age_days:
+            result.append(None)
+        else:
+            result.append(rows[k[i]][2:4])
+
+    return result
+
+#==================================================================================
+
+def elements(norad, mjd, store_path=STORE_PATH, max_age_days=MAX_AGE_DAYS):
+
+    """
+    SGP4 elements of the TLEs closest to the observations (see closest), to be used with the
+    functions of SGP4_ephemeris with the same norad array.
+    Output:
+    elements (dictionary of arrays, one per different TLE), boolean array of the observations with a TLE
+    """
+
+    tles=closest(norad, mjd, store_path, max_age_days)
+    found=np.array([tle is not None for tle in tles])
+
+    unique=sorted(set(tle for tle in tles if tle is not None))
+    sets=[se.tle_elements(*tle) for tle in unique]
+    keys=('norad', 'epoch_mjd', 'xincl', 'xnodeo', 'eo', 'omegao', 'xmo', 'xno', 'bstar')
+
+    return {key: np.array([s[key] for s in sets]) for key in keys}, found
+
+#==================================================================================
+
+def catalogue(mjd, store_path=STORE_PATH, max_age_days=MAX_AGE_DAYS):
+
+    """
+    SGP4 elements of all the satellites of the store with a TLE not stale at the epoch mjd
+    (the TLE with the closest epoch for each satellite), e.g. the candidates of the association of the streaks.
+    Output:
+    elements (dictionary of arrays, one per satellite)
+    """
+
+    with _store(store_path) as db:
+        norads=[row[0] for row in db.execute('SELECT DISTINCT norad FROM tle')]
+
+    return elements(norads, mjd, store_path, max_age_days)[0]
+
+#==================================================================================
+
+def celestrak_source(norads):
+
+    """
+    Source downloading from celestrak the current TLE of each satellite.
+    Output:
+    text with the TLEs found
+    """
+
+    texts=[]
+    for norad in norads:
+        try:
+            with urllib.request.urlopen(CELESTRAK_URL+str(int(norad)), timeout=TIMEOUT_S) as answer:
+                text=answer.read().decode('ascii', errors='replace')
+        except OSError as error:
+            print('TLE store, warning: no TLE online for ' + str(norad) + ' satellite (' + str(error) + ')')
+            continue
+        if 'No GP data found' in text or 'No TLE found' in text:
+            print('TLE store, warning: no TLE online for ' + str(norad) + ' satellite')
+            continue
+        texts.append(text)
+
+    return '\n'.join(texts)
+
+#==================================================================================
+
+def folder_source(folder):
+
+    """
+    Source reading the TLEs from the files *.txt and *.tle of a local folder
+    (e.g. the files "TLE_NORAD.txt" used by GEO_selector_astrometry_filter.m).
+    Output:
+    source function
+    """
+
+    def source(norads):
+        texts=[]
+        for file_name in sorted(glob.glob(os.path.join(folder, '*.txt'))+glob.glob(os.path.join(folder, '*.tle'))):
+            with open(file_name, errors='replace') as f:
+                texts.append(f.read())
+        return '\n'.join(texts)
+
+    source.__name__='folder:'+os.path.abspath(folder)
+
+    return source
+
+#==================================================================================
+
+def refresh(norad, mjd, source=celestrak_source, store_path=STORE_PATH, max_age_days=MAX_AGE_DAYS):
+
+    """
+    Import from source the TLEs of the satellites without a TLE (or with a stale TLE) for at least one
+    of the observations. Only the TLEs of the requested satellites are imported.
+    Input:
+    norad, mjd = NORAD number and epoch (MJD) of the observations, source = see celestrak_source
+    Output:
+    number of new TLEs
+    """
+
+    norad=np.atleast_1d(norad).astype(int)
+    tles=closest(norad, mjd, store_path, max_age_days)
+    missing=sorted(set(int(n) for n, tle in zip(norad, tles) if tle is None))
+    if not missing:
+        return 0
+
+    sets, skipped = parse_tle(source(missing))
+    sets=[tle for tle in sets if tle[0] in missing]
+    with _store(store_path) as db:
+        new=_insert(db, sets, getattr(source, '__name__', 'source'))
+
+    return new
+
+#==================================================================================
+
+def expire_store(before_mjd, store_path=STORE_PATH):
+
+    """
+    Delete from the store the TLEs with epoch before before_mjd.
+    Output:
+    number of deleted TLEs
+    """
+
+    with _store(store_path) as db:
+        return db.execute('DELETE FROM tle WHERE epoch_mjd < ?', (float(before_mjd),)).rowcount
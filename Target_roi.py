@@ -0,0 +1,271 @@
+# Python library for the detection of the streak of the target satellite in a region of interest of the frame.
+#
+# The NORAD number of the target is the OBJECT key of the header. With the TLE of the target ("TLE_store.py"
+# or a TLE file) and the SGP4 ephemeris of "SGP4_ephemeris.py" the topocentric J2000 positions of the target
+# at the start and at the end of the exposure are computed for all the frames of a night in one pass. With
+# the WCS of the frame the positions give the predicted streak in pixel (ends, length and direction), and
+# ASTRiDE can analyse only a cutout around it instead of the whole frame: the detection time scales with
+# the area of the cutout.
+#
+# The margin around the predicted streak is adaptive: a fixed part (the association radius of
+# SST_association.py) grows with the distance between the epoch of the TLE and the frame (the error of the
+# SGP4 prediction grows with the age of the TLE) and with the apparent speed of the target (error of the
+# start time of the exposure). It is converted in pixel with the scale of the WCS of each frame.
+# If the cutout is not smaller than a fraction ROI_MAX_FRACTION of the frame, or it falls outside the frame,
+# the whole frame is analysed. The whole frame is analysed also when ASTRiDE finds no streak in the cutout
+# within the margin of the predicted streak (the detections in the cutout are other satellites or noise).
+#
+# The functions that can be used are:
+#
+# 1-"predict_frames(heads, tle, site)", J2000 positions of the target at the start and end of each exposure
+#
+# 2-"pixel_track(prediction, w)", ends, length and direction in pixel of the predicted streak
+#
+# 3-"roi_margin(prediction, track, w)", adaptive margin (pixel) around the predicted streak
+#
+# 4-"roi_box(track, margin, shape)", rows and columns of the cutout (None for the whole frame)
+#
+# 5-"cutout_file(file_to_open, box)", context manager giving a temporary fits file with the cutout
+#
+# 6-"track_distance(track, x, y)", distance (pixel) of points of the frame from the predicted streak
+#
+# 7-"tle_files(tle)", files with the TLEs of the predictions (for the night manifest)
+#
+# SST project, INAF-OAS
+# Version Oct 17, 2026
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+from astropy.wcs.utils import proj_plane_pixel_scales
+
+import Fits_io as fio
+import SGP4_ephemeris as se
+import SST_association as sa
+import TLE_store
+
+# Margine fisso intorno alla traccia prevista (arcsec), come il raggio di associazione di SST_association.py
+ROI_MARGIN_ARCSEC=120.0
+
+# Crescita del margine con l'età del TLE (arcsec/giorno)
+ROI_GROWTH_ARCSEC_PER_DAY=60.0
+
+# Incertezza del tempo di inizio esposizione (s), il margine cresce con la velocità apparente del satellite
+ROI_TIMING_S=1.0
+
+# Dimensione minima del ritaglio (pixel), per la stima del fondo cielo di ASTRiDE
+ROI_MIN_SIZE=128
+
+# Frazione massima dell'immagine per il ritaglio: oltre viene analizzata l'immagine intera
+ROI_MAX_FRACTION=0.5
+
+# Cartella degli script della pipeline (con "Settings_BASP.txt")
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+#==================================================================================
+
+def predict_frames(heads, tle='store', site=None):
+
+    """
+    Predicted positions of the target of each frame (NORAD number in OBJECT) at the start and at the end
+    of the exposure (DATE-OBS, EXPTIME), all the frames in one pass.
+    Input:
+    heads = list of headers (None for a frame without header), tle = 'store' for the local TLE store or
+    a TLE file, site = (longitude E, latitude, height) of the observer (default from "Settings_BASP.txt")
+    Output:
+    list with a dictionary for each frame: norad, ra, dec (J2000 degree, start and end of the exposure),
+    exptime (s), age_days (epoch of the frame - epoch of the TLE); None if the frame has no target or no
+    TLE not stale (see TLE_store.MAX_AGE_DAYS)
+    """
+
+    predictions=[None]*len(heads)
+
+    # Immagini con numero NORAD, data e tempo di esposizione
+    frames=[]
+    for k, head in enumerate(heads):
+        try:
+            frames.append((k, int(str(head['OBJECT']).strip()), str(head['DATE-OBS']), float(head['EXPTIME'])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not frames:
+        return predictions
+
+    index=np.array([f[0] for f in frames])
+    norad=np.array([f[1] for f in frames])
+    exptime=np.array([f[3] for f in frames])
+    mjd_start=sa.mid_exposure([f[2] for f in frames], np.zeros(len(frames)))
+    mjd_end=sa.mid_exposure([f[2] for f in frames], 2*exptime)
+    mjd_mid=(mjd_start+mjd_end)/2
+
+    # TLE del satellite più vicino all'epoca di ogni immagine
+    if tle == 'store':
+        elements, found = TLE_store.elements(norad, mjd_mid)
+    else:
+        elements=se.read_tle(tle)
+        k=se.closest_tle(elements, norad, mjd_mid)
+        found=(k >= 0) & (np.abs(elements['epoch_mjd'][k]-mjd_mid) <= TLE_store.MAX_AGE_DAYS)
+    if not np.any(found):
+        return predictions
+
+    if site is None:
+        site=se.read_site(os.path.join(SCRIPT_DIR, 'Settings_BASP.txt'))
+
+    # Inizio e fine esposizione di tutte le immagini in un solo calcolo
+    n=int(np.sum(found))
+    ra, dec = se.ephemeris_j2000(elements, np.concatenate((mjd_start[found], mjd_end[found])), site,
+                                 norad=np.concatenate((norad[found], norad[found])), jd_ref='each')
+    age=mjd_mid[found]-elements['epoch_mjd'][se.closest_tle(elements, norad[found], mjd_mid[found])]
+
+    for j, i in enumerate(np.flatnonzero(found)):
+        predictions[index[i]]={'norad': int(norad[i]), 'ra': [float(ra[j]), float(ra[n+j])],
+                               'dec': [float(dec[j]), float(dec[n+j])], 'exptime': float(exptime[i]),
+                               'age_days': float(age[j])}
+
+    return predictions
+
+#==================================================================================
+
+def pixel_track(prediction, w):
+
+    """
+    Predicted streak in pixel (origin 0, as the numpy indices of the frame).
+    Input:
+    prediction = see predict_frames, w = WCS of the frame
+    Output:
+    dictionary with x, y (start and end of the exposure), length (pixel) and angle (degree, from the x axis),
+    None if the positions cannot be projected
+    """
+
+    x, y = w.wcs_world2pix(np.array(prediction['ra']), np.array(prediction['dec']), 0)
+    if not (np.all(np.isfinite(x)) and np.all(np.isfinite(y))):
+        return None
+
+    return {'x': [float(x[0]), float(x[1])], 'y': [float(y[0]), float(y[1])],
+            'length': float(np.hypot(x[1]-x[0], y[1]-y[0])),
+            'angle': float(np.degrees(np.arctan2(y[1]-y[0], x[1]-x[0])))}
+
+#==================================================================================
+
+def roi_margin(prediction, track, w):
+
+    """
+    Adaptive margin (pixel) around the predicted streak: ROI_MARGIN_ARCSEC, plus ROI_GROWTH_ARCSEC_PER_DAY
+    for each day between the epoch of the TLE and the frame, plus the motion of the target in ROI_TIMING_S.
+    """
+
+    scale=float(np.mean(proj_plane_pixel_scales(w.celestial)))*3600.0   # arcsec/pixel
+    rate=track['length']/prediction['exptime'] if prediction['exptime'] > 0 else 0.0
+
+    return (ROI_MARGIN_ARCSEC+ROI_GROWTH_ARCSEC_PER_DAY*abs(prediction['age_days']))/scale+rate*ROI_TIMING_S
+
+#==================================================================================
+
+def roi_box(track, margin, shape):
+
+    """
+    Cutout around the predicted streak with the margin, at least ROI_MIN_SIZE pixel per side,
+    limited to the frame.
+    Input:
+    track = see pixel_track, margin = pixel, shape = (rows, columns) of the frame
+    Output:
+    (first row, last row+1, first column, last column+1), None if the cutout is outside the frame or
+    larger than ROI_MAX_FRACTION of the frame (the whole frame is analysed)
+    """
+
+    nrows, ncols = shape
+    limits=[]
+    for values, size in ((track['y'], nrows), (track['x'], ncols)):
+        low, high = min(values)-margin, max(values)+margin
+        # Allargamento simmetrico fino alla dimensione minima
+        if high-low < ROI_MIN_SIZE:
+            center=(low+high)/2
+            low, high = center-ROI_MIN_SIZE/2, center+ROI_MIN_SIZE/2
+        low, high = max(int(np.floor(low)), 0), min(int(np.ceil(high)), size)
+        if low >= high:
+            return None
+        limits.extend((low, high))
+
+    if (limits[1]-limits[0])*(limits[3]-limits[2]) > ROI_MAX_FRACTION*nrows*ncols:
+        return None
+
+    return tuple(limits)
+
+#==================================================================================
+
+@contextlib.contextmanager
+def cutout_file(file_to_open, box, folder=None):
+
+    """
+    Temporary plain fits file with the cutout box of a frame (plain or compressed), with the same name
+    of the frame in a new temporary folder (see Fits_io.plain_file). Only the pixels (or tiles) of the cutout are read.
+    CRPIX of the header is moved to the cutout, so that the WCS of the cutout is still valid.
+    """
+
+    r0, r1, c0, c1 = box
+
+    temp_dir=tempfile.mkdtemp(prefix='sst_roi_', dir=folder)
+    temp_file=os.path.join(temp_dir, os.path.basename(file_to_open))
+    try:
+        with fits.open(file_to_open) as hdul:
+            hdu=fio.image_hdu(hdul)
+            head=fio.primary_header(hdu.header)
+            # Immagine non compressa e senza scaling: memmap, sono letti solo i blocchi del ritaglio
+            if isinstance(hdu, fits.CompImageHDU) or 'BZERO' in head or 'BSCALE' in head:
+                data=hdu.section[r0:r1, c0:c1]
+            else:
+                data=np.array(hdu.data[r0:r1, c0:c1])
+        if 'CRPIX1' in head and 'CRPIX2' in head:
+            head['CRPIX1']=head['CRPIX1']-c0
+            head['CRPIX2']=head['CRPIX2']-r0
+        fits.writeto(temp_file, data, head, overwrite=True)
+        yield temp_file
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+#==================================================================================
+
+def track_distance(track, x, y):
+
+    """
+    Distance (pixel) of the points x, y of the frame (origin 0, as pixel_track) from the segment of the
+    predicted streak.
+    Input:
+    track = see pixel_track, x, y = arrays of pixel coordinates
+    Output:
+    array of the distances
+    """
+
+    x=np.asarray(x, dtype=float)
+    y=np.asarray(y, dtype=float)
+    x1, x2 = track['x']
+    y1, y2 = track['y']
+    dx, dy = x2-x1, y2-y1
+
+    # Proiezione dei punti sul segmento, limitata agli estremi
+    length2=dx*dx+dy*dy
+    t=np.clip(((x-x1)*dx+(y-y1)*dy)/length2, 0, 1) if length2 > 0 else np.zeros_like(x)
+
+    return np.hypot(x-(x1+t*dx), y-(y1+t*dy))
+
+#==================================================================================
+
+def tle_files(tle):
+
+    """
+    Files with the TLEs used by predict_frames, whose content must be part of the inputs of cached results.
+    Input:
+    tle = 'store' for the local TLE store or a TLE file
+    Output:
+    list with the TLE file or the database of the TLE store (empty if the store does not exist yet)
+    """
+
+    if tle != 'store':
+        return [tle]
+
+    store_file=os.path.join(TLE_store.STORE_PATH, TLE_store.STORE_NAME)
+
+    return [store_file] if os.path.isfile(store_file) else []
@@ -2,7 +2,8 @@
 # 
 # There are 5 possible functions that can be used:
 #
-# 1-With the function "track_center_superellipse(x, y)" the best fit is made with a superellipse with n=6 (slow method) 
+# 1-With the function "track_center_superellipse(x, y)" the best fit is made with a superellipse with n=6. The grid search is
+# evaluated with array operations (or, with method='lsq', replaced by a least squares fit) and the plot is optional.
 #
 # 2-With the function "track_center(x, y)" the median of the 4 independent sides of the track is first calculated to smooth the perimeter
 # and then find the center of the trace thus obtained.
@@ -19,6 +20,12 @@
 #
 # The other functions of this library support those listed above.
 #
+# The functions "fit_ellipse_batch", "cart_to_pol_batch" and "ellipse_params_batch" fit the ellipses of
+# many contours at once (e.g. all the tracks of a frame) and flag the degenerate contours instead of raising.
+#
+# matplotlib and scipy are imported only by the functions that need them (plot=True and method='lsq'),
+# so that importing the library in the pipeline does not load them.
+#
 # Input:
 # Vectors of the x and y coordinates in pixels of the track to fit
 #
@@ -26,12 +33,10 @@
 # Best track center in pixels
 #
 # Albino Carbognani, INAF-OAS
-# Version Feb 07, 2023
+# Version Oct 17, 2026
 
 import numpy as np
-import matplotlib.pyplot as plt
 import statistics
-from scipy.signal import savgol_filter
 
 #==================================================================================
 
@@ -128,6 +133,225 @@ def cart_to_pol(coeffs):
 
 #==================================================================================
 
+def pack_contours(xs, ys):
+
+    """
+    Pack a list of contours in the ragged format used by the batch functions.
+    Input:
+    xs, ys = lists of the x and y arrays of each contour
+    Output:
+    x, y = concatenated points; offsets = start index of each contour plus the total
+    number of points, so that contour i is x[offsets[i]:offsets[i+1]]
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    lengths=[len(xi) for xi in xs]
+    offsets=np.concatenate(([0], np.cumsum(lengths))).astype(int)
+
+    if len(xs) == 0:
+        return np.zeros(0), np.zeros(0), offsets
+
+    x=np.concatenate([np.asarray(xi, dtype=float) for xi in xs])
+    y=np.concatenate([np.asarray(yi, dtype=float) for yi in ys])
+
+    return x, y, offsets
+
+#==================================================================================
+
+def fit_ellipse_batch(x, y, offsets):
+
+    """
+    Fit an ellipse to each contour of a ragged collection, as fit_ellipse does for a single
+    contour, with all the 3x3 systems and eigenproblems solved in stacked linear algebra.
+    Each contour is centred and scaled before the fit, a better conditioned least squares problem
+    than fit_ellipse on the pixel coordinates: the ellipses are close to those of fit_ellipse but not
+    identical (on the same contour the centers typically differ by ~1e-3 pixel and the semi-axes by
+    ~0.1 pixel, more where fit_ellipse is badly conditioned). The coefficients are given in the pixel
+    coordinates, normalized differently from fit_ellipse.
+    Input:
+    x, y, offsets = concatenated points and offsets of the contours (see pack_contours)
+    Output:
+    coeffs = array (n_contours, 6) of the conic coefficients a, b, c, d, e, f (NaN if not valid)
+    valid = boolean array, False for degenerate contours (less than 6 points, singular
+    scatter matrix or no unique elliptical solution)
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    x=np.asarray(x, dtype=float)
+    y=np.asarray(y, dtype=float)
+    offsets=np.asarray(offsets, dtype=int)
+    n_contours=len(offsets)-1
+
+    coeffs=np.full((n_contours, 6), np.nan)
+    lengths=np.diff(offsets)
+    valid=lengths >= 6
+    if not valid.any():
+        return coeffs, valid
+
+    # Sums over the points of each contour: reduceat only on the non-empty contours (a repeated or
+    # out of range start would change the sums of the neighbours), 0 for the empty ones
+    nonempty=lengths > 0
+    starts=offsets[:-1][nonempty]
+    n=np.maximum(lengths, 1)
+
+    def contour_sums(values):
+        sums=np.zeros(values.shape[:-1]+(n_contours,))
+        sums[..., nonempty]=np.add.reduceat(values, starts, axis=-1)
+        return sums
+
+    # Each contour is centred and scaled before the fit: with the pixel coordinates the
+    # scatter matrix is badly conditioned and the sign of the constraint can be wrong
+    mx=contour_sums(x)/n
+    my=contour_sums(y)/n
+    xc=x-np.repeat(mx, lengths)
+    yc=y-np.repeat(my, lengths)
+    scale=np.sqrt(contour_sums(xc*xc+yc*yc)/n)
+    scale[~(scale > 0)]=1.0
+    xc=xc/np.repeat(scale, lengths)
+    yc=yc/np.repeat(scale, lengths)
+
+    # Scatter matrix D^T D of each contour with D = [x^2, xy, y^2, x, y, 1]: its elements are
+    # the sums of the 15 monomials x^i y^j with i+j <= 4
+    powers=[(2, 0), (1, 1), (0, 2), (1, 0), (0, 1), (0, 0)]
+    monomials=sorted(set((i1+i2, j1+j2) for i1, j1 in powers for i2, j2 in powers))
+    xp=[np.ones(len(xc)), xc, xc*xc, xc*xc*xc, xc*xc*xc*xc]
+    yp=[np.ones(len(yc)), yc, yc*yc, yc*yc*yc, yc*yc*yc*yc]
+    terms=np.empty((len(monomials), len(xc)))
+    for k, (i, j) in enumerate(monomials):
+        np.multiply(xp[i], yp[j], out=terms[k])
+    sums=contour_sums(terms).T
+    position={m: k for k, m in enumerate(monomials)}
+    S=np.empty((n_contours, 6, 6))
+    for r, (i1, j1) in enumerate(powers):
+        for c, (i2, j2) in enumerate(powers):
+            S[:, r, c]=sums[:, position[(i1+i2, j1+j2)]]
+
+    S1=S[:, 0:3, 0:3]
+    S2=S[:, 0:3, 3:6]
+    S3=S[:, 3:6, 3:6]
+
+    # Singular S3 (e.g. collinear points) cannot be inverted
+    with np.errstate(all='ignore'):
+        valid&=np.linalg.cond(S3) < 1e15
+    index=np.nonzero(valid)[0]
+    if len(index) == 0:
+        return coeffs, valid
+
+    T=-np.linalg.inv(S3[index]) @ np.transpose(S2[index], (0, 2, 1))
+    M=S1[index] + S2[index] @ T
+    C=np.array(((0, 0, 2), (0, -1, 0), (2, 0, 0)), dtype=float)
+    M=np.linalg.inv(C) @ M
+    eigval, eigvec=np.linalg.eig(M)
+
+    # Elliptical solution: real eigenvector with 4ac - b^2 > 0, it must be unique
+    real=np.abs(np.imag(eigvec)).max(axis=1) == 0
+    eigvec=np.real(eigvec)
+    con=4*eigvec[:, 0, :]*eigvec[:, 2, :] - eigvec[:, 1, :]**2
+    good=(con > 0) & real
+    unique=good.sum(axis=1) == 1
+
+    column=np.argmax(good, axis=1)
+    ak=eigvec[np.arange(len(index)), :, column]
+    A, B, Cc = ak[:, 0], ak[:, 1], ak[:, 2]
+    Dd, E, F = (T @ ak[:, :, np.newaxis])[:, :, 0].T
+
+    # Coefficients in the pixel coordinates
+    x0, y0, s = mx[index], my[index], scale[index]
+    coeffs[index, 0]=A/s**2
+    coeffs[index, 1]=B/s**2
+    coeffs[index, 2]=Cc/s**2
+    coeffs[index, 3]=Dd/s - (2*A*x0 + B*y0)/s**2
+    coeffs[index, 4]=E/s - (2*Cc*y0 + B*x0)/s**2
+    coeffs[index, 5]=F - (Dd*x0 + E*y0)/s + (A*x0**2 + B*x0*y0 + Cc*y0**2)/s**2
+
+    valid[index[~unique]]=False
+    coeffs[~valid]=np.nan
+
+    return coeffs, valid
+
+#==================================================================================
+
+def cart_to_pol_batch(coeffs, valid=None):
+
+    """
+    Convert the conic coefficients of many ellipses to the ellipse parameters, as cart_to_pol
+    does for a single ellipse. Instead of raising ValueError, the coefficients that do not
+    represent an ellipse are flagged as not valid.
+    Input:
+    coeffs = array (n, 6) of the coefficients a, b, c, d, e, f; valid = optional boolean array
+    Output:
+    x0, y0, ap, bp, e, phi = arrays of the ellipse parameters (NaN if not valid), valid = boolean array
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    coeffs=np.asarray(coeffs, dtype=float).reshape(-1, 6)
+    if valid is None:
+        valid=np.ones(len(coeffs), dtype=bool)
+    valid=valid & np.all(np.isfinite(coeffs), axis=1)
+
+    a = coeffs[:, 0]
+    b = coeffs[:, 1] / 2
+    c = coeffs[:, 2]
+    d = coeffs[:, 3] / 2
+    f = coeffs[:, 4] / 2
+    g = coeffs[:, 5]
+
+    with np.errstate(all='ignore'):
+        den = b**2 - a*c
+        valid&=den < 0
+
+        # The location of the ellipse centre.
+        x0, y0 = (c*d - b*f) / den, (a*f - b*d) / den
+
+        num = 2 * (a*f**2 + c*d**2 + g*b**2 - 2*b*d*f - a*c*g)
+        fac = np.sqrt((a - c)**2 + 4*b**2)
+        # The semi-major and semi-minor axis lengths (these are not sorted).
+        ap = np.sqrt(num / den / (fac - a - c))
+        bp = np.sqrt(num / den / (-fac - a - c))
+        valid&=np.isfinite(ap) & np.isfinite(bp)
+
+        # Sort the semi-major and semi-minor axis lengths but keep track of
+        # the original relative magnitudes of width and height.
+        width_gt_height = ap >= bp
+        ap, bp = np.where(width_gt_height, ap, bp), np.where(width_gt_height, bp, ap)
+
+        # The eccentricity.
+        r = (bp/ap)**2
+        r = np.where(r > 1, 1/r, r)
+        e = np.sqrt(1 - r)
+
+        # The angle of anticlockwise rotation of the major-axis from x-axis.
+        phi = np.arctan((2.*b) / (a - c)) / 2
+        phi = np.where(a > c, phi + np.pi/2, phi)
+        phi = np.where(b == 0, np.where(a < c, 0, np.pi/2), phi)
+        # Ensure that phi is the angle to rotate to the semi-major axis.
+        phi = np.where(width_gt_height, phi, phi + np.pi/2)
+        phi = phi % np.pi
+
+    params=[np.where(valid, p, np.nan) for p in (x0, y0, ap, bp, e, phi)]
+
+    return (*params, valid)
+
+#==================================================================================
+
+def ellipse_params_batch(xs, ys):
+
+    """
+    Best fit ellipse parameters of a list of contours (e.g. all the tracks of a frame).
+    Input:
+    xs, ys = lists of the x and y arrays of each contour
+    Output:
+    x0, y0, ap, bp, e, phi = arrays of the ellipse parameters, valid = False for degenerate contours
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    x, y, offsets = pack_contours(xs, ys)
+    coeffs, valid = fit_ellipse_batch(x, y, offsets)
+
+    return cart_to_pol_batch(coeffs, valid)
+
+#==================================================================================
+
 def get_ellipse_pts(params, npts=200, tmin=0, tmax=2*np.pi):
 
     """
@@ -192,19 +416,55 @@ def smooth_superellipse_pts(params, X, Y):
     X1=((X-x0)*np.cos(phi)+(Y-y0)*np.sin(phi))/ap;
     Y1=((Y-y0)*np.cos(phi)-(X-x0)*np.sin(phi))/bp;
     Q=(X1*X1*X1*X1*X1*X1 + Y1*Y1*Y1*Y1*Y1*Y1 - 1);
-    j=0
-    X2=[]
-    Y2=[]
-    for i in range(0, len(Q)):
-        if Q[i] < 4.0:
-           X2.insert(j, X[i])
-           Y2.insert(j, Y[i])
-           j=j+1 
+
+    # Points near the superellipse
+    near=Q < 4.0
+    X2=np.asarray(X)[near]
+    Y2=np.asarray(Y)[near]
 
     return X2, Y2
 
 #==================================================================================
 
+def border_masks(X1, Y1):
+
+    """
+    Boolean masks of the 4 borders of a track in the canonical system.
+    Input:
+    X1, Y1 = track's border in the canonical system (major axis along x)
+
+    Output:
+    up, do, le, ri = masks of the up, down, left and right borders
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    MX1=0.96*X1.max()
+    mX1=0.96*X1.min()
+
+    middle=(X1 > mX1) & (X1 < MX1)
+    up=middle & (Y1 > 0)
+    do=middle & (Y1 < 0)
+    le=X1 <= mX1
+    ri=X1 >= MX1
+
+    return up, do, le, ri
+
+#==================================================================================
+
+def border_median(values):
+
+    """
+    Median of a border, raising statistics.StatisticsError for an empty border
+    as statistics.median does.
+    """
+
+    if len(values) == 0:
+        raise statistics.StatisticsError('no median for empty data')
+
+    return np.median(values)
+
+#==================================================================================
+
 def smooth_borders_median(params, X, Y):
 
     """
@@ -215,86 +475,47 @@ def smooth_borders_median(params, X, Y):
     Output:
     X, Y = track's border
     A. Carbognani, INAF-OAS, Feb 07, 2023
+    Vectorized version, Oct 17, 2026
     """
 
     x0, y0, phi = params
 
+    X=np.asarray(X, dtype=float)
+    Y=np.asarray(Y, dtype=float)
+
     # Reduction to canonical ellipse system (a=b=1)
     X1=((X-x0)*np.cos(phi)+(Y-y0)*np.sin(phi));
     Y1=((Y-y0)*np.cos(phi)-(X-x0)*np.sin(phi));
         
     # Separate track's borders
-    Yup=[]
-    Ydo=[]
-    Xle=[]
-    Xri=[]
-    j=k=l=m=0
-    MX1=0.96*max(X1)
-    mX1=0.96*min(X1)
-
-    for i in range(0, len(X1)):
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
-           Yup.insert(j, Y1[i])
-           j=j+1
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
-           Ydo.insert(k, Y1[i])
-           k=k+1
-        if X1[i] >= min(X1) and X1[i] <= mX1:
-           Xle.insert(l, X1[i])
-           l=l+1
-        if X1[i] >= MX1 and X1[i] <= max(X1):
-           Xri.insert(l, X1[i])
-           m=m+1
+    up, do, le, ri = border_masks(X1, Y1)
 
     # Compute borders's median values
-    med_up=statistics.median(Yup)
-    med_do=statistics.median(Ydo)
-    med_le=statistics.median(Xle)
-    med_ri=statistics.median(Xri)
+    med_up=border_median(Y1[up])
+    med_do=border_median(Y1[do])
+    med_le=border_median(X1[le])
+    med_ri=border_median(X1[ri])
 
     # Computer track's center in canonical system
     Xc=(med_le+med_ri)/2.0
     Yc=(med_up+med_do)/2.0
-        
-    # Compute median borders
-    #for i in range(0, len(X1)):
-    #    if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
-    #       Y1[i]=med_up
-    #    if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
-    #       Y1[i]=med_do
-    #    if X1[i] >= min(X1) and X1[i] <= mX1:
-    #       X1[i]=med_le
-    #    if X1[i] >= MX1 and X1[i] <= max(X1):
-    #       X1[i]=med_ri
 
     # Compute median borders
+    n_x=int(abs(med_le-med_ri))
+    n_y=10*int(abs(med_up-med_do))
 
-    # Define median array
-    Y1u=[]
-    X1u=[]
-    Y1d=[]
-    X1d=[]
-
-    X1l=[]
-    Y1l=[]
-    X1r=[]
-    Y1r=[]
-
-    for i in range(0, int(abs(med_le-med_ri))):
-           Y1u.insert(i, med_up)
-           X1u.insert(i, med_le+i)
-           Y1d.insert(i, med_do)
-           X1d.insert(i, med_le+i)
-
-    for i in range(0, 10*int(abs(med_up-med_do))):
-           X1l.insert(i, med_le)
-           Y1l.insert(i, med_do+i/10)
-           X1r.insert(i, med_ri)
-           Y1r.insert(i, med_do+i/10)
-
-    # Conversion from list to array
-    X1=np.array(X1u+X1r+X1d+X1l)
-    Y1=np.array(Y1u+Y1r+Y1d+Y1l)
+    X1u=med_le+np.arange(n_x)
+    Y1u=np.full(n_x, med_up)
+    X1d=X1u
+    Y1d=np.full(n_x, med_do)
+
+    X1l=np.full(n_y, med_le)
+    Y1l=med_do+np.arange(n_y)/10
+    X1r=np.full(n_y, med_ri)
+    Y1r=Y1l
+
+    X1=np.concatenate((X1u, X1r, X1d, X1l))
+    Y1=np.concatenate((Y1u, Y1r, Y1d, Y1l))
 
     # Smooth borders rotation and translation to put in non-canonical system
     X2 = x0 + X1 * np.cos(phi) - Y1 * np.sin(phi)
@@ -318,89 +539,45 @@ def smooth_borders_median2(params, X, Y):
     Output:
     Xn, Yn = No-outliers track's border
     A. Carbognani, INAF-OAS, Aug 03, 2022
+    Vectorized version, Oct 17, 2026
     """
 
     x0, y0, phi = params
 
+    X=np.asarray(X, dtype=float)
+    Y=np.asarray(Y, dtype=float)
+
     # Reduction to canonical ellipse system (a=b=1)
     X1=((X-x0)*np.cos(phi)+(Y-y0)*np.sin(phi));
     Y1=((Y-y0)*np.cos(phi)-(X-x0)*np.sin(phi));
         
     # Separate track's borders
-    Yup=[]
-    Ydo=[]
-    Xle=[]
-    Xri=[]
-    j=k=l=m=0
-    MX1=0.96*max(X1)
-    mX1=0.96*min(X1)
-
-    for i in range(0, len(X1)):
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
-           Yup.insert(j, Y1[i])
-           j=j+1
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
-           Ydo.insert(k, Y1[i])
-           k=k+1
-        if X1[i] >= min(X1) and X1[i] <= mX1:
-           Xle.insert(l, X1[i])
-           l=l+1
-        if X1[i] >= MX1 and X1[i] <= max(X1):
-           Xri.insert(l, X1[i])
-           m=m+1
+    up, do, le, ri = border_masks(X1, Y1)
 
     # Compute borders's median values
-    med_up=statistics.median(Yup)
-    med_do=statistics.median(Ydo)
-    med_le=statistics.median(Xle)
-    med_ri=statistics.median(Xri)
+    med_up=border_median(Y1[up])
+    med_do=border_median(Y1[do])
+
+    # The left and right medians are not used, but an empty left or right border
+    # still raises statistics.StatisticsError as in the previous version
+    if not (np.any(le) and np.any(ri)):
+        raise statistics.StatisticsError('no median for empty data')
 
     # Compute sigma for track's border up and down (in canonical system)
-    sigma_up=[]
-    sigma_do=[]
-    j=k=0
-    for i in range(0, len(X1)):
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
-            sigma_up.insert(j, (Y1[i]-med_up)*(Y1[i]-med_up))
-            j=j+1
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
-            sigma_do.insert(k, (Y1[i]-med_do)*(Y1[i]-med_do))
-            k=k+1
-
-    Sigma_up=np.sqrt(sum(sigma_up)/len(sigma_up))
-    Sigma_do=np.sqrt(sum(sigma_do)/len(sigma_do))
+    # The squares are summed in sequence (as the builtin sum) so that the outliers cut
+    # is exactly the same of the previous version.
+    sigma_up=(Y1[up]-med_up)*(Y1[up]-med_up)
+    sigma_do=(Y1[do]-med_do)*(Y1[do]-med_do)
+
+    Sigma_up=np.sqrt(np.add.accumulate(sigma_up)[-1]/len(sigma_up))
+    Sigma_do=np.sqrt(np.add.accumulate(sigma_do)[-1]/len(sigma_do))
     
-    # Erase outliers and save new track's border
-    Yn=[]
-    Xn=[]
-    j=0
-
-    for i in range(0, len(X1)):   
-        if X1[i] >= min(X1) and X1[i] <= mX1:
-           Xn.insert(j, X1[i])
-           Yn.insert(j, Y1[i])
-           j=j+1    
-
-    for i in range(0, len(X1)):
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0 and abs(Y1[i]-med_up) < 1.0*Sigma_up:
-           Yn.insert(j, Y1[i])
-           Xn.insert(j, X1[i])
-           j=j+1
-
-    for i in range(0, len(X1)):   
-        if X1[i] >= MX1 and X1[i] <= max(X1):
-           Xn.insert(j, X1[i])
-           Yn.insert(j, Y1[i])
-           j=j+1
-
-    for i in range(0, len(X1)):
-        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0 and abs(Y1[i]-med_do) < 1.0*Sigma_do:
-           Yn.insert(j, Y1[i])
-           Xn.insert(j, X1[i])
-           j=j+1
-
-    Xn=np.array(Xn)
-    Yn=np.array(Yn)
+    # Erase outliers and save new track's border (left, up, right and down border)
+    up_in=up & (np.abs(Y1-med_up) < 1.0*Sigma_up)
+    do_in=do & (np.abs(Y1-med_do) < 1.0*Sigma_do)
+
+    Xn=np.concatenate((X1[le], X1[up_in], X1[ri], X1[do_in]))
+    Yn=np.concatenate((Y1[le], Y1[up_in], Y1[ri], Y1[do_in]))
 
     # Rotation and translation to put in non-canonical system
     X2 = x0 + Xn * np.cos(phi) - Yn * np.sin(phi)
@@ -431,85 +608,94 @@ def rms_superellipse_pts(params, X, Y):
     Q_sqr=Q*Q;
 
     # Compute mean rms for points 
-    rms=np.sqrt(sum(Q_sqr))/len(Q_sqr)
+    rms=np.sqrt(np.sum(Q_sqr))/len(Q_sqr)
 
     return rms
 
 #==================================================================================
 
-def track_center_superellipse(x, y): 
-    
+def rms_superellipse_grid(x0, y0, ap, bp, phi, X, Y, max_elements=2000000):
+
     """
-    Compute best track's center using the best fit superellipse with n=6 
-    described by the params = x0, y0, ap, bp, phi.
-    A. Carbognani, INAF-OAS, July 27, 2022
+    Compute the rms of the points X, Y (as rms_superellipse_pts) for a whole grid of
+    superellipses with n=6 in one array operation.
+    Input:
+    x0, y0, ap, bp = arrays of the superellipse's parameters of the grid, phi = fixed inclination (rad)
+    X, Y = points; the grid is evaluated in chunks of at most max_elements grid points x points
+    Output:
+    array of the rms of each superellipse of the grid
+    A. Carbognani, INAF-OAS, Oct 17, 2026
     """
 
-    # Compute best fit ellipse with raw data
-    coeffs = fit_ellipse(x, y)
-    x0, y0, ap, bp, e, phi = cart_to_pol(coeffs)
-        
-    # Smooth raw data  
-    x2, y2 = smooth_superellipse_pts((ap, bp, phi), x, y) 
-    
-    # Compute best fit ellipse with smooth data
-    coeffs1 = fit_ellipse(np.transpose(x2), np.transpose(y2))
-    x0, y0, ap, bp, e, phi = cart_to_pol(coeffs1)
+    X=np.asarray(X, dtype=float)
+    Y=np.asarray(Y, dtype=float)
+    cphi=np.cos(phi)
+    sphi=np.sin(phi)
+
+    rms=np.empty(len(x0))
+    chunk=max(1, max_elements//max(len(X), 1))
+    for c0 in range(0, len(x0), chunk):
+        c1=c0+chunk
+        dX=X[np.newaxis, :]-x0[c0:c1, np.newaxis]
+        dY=Y[np.newaxis, :]-y0[c0:c1, np.newaxis]
+        X1=(dX*cphi+dY*sphi)/ap[c0:c1, np.newaxis]
+        Y1=(dY*cphi-dX*sphi)/bp[c0:c1, np.newaxis]
+        Q=(X1*X1*X1*X1*X1*X1 + Y1*Y1*Y1*Y1*Y1*Y1 - 1)
+        rms[c0:c1]=np.sqrt(np.sum(Q*Q, axis=1))/len(X)
 
-    # Smooth already smooth data using second guest superellipse with n=4
-    #x2, y2 = smooth_superellipse_pts((ap, bp, phi), x1, y1) 
-    
-    # Compute best fit ellipse with smooth-smooth data
-    #coeffs2 = fit_ellipse(np.transpose(x2), np.transpose(y2))
-    #x0, y0, ap, bp, e, phi = cart_to_pol(coeffs2)
+    return rms
 
-    # Plot guest superellipse  
-    x1, y1 = get_superellipse_pts((x0, y0, ap, bp, phi)) 
-    x22, y22 = get_ellipse_pts((x0, y0, ap, bp, e, phi))
-    plt.plot(x1, y1, label = 'Guest superellipse')
-    plt.plot(x22, y22, label = 'Best fit ellipse')
+#==================================================================================
 
-    #################################
-    # Compute best fit superellipse #
-    #################################  
+def fit_superellipse_grid(params, X, Y, ResGrid=3, var=0.2):
+
+    """
+    Best fit superellipse with n=6 by grid search: at each step the (2*ResGrid+1)^4 grid
+    of x0, y0, ap, bp around the current parameters is evaluated in one array operation,
+    then the domains of the search are halved until the x0 domain is below 0.5 pixels.
+    It is the same search of the previous nested loops version (phi is fixed).
+    Input:
+    params = x0, y0, ap, bp, phi of the starting superellipse; X, Y = points to fit
+    Output:
+    x0, y0, ap, bp of the best fit superellipse and its rms
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    x0, y0, ap, bp, phi = params
 
     # Compute rms for guest-superellipse
-    rmsold=rms_superellipse_pts((x0, y0, ap, bp, phi), x2, y2)
-    print('First rms', rmsold)
+    rmsold=rms_superellipse_pts((x0, y0, ap, bp, phi), X, Y)
 
-    # Set grid resolution
-    ResGrid=3;
-    
     # Starting domains of variation of the superellipse's parameters (phi is fixed)
-    var=0.2
     dXdom=var*x0
     dYdom=var*y0
     dapdom=var*ap
     dbpdom=var*bp
-    
-    # Minimum rms array index
-    minrms=[0, 0, 0, 0]
-    
+
+    # Grid indexes in the order of the nested loops i, j, k, l
+    steps=np.arange(-ResGrid, ResGrid+1)
+    I, J, K, L = [g.ravel() for g in np.meshgrid(steps, steps, steps, steps, indexing='ij')]
+
+    # Minimum rms grid index
+    minrms=(0, 0, 0, 0)
+
     while dXdom > 0.5:
-        for i in range(-ResGrid, ResGrid+1):
-            xx0=x0+i*dXdom/ResGrid
-            for j in range(-ResGrid, ResGrid+1):  
-                yy0=y0+j*dYdom/ResGrid
-                for k in range(-ResGrid, ResGrid+1): 
-                    aap=ap+k*dapdom/ResGrid
-                    for l in range(-ResGrid, ResGrid+1):
-                        bbp=bp+l*dbpdom/ResGrid
-                        if aap > bbp:
-                            rms=rms_superellipse_pts((xx0, yy0, aap, bbp, phi), x2, y2)
-                            if rms<rmsold:
-                                minrms.insert(0, i) # Save best index for x0
-                                minrms.insert(1, j) # Save best index for y0
-                                minrms.insert(2, k) # Save best index for ap
-                                minrms.insert(3, l) # Save best index for bp
-                                rmsold=rms
-
-        print('second', rmsold)
-        # New best fit superellipse parameters with n=4
+        xx0=x0+I*dXdom/ResGrid
+        yy0=y0+J*dYdom/ResGrid
+        aap=ap+K*dapdom/ResGrid
+        bbp=bp+L*dbpdom/ResGrid
+
+        # Only superellipses with ap > bp
+        valid=np.nonzero(aap > bbp)[0]
+        if len(valid) > 0:
+            rms=rms_superellipse_grid(xx0[valid], yy0[valid], aap[valid], bbp[valid], phi, X, Y)
+            best=np.argmin(rms)
+            if rms[best] < rmsold:
+                cell=valid[best]
+                minrms=(I[cell], J[cell], K[cell], L[cell])
+                rmsold=rms[best]
+
+        # New best fit superellipse parameters
         x0=x0+minrms[0]*dXdom/ResGrid
         y0=y0+minrms[1]*dYdom/ResGrid
         ap=ap+minrms[2]*dapdom/ResGrid
@@ -521,15 +707,106 @@ def track_center_superellipse(x, y):
         dapdom=dapdom/2
         dbpdom=dbpdom/2
 
-    # Final plots
-    # Plot original points
-    plt.plot(x, y, 'x', label = 'Original points')
-    x, y = get_superellipse_pts((x0, y0, ap, bp, phi)) # Best-fit superellipse
-    plt.plot(x, y, label = 'Best fit superellipse')
-    plt.plot(x2, y2, 'o', label = 'Smooth points')   # smooth points
-    # plt.gca().set_aspect('equal', adjustable='box') # Equal axis scale
-    plt.legend(loc="upper left")
-    plt.show()
+    return x0, y0, ap, bp, rmsold
+
+#==================================================================================
+
+def fit_superellipse_lsq(params, X, Y, var=0.2):
+
+    """
+    Best fit superellipse with n=6 by least squares of the algebraic distances Q of the
+    points (the same quantity minimized by the grid search), phi is fixed. The parameters
+    are bounded around the starting superellipse.
+    Input:
+    params = x0, y0, ap, bp, phi of the starting superellipse; X, Y = points to fit
+    var = relative variation of the grid search domains (see fit_superellipse_grid)
+    Output:
+    x0, y0, ap, bp of the best fit superellipse and its rms
+    A. Carbognani, INAF-OAS, Oct 17, 2026
+    """
+
+    from scipy.optimize import least_squares
+
+    x0, y0, ap, bp, phi = params
+
+    X=np.asarray(X, dtype=float)
+    Y=np.asarray(Y, dtype=float)
+    cphi=np.cos(phi)
+    sphi=np.sin(phi)
+
+    def residuals(p):
+        X1=((X-p[0])*cphi+(Y-p[1])*sphi)/p[2]
+        Y1=((Y-p[1])*cphi-(X-p[0])*sphi)/p[3]
+        return X1*X1*X1*X1*X1*X1 + Y1*Y1*Y1*Y1*Y1*Y1 - 1
+
+    # The search is bounded around the starting superellipse: the centre within ap pixels and
+    # the semi-axes within the same +-2*var range reachable by the grid search. Without bounds
+    # the algebraic distance is reduced by widening bp, and the centre drifts across the track
+    lower=np.array([x0-ap, y0-ap, (1-2*var)*ap, (1-2*var)*bp])
+    upper=np.array([x0+ap, y0+ap, (1+2*var)*ap, (1+2*var)*bp])
+    solution=least_squares(residuals, np.array([x0, y0, ap, bp]), x_scale=np.array([1.0, 1.0, ap, bp]),
+                           bounds=(lower, upper))
+    x0, y0, ap, bp = solution.x
+
+    return x0, y0, ap, bp, rms_superellipse_pts((x0, y0, ap, bp, phi), X, Y)
+
+#==================================================================================
+
+def track_center_superellipse(x, y, plot=False, method='grid'): 
+    
+    """
+    Compute best track's center using the best fit superellipse with n=6 
+    described by the params = x0, y0, ap, bp, phi.
+    method='grid' is the grid search of the original version, evaluated with array operations;
+    method='lsq' is a least squares fit of the same superellipse, faster on long tracks.
+    With plot=True the points and the best fit curves are shown (it blocks until the window is closed).
+    A. Carbognani, INAF-OAS, July 27, 2022
+    Vectorized grid search and optional plot, Oct 17, 2026
+    """
+
+    # Compute best fit ellipse with raw data
+    coeffs = fit_ellipse(x, y)
+    x0, y0, ap, bp, e, phi = cart_to_pol(coeffs)
+        
+    # Smooth raw data  
+    x2, y2 = smooth_superellipse_pts((ap, bp, phi), x, y) 
+    
+    # Compute best fit ellipse with smooth data
+    coeffs1 = fit_ellipse(np.transpose(x2), np.transpose(y2))
+    x0, y0, ap, bp, e, phi = cart_to_pol(coeffs1)
+
+    if plot:
+        # matplotlib viene importato solo per i grafici
+        import matplotlib.pyplot as plt
+
+        # Plot guest superellipse  
+        x1, y1 = get_superellipse_pts((x0, y0, ap, bp, phi)) 
+        x22, y22 = get_ellipse_pts((x0, y0, ap, bp, e, phi))
+        plt.plot(x1, y1, label = 'Guest superellipse')
+        plt.plot(x22, y22, label = 'Best fit ellipse')
+        print('First rms', rms_superellipse_pts((x0, y0, ap, bp, phi), x2, y2))
+
+    #################################
+    # Compute best fit superellipse #
+    #################################  
+
+    if method == 'lsq':
+        x0, y0, ap, bp, rms = fit_superellipse_lsq((x0, y0, ap, bp, phi), x2, y2)
+    else:
+        x0, y0, ap, bp, rms = fit_superellipse_grid((x0, y0, ap, bp, phi), x2, y2)
+
+    if plot:
+        print('Best fit rms', rms)
+
+        # Final plots
+        # Plot original points
+        plt.plot(x, y, 'x', label = 'Original points')
+        x1, y1 = get_superellipse_pts((x0, y0, ap, bp, phi)) # Best-fit superellipse
+        plt.plot(x1, y1, label = 'Best fit superellipse')
+        plt.plot(x2, y2, 'o', label = 'Smooth points')   # smooth points
+        # plt.gca().set_aspect('equal', adjustable='box') # Equal axis scale
+        plt.legend(loc="upper left")
+        plt.show()
     
     # Best fit track's center
     return x0, y0
@@ -0,0 +1,159 @@
+# Python script for the benchmark of the compressed fits images on a synthetic night.
+#
+# The end-to-end benchmark of "benchmark_night.py" is run on the same synthetic night (same seed) with
+# plain fits images and with tile compressed images ("Fits_io.py"), one subfolder of work_dir for each
+# configuration of COMPRESSIONS: compression of the images and quantization of the floating point images
+# (SST_FITS_QUANTIZE, None = default of Fits_io.py, 0 = without loss). The raw frames are always compressed
+# without loss. For each configuration the script prints the wall time of the stages, the throughput
+# (frames per second of the whole pipeline) and the disk footprint of the frames, as ratio to the plain
+# images: the trade-off between the time spent in compression and decompression and the space saved.
+# The streaks of each configuration are compared with the ones of the plain images (number of streaks and
+# maximum difference of RA and DEC in "Data_headers_streaks.txt"), to check the effect of the quantization.
+# All the results are saved in a JSON file.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_compression.py
+# work_dir = cartella delle notti sintetiche (una sottocartella per configurazione, create se non esistono)
+# n_frames = (opzionale) numero di immagini scientifiche (default 10)
+# size = (opzionale) dimensione in pixel delle immagini quadrate (default 1024)
+# n_bias = (opzionale) numero di bias (default 10)
+# n_proc = (opzionale) numero di processi per calibrazione ed estrazione delle tracce (default 1)
+# out_file = (opzionale) file JSON dei risultati (default benchmark_compression.json in work_dir)
+# Esempio di input da riga di comando: > python3 benchmark_compression.py /tmp/compression/ 10 1024 10 1
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import json
+import os
+import sys
+
+import benchmark_night as bn
+
+# Configurazioni confrontate: nome, compressione, quantizzazione delle immagini in virgola mobile
+COMPRESSIONS=(('none', 'none', None),
+              ('rice', 'rice', None),
+              ('rice_q4', 'rice', '4'),
+              ('hcompress', 'hcompress', None),
+              ('gzip_lossless', 'gzip', '0'))
+
+# Fasi della pipeline riportate nella tabella dei tempi
+STAGES=('master_bias', 'calibration', 'keys_cal', 'wcs', 'keys_wcs', 'streaks')
+
+#==================================================================================
+
+def read_coordinates(path0):
+
+    """
+    RA and DEC (degree) of the streaks of "Data_headers_streaks.txt", in the order of the file
+    (the final NaN line of each frame is skipped).
+    """
+
+    coordinates=[]
+    with open(os.path.join(path0, 'Data_headers_streaks.txt')) as f:
+        for line in f:
+            fields=[field.strip() for field in line.split(',')]
+            if len(fields) > 4 and fields[3] != 'NaN':
+                coordinates.append((float(fields[3]), float(fields[4])))
+
+    return coordinates
+
+#==================================================================================
+
+def compare_streaks(reference, coordinates):
+
+    """
+    Comparison of the streaks of a configuration with the reference ones.
+    Output:
+    dictionary with the number of streaks and, if it is the same of the reference,
+    the maximum difference of RA and DEC (arcsec)
+    """
+
+    result={'n_streaks': len(coordinates), 'max_dra_arcsec': None, 'max_ddec_arcsec': None}
+    if len(coordinates) == len(reference) and len(coordinates) > 0:
+        result['max_dra_arcsec']=max(abs(c[0]-r[0]) for c, r in zip(coordinates, reference))*3600.0
+        result['max_ddec_arcsec']=max(abs(c[1]-r[1]) for c, r in zip(coordinates, reference))*3600.0
+
+    return result
+
+#==================================================================================
+
+def run_compressions(work_dir, n_frames=10, size=1024, n_bias=10, n_proc=1):
+
+    """
+    Run the benchmark of the synthetic night for all the configurations of COMPRESSIONS.
+    Output:
+    list of the results of benchmark_night.run_benchmark, with the comparison of the streaks
+    """
+
+    results=[]
+    for label, compression, quantize_level in COMPRESSIONS:
+        print('\nCompression ' + label + '\n')
+        if quantize_level is None:
+            os.environ.pop('SST_FITS_QUANTIZE', None)
+        else:
+            os.environ['SST_FITS_QUANTIZE']=quantize_level
+
+        result=bn.run_benchmark(os.path.join(work_dir, label), n_frames, size, n_bias, n_proc, compression)
+        result['label']=label
+        try:
+            coordinates=read_coordinates(result['work_dir'])
+        except OSError:
+            coordinates=[]
+        if not results:
+            reference=coordinates
+        result['streaks']=compare_streaks(reference, coordinates)
+        results.append(result)
+
+    os.environ.pop('SST_FITS_QUANTIZE', None)
+
+    return results
+
+#==================================================================================
+
+def print_summary(results):
+
+    """
+    Tables of the wall time of the stages, of the throughput and of the disk footprint.
+    """
+
+    def wall(result, stage):
+        return sum(s['wall_s'] for s in result['stages'] if s['stage'] == stage)
+
+    print('\n%-14s' % 'wall time (s)' + ''.join('%12s' % stage for stage in STAGES) + '%10s%11s' % ('total', 'frames/s'))
+    for result in results:
+        print('%-14s' % result['label'] + ''.join('%12.2f' % wall(result, stage) for stage in STAGES) +
+              '%10.2f%11.2f' % (result['total_s'], result['n_frames']/result['total_s']))
+
+    kinds=[kind for kind, selected in bn.FRAME_KINDS]
+    reference=sum(results[0]['disk_bytes'].values())
+    print('\n%-14s' % 'disk (MB)' + ''.join('%12s' % kind for kind in kinds) + '%10s%8s' % ('total', 'ratio'))
+    for result in results:
+        total=sum(result['disk_bytes'].values())
+        print('%-14s' % result['label'] + ''.join('%12.1f' % (result['disk_bytes'][kind]/1e6) for kind in kinds) +
+              '%10.1f%8.3f' % (total/1e6, total/reference))
+
+    print('\n%-14s%10s%16s%16s' % ('streaks', 'number', 'max dRA (")', 'max dDEC (")'))
+    for result in results:
+        streaks=result['streaks']
+        print('%-14s%10d%16s%16s' % (result['label'], streaks['n_streaks'],
+              '-' if streaks['max_dra_arcsec'] is None else '%.3g' % streaks['max_dra_arcsec'],
+              '-' if streaks['max_ddec_arcsec'] is None else '%.3g' % streaks['max_ddec_arcsec']))
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    work_dir=sys.argv[1]
+    n_frames=int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    size=int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+    n_bias=int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    n_proc=int(sys.argv[5]) if len(sys.argv) > 5 else 1
+    out_file=sys.argv[6] if len(sys.argv) > 6 else os.path.join(work_dir, 'benchmark_compression.json')
+
+    results=run_compressions(work_dir, n_frames, size, n_bias, n_proc)
+    print_summary(results)
+
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
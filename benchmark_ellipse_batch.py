@@ -0,0 +1,150 @@
+# Python script for the micro-benchmark and the check of the batched ellipse fit of "Track_best_fit.py".
+#
+# Times "ellipse_params_batch" on collections of synthetic track contours (20 - 400 points each) and
+# compares it with the loop over "fit_ellipse" and "cart_to_pol", checking that the ellipse centers are
+# the same within 1e-6 pixels. As in the batched fit, each contour of the loop is centred and scaled
+# before fit_ellipse (with the pixel coordinates the fit is badly conditioned). The degenerate contours must be flagged per contour without changing
+# the others: the same collection is fitted again with empty and too short contours inserted at the
+# start, in the middle and at the end, and the parameters of the other contours must be identical.
+# If a check fails the script prints a warning and exits with status 1.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_ellipse_batch.py
+# repeat = (opzionale) numero di ripetizioni per ogni misura (default 5)
+# Esempio di input da riga di comando: > python3 benchmark_ellipse_batch.py 5
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import numpy as np
+import sys
+import time
+
+import Track_best_fit as tbf
+
+# Numero di contorni delle collezioni
+N_CONTOURS=(10, 100, 300, 1000)
+
+#==================================================================================
+
+def synthetic_contours(n_contours, rng):
+
+    """
+    Contours of elliptical tracks with edge noise, 20 - 400 points each.
+    Output:
+    xs, ys = lists of the x and y arrays of each contour
+    """
+
+    xs=[]
+    ys=[]
+    for k in range(n_contours):
+        n_points=int(rng.integers(20, 400))
+        length=rng.uniform(20, 120)
+        width=rng.uniform(3, 8)
+        phi=rng.uniform(0, np.pi)
+        x0, y0 = rng.uniform(100, 1900, 2)
+
+        t=np.linspace(0, 2*np.pi, n_points, endpoint=False)
+        u=length*np.cos(t)+rng.normal(0, 0.3, n_points)
+        v=width*np.sin(t)+rng.normal(0, 0.3, n_points)
+        xs.append(x0+u*np.cos(phi)-v*np.sin(phi))
+        ys.append(y0+u*np.sin(phi)+v*np.cos(phi))
+
+    return xs, ys
+
+#==================================================================================
+
+def loop_params(xs, ys):
+
+    """
+    Ellipse parameters of each contour with fit_ellipse and cart_to_pol on the centred and scaled
+    contour, NaN if the fit fails. Only the center and the semi-axes are converted back to pixels.
+    """
+
+    params=np.full((len(xs), 6), np.nan)
+    for k, (x, y) in enumerate(zip(xs, ys)):
+        mx, my = np.mean(x), np.mean(y)
+        scale=np.sqrt(np.mean((x-mx)**2+(y-my)**2))
+        try:
+            x0, y0, ap, bp, e, phi = tbf.cart_to_pol(tbf.fit_ellipse((x-mx)/scale, (y-my)/scale))
+        except (ValueError, IndexError, TypeError, np.linalg.LinAlgError):
+            continue
+        params[k]=(mx+x0*scale, my+y0*scale, ap*scale, bp*scale, e, phi)
+
+    return params
+
+#==================================================================================
+
+def with_degenerate(xs, ys):
+
+    """
+    Same contours with an empty contour at the start, an empty and a 3 point contour in the middle
+    and an empty contour at the end.
+    Output:
+    xs, ys, index of the original contours in the new lists
+    """
+
+    middle=len(xs)//2
+    empty=np.zeros(0)
+    xs2=[empty]+xs[:middle]+[empty, xs[0][:3]]+xs[middle:]+[empty]
+    ys2=[empty]+ys[:middle]+[empty, ys[0][:3]]+ys[middle:]+[empty]
+    index=np.concatenate((np.arange(1, middle+1), np.arange(middle+3, len(xs)+3)))
+
+    return xs2, ys2, index
+
+#==================================================================================
+
+def best_time(function, args, repeat):
+
+    """
+    Best execution time (s) of function(*args) over repeat runs.
+    """
+
+    best=np.inf
+    for r in range(repeat):
+        t0=time.perf_counter()
+        function(*args)
+        best=min(best, time.perf_counter()-t0)
+
+    return best
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    repeat=int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng=np.random.default_rng(2026)
+    failed=False
+
+    print('%10s %12s %12s %9s %12s %12s' % ('contours', 'loop', 'batch', 'speedup', 'max diff', 'check'))
+
+    for n_contours in N_CONTOURS:
+        xs, ys = synthetic_contours(n_contours, rng)
+
+        # Verifica dei centri rispetto al fit di ogni contorno
+        reference=loop_params(xs, ys)
+        params=np.array(tbf.ellipse_params_batch(xs, ys)[:6]).T
+        both=np.all(np.isfinite(reference), axis=1) & np.all(np.isfinite(params), axis=1)
+        diff=np.abs(params[both, 0:2]-reference[both, 0:2]).max() if both.any() else 0.0
+        if diff > 1e-6:
+            print('WARNING: difference with fit_ellipse + cart_to_pol ' + str(diff) + ' px')
+            failed=True
+
+        # I contorni degeneri sono segnalati senza cambiare gli altri
+        xs2, ys2, index = with_degenerate(xs, ys)
+        result=tbf.ellipse_params_batch(xs2, ys2)
+        params2=np.array(result[:6]).T
+        flagged=np.setdiff1d(np.arange(len(xs2)), index)
+        if not np.array_equal(params2[index], params, equal_nan=True) or result[-1][flagged].any():
+            print('WARNING: the degenerate contours change the fit of the other contours')
+            failed=True
+
+        t_loop=best_time(loop_params, (xs, ys), repeat)
+        t_batch=best_time(tbf.ellipse_params_batch, (xs, ys), repeat)
+
+        print('%10d %10.3f ms %10.3f ms %8.1fx %12.2g %12s' % (n_contours, 1e3*t_loop, 1e3*t_batch,
+              t_loop/t_batch, diff, 'failed' if failed else 'ok'))
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,241 @@
+# Python script for the end-to-end benchmark of the Python stages of BASP on a synthetic night.
+#
+# A synthetic night is created in a local folder with "Synthetic_night.py": bias frames and science frames
+# with a star field, injected satellite streaks and the header keys used by the pipeline (DATE-OBS, OBJECT,
+# EXPTIME, RA, DEC). The stages are then run as subprocesses in the same order of BASP.m:
+#
+# fits_master_bias.py -> fits_calibration.py -> fits_keys_reader.py (_cal) -> WCS ->
+# fits_keys_reader.py (_WCS_) -> SST_Astride_TDM.py
+#
+# The astrometric calibration with solve-field is replaced by the WCS stage of "Synthetic_night.py", that
+# writes the _WCS_ frames with a TAN WCS built from the RA and DEC of the header: no astrometry.net index
+# files and no network are needed. For each stage the wall time, the peak RSS and the bytes
+# read/written (including the child processes) are saved in a JSON file. The calibration library of
+# the benchmark is kept in the night folder, so that the library of the real nights is not modified.
+# The positions of the injected streaks are saved in "Synthetic_truth.json".
+#
+# With the optional compression (rice, hcompress or gzip, see "Fits_io.py") the raw frames are generated tile
+# compressed without loss and the stages save compressed images (SST_FITS_COMPRESSION; the quantization of the
+# floating point images is the one of SST_FITS_QUANTIZE). The disk footprint of the frames of each kind (raw,
+# master bias, calibrated, WCS) is saved with the measures of the stages ("benchmark_compression.py" compares
+# the compressions).
+#
+# Parametri di input:
+#
+# Nome script, benchmark_night.py
+# work_dir = cartella della notte sintetica (creata se non esiste)
+# n_frames = (opzionale) numero di immagini scientifiche (default 10)
+# size = (opzionale) dimensione in pixel delle immagini quadrate (default 1024)
+# n_bias = (opzionale) numero di bias (default 10)
+# n_proc = (opzionale) numero di processi per calibrazione ed estrazione delle tracce (default 1)
+# out_file = (opzionale) file JSON dei risultati (default benchmark_night.json in work_dir)
+# compression = (opzionale) compressione delle immagini: none (default), rice, hcompress, gzip
+# Esempio di input da riga di comando: > python3 benchmark_night.py /tmp/synthetic_night/ 10 1024 10 1
+# Esempio con immagini compresse Rice: > python3 benchmark_night.py /tmp/synthetic_night/ 10 1024 10 1 /tmp/rice.json rice
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+# La notte sintetica è generata da "Synthetic_night.py" in un sottoprocesso e questo script non importa
+# numpy e astropy: su Linux il picco di RSS del processo padre viene ereditato dai processi figli,
+# il processo che misura le fasi deve quindi restare piccolo
+
+# Cartella degli script della pipeline
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+# Nomi dei file della notte sintetica (vedi Synthetic_night.py)
+PREFIX='SYN20261017'
+FIRST_FRAME=101
+
+# Soglia di ASTRiDE usata per l'estrazione delle tracce
+SOGLIA=1
+
+# Tipi di immagini della notte per l'occupazione del disco: nome e funzione di selezione dei file
+FRAME_KINDS=(('raw', lambda f: f.startswith(PREFIX+'_') and not f.startswith(PREFIX+'_WCS_') and not f.endswith('_cal.fit')),
+             ('master_bias', lambda f: f == 'master_bias.fit'),
+             ('calibrated', lambda f: f.endswith('_cal.fit')),
+             ('wcs', lambda f: f.startswith(PREFIX+'_WCS_')))
+
+#==================================================================================
+
+def read_proc_io(pid):
+
+    """
+    I/O counters of a terminated (not yet reaped) process, including its reaped children.
+    Output:
+    dictionary of /proc/<pid>/io, empty if not available
+    """
+
+    try:
+        with open('/proc/'+str(pid)+'/io') as f:
+            return {key: int(value) for key, value in (line.split(':') for line in f.read().splitlines())}
+    except (OSError, ValueError):
+        return {}
+
+#==================================================================================
+
+def run_stage(stage, command, env):
+
+    """
+    Run a stage as a subprocess in the folder of the pipeline scripts.
+    Output:
+    dictionary with return code, wall time, CPU time, peak RSS and bytes read/written
+    """
+
+    t0=time.perf_counter()
+    process=subprocess.Popen(command, cwd=SCRIPT_DIR, env=env, stdout=subprocess.DEVNULL)
+
+    # I contatori di I/O si leggono prima di raccogliere il processo terminato
+    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    io=read_proc_io(process.pid)
+    pid, status, rusage = os.wait4(process.pid, 0)
+    wall=time.perf_counter()-t0
+    process.returncode=os.waitstatus_to_exitcode(status)
+
+    return {'stage': stage,
+            'command': ' '.join(command),
+            'returncode': process.returncode,
+            'wall_s': wall,
+            'user_s': rusage.ru_utime,
+            'sys_s': rusage.ru_stime,
+            'peak_rss_mb': rusage.ru_maxrss/1024.0,
+            'bytes_read': io.get('rchar'),
+            'bytes_written': io.get('wchar'),
+            'disk_bytes_read': io.get('read_bytes', 512*rusage.ru_inblock),
+            'disk_bytes_written': io.get('write_bytes', 512*rusage.ru_oublock)}
+
+#==================================================================================
+
+def stage_commands(path0, n_frames, size, n_bias, n_proc, compression='none'):
+
+    """
+    Command lines of the stages, in the order of BASP.m, after the generation of the night.
+    """
+
+    python=sys.executable
+    Ni=str(FIRST_FRAME)
+    num_im=str(n_frames)
+
+    return [('generate', [python, '-c', 'import sys, Synthetic_night; Synthetic_night.generate_night(*sys.argv[1:])',
+                          path0, str(n_frames), str(size), str(n_bias), '2026', compression]),
+            ('master_bias', [python, 'fits_master_bias.py', path0, PREFIX+'_BIAS_', '.fit', '1', str(n_bias)]),
+            ('calibration', [python, 'fits_calibration.py', path0, PREFIX+'_', '.fit', Ni, num_im, str(n_proc)]),
+            ('keys_cal', [python, 'fits_keys_reader.py', path0, PREFIX+'_', '_cal.fit', Ni, num_im]),
+            ('wcs', [python, '-c', 'import sys, Synthetic_night; Synthetic_night.inject_wcs(*sys.argv[1:])',
+                     path0, PREFIX+'_', '.fit', Ni, num_im]),
+            ('keys_wcs', [python, 'fits_keys_reader.py', path0, PREFIX+'_WCS_', '.fit', Ni, num_im]),
+            ('streaks', [python, 'SST_Astride_TDM.py', path0, PREFIX+'_WCS_', '.fit', Ni, num_im, str(SOGLIA),
+                         str(n_proc)])]
+
+#==================================================================================
+
+def disk_footprint(path0):
+
+    """
+    Bytes on disk of the fits frames of the night, for each kind of FRAME_KINDS.
+    """
+
+    footprint={kind: 0 for kind, selected in FRAME_KINDS}
+    with os.scandir(path0) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.fit') or not entry.is_file():
+                continue
+            for kind, selected in FRAME_KINDS:
+                if selected(entry.name):
+                    footprint[kind]+=entry.stat().st_size
+                    break
+
+    return footprint
+
+#==================================================================================
+
+def git_version():
+
+    # Versione del codice, per confrontare i risultati fra versioni diverse
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True, cwd=SCRIPT_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#==================================================================================
+
+def run_benchmark(work_dir, n_frames=10, size=1024, n_bias=10, n_proc=1, compression='none'):
+
+    """
+    Generate the synthetic night and run all the stages.
+    Output:
+    dictionary with the configuration and the measures of each stage
+    """
+
+    path0=os.path.join(os.path.abspath(work_dir), '')
+    os.makedirs(path0, exist_ok=True)
+
+    # Libreria di calibrazione della notte sintetica, svuotata ad ogni esecuzione: altrimenti
+    # con gli stessi bias il master verrebbe preso dalla libreria senza ricalcolarlo
+    env=dict(os.environ)
+    env['SST_CALIBRATION_LIBRARY']=os.path.join(path0, 'Calibration_library')
+    shutil.rmtree(env['SST_CALIBRATION_LIBRARY'], ignore_errors=True)
+    env['SST_FITS_COMPRESSION']=compression
+
+    stages=[]
+    for stage, command in stage_commands(path0, n_frames, size, n_bias, n_proc, compression):
+        result=run_stage(stage, command, env)
+        stages.append(result)
+        print('%12s %8.2f s %9.1f MB %10.1f MB read %10.1f MB written%s' % (stage, result['wall_s'],
+              result['peak_rss_mb'], (result['bytes_read'] or 0)/1e6, (result['bytes_written'] or 0)/1e6,
+              '' if result['returncode'] == 0 else '  FAILED ('+str(result['returncode'])+')'))
+
+    n_streaks=None
+    if os.path.isfile(os.path.join(path0, 'Synthetic_truth.json')):
+        with open(os.path.join(path0, 'Synthetic_truth.json')) as f:
+            n_streaks=len(json.load(f))
+
+    # La generazione della notte non fa parte della pipeline
+    pipeline=[stage for stage in stages if stage['stage'] != 'generate']
+
+    return {'version': git_version(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': importlib.metadata.version('numpy'),
+            'astropy': importlib.metadata.version('astropy'),
+            'work_dir': path0,
+            'n_frames': n_frames,
+            'size': size,
+            'n_bias': n_bias,
+            'n_proc': n_proc,
+            'compression': compression,
+            'quantize_level': env.get('SST_FITS_QUANTIZE'),
+            'n_streaks': n_streaks,
+            'disk_bytes': disk_footprint(path0),
+            'total_s': sum(stage['wall_s'] for stage in pipeline),
+            'peak_rss_mb': max(stage['peak_rss_mb'] for stage in pipeline),
+            'stages': stages}
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    work_dir=sys.argv[1]
+    n_frames=int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    size=int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+    n_bias=int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    n_proc=int(sys.argv[5]) if len(sys.argv) > 5 else 1
+    out_file=sys.argv[6] if len(sys.argv) > 6 else os.path.join(work_dir, 'benchmark_night.json')
+    compression=sys.argv[7] if len(sys.argv) > 7 else 'none'
+
+    results=run_benchmark(work_dir, n_frames, size, n_bias, n_proc, compression)
+
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
+
+    print('Total %.2f s, results saved in %s' % (results['total_s'], out_file))
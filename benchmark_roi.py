@@ -0,0 +1,182 @@
+# Python script for the benchmark of the detection of the streaks in the region of interest of the target.
+#
+# Synthetic WCS frames are created for the first satellite of a TLE file: for each frame the positions of
+# the satellite at the start and at the end of the exposure are predicted with "Target_roi.py" (the same
+# computation used by SST_Astride_TDM.py with the parameter roi) and the streak of the target is injected
+# at the predicted pixel positions, with a star field and other streaks (other satellites) in random
+# positions. The predicted streak is placed at a random position of the frame, not at its center.
+# The streaks of each frame are then detected with ASTRiDE on the whole frame and in the region of interest,
+# with SST_Astride_TDM.detect_frame. For each mode the script prints the mean detection time per frame, the
+# frames where the streak of the target is found (best fit center within TARGET_TOLERANCE pixel of the
+# middle of the injected streak) and the streaks found; for the region of interest also the mean area of
+# the cutout as fraction of the frame (1 for the frames analysed whole) and the expected and measured speed-up.
+# When ASTRiDE finds no streak in the cutout within the margin of the predicted streak the whole frame is
+# analysed, as in SST_Astride_TDM.py.
+# The results are saved in a JSON file.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_roi.py
+# work_dir = cartella delle immagini sintetiche (creata se non esiste)
+# tle_file = file dei TLE, viene usato il primo satellite
+# n_frames = (opzionale) numero di immagini (default 10)
+# size = (opzionale) dimensione in pixel delle immagini quadrate (default 2048)
+# soglia = (opzionale) soglia di ASTRiDE (default 1)
+# out_file = (opzionale) file JSON dei risultati (default benchmark_roi.json in work_dir)
+# Esempio di input da riga di comando: > python3 benchmark_roi.py /tmp/roi/ geo.txt 10 2048 1
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from astropy.io import fits
+from astropy.wcs import WCS
+
+import Fits_io as fio
+import SGP4_ephemeris as se
+import SST_Astride_TDM as sat
+import Synthetic_night as sn
+import Target_roi as tr
+
+# Distanza massima (pixel) fra il centro misurato e il centro della traccia del satellite
+TARGET_TOLERANCE=10.0
+
+# Tracce di altri satelliti per immagine
+N_OTHER_STREAKS=2
+
+#==================================================================================
+
+def date_obs(mjd):
+
+    # DATE-OBS di un MJD, al millisecondo
+    date=datetime.datetime(1858, 11, 17)+datetime.timedelta(days=float(mjd))
+
+    return date.isoformat(timespec='milliseconds')
+
+#==================================================================================
+
+def make_frames(path0, tle_file, n_frames, size, seed=2026):
+
+    """
+    Synthetic WCS frames with the streak of the first satellite of tle_file at the predicted position.
+    Output:
+    list of tuples (frame, prediction, injected streak in pixel (x1, y1, x2, y2))
+    """
+
+    rng=np.random.default_rng(seed)
+    elements=se.read_tle(tle_file)
+    norad=int(elements['norad'][0])
+
+    # Immagini a partire da 6 ore dopo l'epoca del TLE
+    start=elements['epoch_mjd'][0]+0.25
+    heads=[]
+    for k in range(n_frames):
+        head=fits.Header()
+        head['DATE-OBS']=date_obs(start+k*sn.CADENCE/86400.0)
+        head['EXPTIME']=sn.EXPTIME
+        head['OBJECT']=str(norad)
+        heads.append(head)
+    predictions=tr.predict_frames(heads, tle_file)
+
+    frames=[]
+    for k, (head, prediction) in enumerate(zip(heads, predictions)):
+        # WCS con la traccia prevista in una posizione casuale dell'immagine
+        head['CTYPE1']='RA---TAN'
+        head['CTYPE2']='DEC--TAN'
+        head['CRVAL1']=float(np.mean(prediction['ra']))
+        head['CRVAL2']=float(np.mean(prediction['dec']))
+        head['CRPIX1']=float(rng.uniform(0.2, 0.8)*size)
+        head['CRPIX2']=float(rng.uniform(0.2, 0.8)*size)
+        head['CD1_1']=-sn.PIXEL_SCALE/3600.0
+        head['CD1_2']=0.0
+        head['CD2_1']=0.0
+        head['CD2_2']=sn.PIXEL_SCALE/3600.0
+        x, y = WCS(head).wcs_world2pix(np.array(prediction['ra']), np.array(prediction['dec']), 0)
+
+        image=sn.SKY_LEVEL+rng.normal(0, np.sqrt(sn.READ_NOISE**2+sn.SKY_LEVEL), (size, size))
+        for xs, ys, flux in zip(rng.uniform(0, size, sn.N_STARS), rng.uniform(0, size, sn.N_STARS),
+                                rng.lognormal(8.0, 1.0, sn.N_STARS)):
+            sn.add_star(image, xs, ys, flux)
+        sn.add_streak(image, x[0], y[0], x[1], y[1], rng.uniform(*sn.STREAK_PEAK))
+
+        for s in range(N_OTHER_STREAKS):
+            length=rng.uniform(0.05, 0.2)*size
+            phi=rng.uniform(0, np.pi)
+            xc, yc = rng.uniform(0.1*size, 0.9*size, 2)
+            sn.add_streak(image, xc-0.5*length*np.cos(phi), yc-0.5*length*np.sin(phi),
+                          xc+0.5*length*np.cos(phi), yc+0.5*length*np.sin(phi), rng.uniform(*sn.STREAK_PEAK))
+
+        file_to_save=path0+sn.PREFIX+'_WCS_'+str(sn.FIRST_FRAME+k)+'.fit'
+        fio.write_image(file_to_save, image.astype(np.float32), head)
+        frames.append((file_to_save, prediction, (float(x[0]), float(y[0]), float(x[1]), float(y[1]))))
+
+    return frames
+
+#==================================================================================
+
+def run_detection(frames, soglia, roi):
+
+    """
+    Detection of the streaks of the frames, on the whole frames or in the region of interest (roi=True).
+    Output:
+    dictionary with the measures of the mode
+    """
+
+    times=[]
+    fractions=[]
+    n_streaks=0
+    n_found=0
+    for file_to_open, prediction, injected in frames:
+        t0=time.perf_counter()
+        head, streak, record = sat.detect_frame(file_to_open, soglia, prediction=prediction if roi else None)
+        times.append(time.perf_counter()-t0)
+
+        n_streaks+=len(record['x'])
+        xc, yc = (injected[0]+injected[2])/2+1, (injected[1]+injected[3])/2+1     # origine 1, come i centri
+        if any(np.hypot(x-xc, y-yc) < TARGET_TOLERANCE for x, y in zip(record['x'], record['y'])):
+            n_found+=1
+
+        if roi:
+            w=WCS(head)
+            track=tr.pixel_track(prediction, w)
+            box=tr.roi_box(track, tr.roi_margin(prediction, track, w), (head['NAXIS2'], head['NAXIS1']))
+            fractions.append(1.0 if box is None else (box[1]-box[0])*(box[3]-box[2])/(head['NAXIS1']*head['NAXIS2']))
+
+    return {'mode': 'roi' if roi else 'full',
+            'mean_detect_ms': 1e3*float(np.mean(times)),
+            'n_streaks': n_streaks,
+            'target_found': n_found,
+            'mean_area_fraction': float(np.mean(fractions)) if fractions else 1.0}
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    work_dir=sys.argv[1]
+    tle_file=sys.argv[2]
+    n_frames=int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    size=int(sys.argv[4]) if len(sys.argv) > 4 else 2048
+    soglia=sys.argv[5] if len(sys.argv) > 5 else '1'
+    out_file=sys.argv[6] if len(sys.argv) > 6 else os.path.join(work_dir, 'benchmark_roi.json')
+
+    path0=os.path.join(os.path.abspath(work_dir), '')
+    os.makedirs(path0, exist_ok=True)
+
+    frames=make_frames(path0, tle_file, n_frames, size)
+    results=[run_detection(frames, soglia, False), run_detection(frames, soglia, True)]
+
+    print('\n%-6s %14s %10s %14s %14s' % ('mode', 'detect ms', 'streaks', 'target found', 'area fraction'))
+    for result in results:
+        print('%-6s %14.1f %10d %10d/%-3d %14.4f' % (result['mode'], result['mean_detect_ms'], result['n_streaks'],
+              result['target_found'], n_frames, result['mean_area_fraction']))
+    print('\nSpeed-up %.1f (expected from the area of the cutouts %.1f)\n' % (
+          results[0]['mean_detect_ms']/results[1]['mean_detect_ms'], 1.0/results[1]['mean_area_fraction']))
+
+    with open(out_file, 'w') as f:
+        json.dump({'tle_file': tle_file, 'n_frames': n_frames, 'size': size, 'soglia': soglia, 'results': results}, f, indent=1)
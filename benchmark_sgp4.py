@@ -0,0 +1,416 @@
+# Python script for the validation and the speed benchmark of the vectorized ephemeris of "SGP4_ephemeris.py".
+#
+# The reference is a scalar, line by line translation of the Matlab functions used by
+# GEO_selector_astrometry_filter.m: SGP4_Ephemeris.m (TLE file read at each call, one epoch per call),
+# sgp4.m, Convert_Sat_State.m, JD2GMST.m, Mjday.m, geod2geoc/geocradius (WGS84) and EQ2EQ2000_B.m.
+# The checks are:
+#
+# 1-TEME positions of the test satellite 88888 of Spacetrack Report #3 (SGP4 test case, the values
+#   printed in the report and reproduced by sgp4.m), for the vectorized and the scalar propagation
+# 2-topocentric RA and DEC J2000 of the TLE "SST_SGP4/tle.txt" (plus a LEO and a HEO TLE) seen from the
+#   site of "Settings_BASP.txt", vectorized against scalar, n_epochs epochs per satellite in one night
+#
+# The execution times of the scalar loop (one call per observation, as in Matlab) and of the vectorized
+# pass are saved in a JSON file with the maximum differences.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_sgp4.py
+# n_epochs = (opzionale) numero di epoche di osservazione per satellite (default 2000)
+# out_file = (opzionale) file JSON dei risultati (default benchmark_sgp4.json)
+# Esempio di input da riga di comando: > python3 benchmark_sgp4.py 2000 benchmark_sgp4.json
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import SGP4_ephemeris as se
+
+SCRIPT_DIR=os.path.dirname(os.path.abspath(__file__))
+
+# Satellite di test di Spacetrack Report #3 e posizioni TEME (km) a 0, 360, 720, 1080, 1440 minuti
+STR3_TLE=('1 88888U          80275.98708465  .00073094  13844-3  66816-4 0    8',
+          '2 88888  72.8435 115.9689 0086731  52.6988 110.5714 16.05824518  105')
+STR3_TSINCE=(0.0, 360.0, 720.0, 1080.0, 1440.0)
+STR3_POS=((2328.97048951, -5995.22076416, 1719.97067261),
+          (2456.10705566, -6071.93853760, 1222.89727783),
+          (2567.56195068, -6112.50384522, 713.96397400),
+          (2663.09078980, -6115.48229980, 196.39640427),
+          (2742.55133057, -6079.67144775, -326.38095856))
+
+# TLE aggiuntivi per il confronto (LEO con resistenza atmosferica, Molniya)
+EXTRA_TLE=('1 25544U 98067A   20251.56030093  .00000555  00000-0  18047-4 0  9995',
+           '2 25544  51.6455 299.5283 0001911 101.7787  55.4470 15.48964211244667',
+           '1 21118U 91011A   20251.46356830 -.00000095  00000-0  00000-0 0  9995',
+           '2 21118  62.7940 232.4600 7028447 277.0960  12.2200  2.00613750218083')
+
+#==================================================================================
+
+def sgp4_scalar(tsince, sat):
+
+    """
+    Scalar translation of sgp4.m (with Convert_Sat_State.m): TEME position (km) of one epoch.
+    """
+
+    ae=1.0
+    XJ3=-2.53881e-6
+    e6a=1.0E-6
+    xkmper=6378.135
+    ge=398600.8
+    CK2=1.0826158e-3/2.0
+    CK4=-3.0*-1.65597e-6/8.0
+    s=ae+78/xkmper
+    qo=ae+120/xkmper
+    xke=math.sqrt((3600.0*ge)/(xkmper**3))
+    qoms2t=((qo-s)**2)**2
+
+    a1=(xke/sat['xno'])**(2.0/3.0)
+    cosio=math.cos(sat['xincl'])
+    theta2=cosio**2
+    x3thm1=3.0*theta2-1.0
+    betao2=1.0-sat['eo']**2
+    betao=math.sqrt(betao2)
+    del1=1.5*CK2*x3thm1/((a1**2)*betao*betao2)
+    ao=a1*(1.0-del1*((1.0/3.0)+del1*(1.0+(134.0/81.0)*del1)))
+    delo=1.5*CK2*x3thm1/((ao**2)*betao*betao2)
+    xnodp=sat['xno']/(1.0+delo)
+    aodp=ao/(1.0-delo)
+
+    isimp=(aodp*(1.0-sat['eo'])/ae) < (220.0/xkmper+ae)
+
+    s4=s
+    qoms24=qoms2t
+    perige=(aodp*(1.0-sat['eo'])-ae)*xkmper
+    if perige < 156:
+        s4=perige-78.0
+        if perige <= 98:
+            s4=20.0
+        qoms24=((120.0-s4)*ae/xkmper)**4.0
+        s4=s4/xkmper+ae
+
+    pinvsq=1.0/((aodp**2)*(betao2**2))
+    tsi=1.0/(aodp-s4)
+    eta=aodp*sat['eo']*tsi
+    etasq=eta**2
+    eeta=sat['eo']*eta
+    psisq=abs(1.0-etasq)
+    coef=qoms24*(tsi**4.0)
+    coef1=coef/(psisq**3.5)
+    c2=coef1*xnodp*(aodp*(1.0+1.5*etasq+eeta*(4.0+etasq))+0.75*CK2*tsi/psisq*x3thm1*(8.0+3.0*etasq*(8.0+etasq)))
+    c1=sat['bstar']*c2
+    sinio=math.sin(sat['xincl'])
+    a3ovk2=-XJ3/CK2*(ae**3.0)
+    c3=coef*tsi*a3ovk2*xnodp*ae*sinio/sat['eo'] if sat['eo'] != 0 else 0.0
+    x1mth2=1.0-theta2
+    c4=2.0*xnodp*coef1*aodp*betao2*(eta*(2.0+0.5*etasq)+sat['eo']*(0.5+2.0*etasq)-2.0*CK2*tsi/(aodp*psisq)*
+       (-3.0*x3thm1*(1.0-2.0*eeta+etasq*(1.5-0.5*eeta))+0.75*x1mth2*(2.0*etasq-eeta*(1.0+etasq))*
+        math.cos(2.0*sat['omegao'])))
+    c5=2.0*coef1*aodp*betao2*(1.0+2.75*(etasq+eeta)+eeta*etasq)
+    theta4=theta2**2
+    temp1=3.0*CK2*pinvsq*xnodp
+    temp2=temp1*CK2*pinvsq
+    temp3=1.25*CK4*pinvsq*pinvsq*xnodp
+    xmdot=xnodp+0.5*temp1*betao*x3thm1+0.0625*temp2*betao*(13.0-78.0*theta2+137.0*theta4)
+    x1m5th=1.0-5.0*theta2
+    omgdot=-0.5*temp1*x1m5th+0.0625*temp2*(7.0-114.0*theta2+395.0*theta4)+temp3*(3.0-36.0*theta2+49.0*theta4)
+    xhdot1=-temp1*cosio
+    xnodot=xhdot1+(0.5*temp2*(4.0-19.0*theta2)+2.0*temp3*(3.0-7.0*theta2))*cosio
+    omgcof=sat['bstar']*c3*math.cos(sat['omegao'])
+    xmcof=-(2.0/3.0)*coef*sat['bstar']*ae/eeta if eeta != 0 else 0.0
+    xnodcf=3.5*betao2*xhdot1*c1
+    t2cof=1.5*c1
+    xlcof=0.125*a3ovk2*sinio*(3.0+5.0*cosio)/(1.0+cosio)
+    aycof=0.25*a3ovk2*sinio
+    delmo=(1.0+eta*math.cos(sat['xmo']))**3
+    sinmo=math.sin(sat['xmo'])
+    x7thm1=7.0*theta2-1.0
+    if not isimp:
+        c1sq=c1**2
+        d2=4.0*aodp*tsi*c1sq
+        temp=d2*tsi*c1/3.0
+        d3=(17.0*aodp+s4)*temp
+        d4=0.5*temp*aodp*tsi*(221.0*aodp+31.0*s4)*c1
+        t3cof=d2+2.0*c1sq
+        t4cof=0.25*(3.0*d3+c1*(12.0*d2+10.0*c1sq))
+        t5cof=0.2*(3.0*d4+12.0*c1*d3+6.0*d2*d2+15.0*c1sq*(2.0*d2+c1sq))
+
+    xmdf=sat['xmo']+xmdot*tsince
+    omgadf=sat['omegao']+omgdot*tsince
+    xnoddf=sat['xnodeo']+xnodot*tsince
+    omega=omgadf
+    xmp=xmdf
+    tsq=tsince**2
+    xnode=xnoddf+xnodcf*tsq
+    tempa=1.0-c1*tsince
+    tempe=sat['bstar']*c4*tsince
+    templ=t2cof*tsq
+    if not isimp:
+        delomg=omgcof*tsince
+        delm=xmcof*(((1.0+eta*math.cos(xmdf))**3.0)-delmo)
+        temp=delomg+delm
+        xmp=xmdf+temp
+        omega=omgadf-temp
+        tcube=tsq*tsince
+        tfour=tsince*tcube
+        tempa=tempa-d2*tsq-d3*tcube-d4*tfour
+        tempe=tempe+sat['bstar']*c5*(math.sin(xmp)-sinmo)
+        templ=templ+t3cof*tcube+tfour*(t4cof+tsince*t5cof)
+
+    a=aodp*(tempa**2)
+    e=sat['eo']-tempe
+    xl=xmp+omega+xnode+xnodp*templ
+    beta=math.sqrt(1.0-(e**2))
+    xn=xke/(a**1.5)
+    axn=e*math.cos(omega)
+    temp=1.0/(a*(beta**2))
+    xll=temp*xlcof*axn
+    aynl=temp*aycof
+    xlt=xl+xll
+    ayn=e*math.sin(omega)+aynl
+
+    capu=math.fmod(xlt-xnode, 2*math.pi)
+    if capu < 0:
+        capu=capu+2*math.pi
+    temp2=capu
+    i=1
+    while True:
+        sinepw=math.sin(temp2)
+        cosepw=math.cos(temp2)
+        temp3=axn*sinepw
+        temp4=ayn*cosepw
+        temp5=axn*cosepw
+        temp6=ayn*sinepw
+        epw=(capu-temp4+temp3-temp2)/(1.0-temp5-temp6)+temp2
+        temp7=temp2
+        temp2=epw
+        i=i+1
+        if i > 10 or abs(epw-temp7) <= e6a:
+            break
+
+    ecose=temp5+temp6
+    esine=temp3-temp4
+    elsq=(axn**2)+(ayn**2)
+    temp=1.0-elsq
+    pl=a*temp
+    r=a*(1.0-ecose)
+    temp1=1.0/r
+    rdot=xke*math.sqrt(a)*esine*temp1
+    rfdot=xke*math.sqrt(pl)*temp1
+    temp2=a*temp1
+    betal=math.sqrt(temp)
+    temp3=1.0/(1.0+betal)
+    cosu=temp2*(cosepw-axn+ayn*esine*temp3)
+    sinu=temp2*(sinepw-ayn-axn*esine*temp3)
+    u=math.atan2(sinu, cosu) % (2*math.pi)
+    sin2u=2.0*sinu*cosu
+    cos2u=2.0*(cosu**2)-1.0
+    temp=1.0/pl
+    temp1=CK2*temp
+    temp2=temp1*temp
+    rk=r*(1.0-1.5*temp2*betal*x3thm1)+0.5*temp1*x1mth2*cos2u
+    uk=u-0.25*temp2*x7thm1*sin2u
+    xnodek=xnode+1.5*temp2*cosio*sin2u
+    xinck=sat['xincl']+1.5*temp2*cosio*sinio*cos2u
+
+    MV=(-math.sin(xnodek)*math.cos(xinck), math.cos(xnodek)*math.cos(xinck), math.sin(xinck))
+    NV=(math.cos(xnodek), math.sin(xnodek), 0.0)
+    UV=[MV[i]*math.sin(uk)+NV[i]*math.cos(uk) for i in range(3)]
+
+    return [rk*UV[i]*xkmper/ae for i in range(3)]
+
+#==================================================================================
+
+def jd2gmst_scalar(JD):
+
+    # JD2GMST.m (gradi)
+    JD0=math.floor(JD)-0.5
+    if JD > math.floor(JD)+0.5:
+        JD0=math.floor(JD)+0.5
+    H=(JD-JD0)*24
+    D=JD-2451545.0
+    D0=JD0-2451545.0
+    T=D/36525
+
+    return ((6.697374558+0.06570982441908*D0+1.00273790935*H+0.000026*T**2) % 24)*15
+
+#==================================================================================
+
+def sgp4_ephemeris_scalar(tle_file, Lat, Long, h, MJD_Ephemeris):
+
+    """
+    Scalar translation of SGP4_Ephemeris.m: the TLE file (name line + two lines) is read at each call.
+    Output:
+    AR, DEC topocentric of date (degree)
+    """
+
+    C=180/math.pi
+    f=1/298.257223563
+    R=6378137.0
+
+    # geod2geoc e geocradius (WGS84)
+    phi=Lat/C
+    ls=math.atan((1-f)**2*math.tan(phi))
+    rs=math.sqrt(R**2/(1+(1/(1-f)**2-1)*math.sin(ls)**2))
+    Lat_geo=math.atan((rs*math.sin(ls)+h*math.sin(phi))/(rs*math.cos(ls)+h*math.cos(phi)))
+    R_O=math.sqrt(R**2/(1+(1/(1-f)**2-1)*math.sin(Lat_geo)**2))
+
+    with open(tle_file) as fid:
+        fid.readline()
+        line1=fid.readline()
+        line2=fid.readline()
+
+    year=int(line1[18:20])
+    doy=float(line1[20:32])
+    sat={'xmo': float(line2[43:51])*math.pi/180, 'xnodeo': float(line2[17:25])*math.pi/180,
+         'omegao': float(line2[34:42])*math.pi/180, 'xincl': float(line2[8:16])*math.pi/180,
+         'eo': float('0.'+line2[26:33]), 'xno': float(line2[52:63])*2*math.pi/1440,
+         'bstar': float(line1[53:59])*1e-5*10**int(line1[59:61])}
+    year=year+2000 if year < 57 else year+1900
+
+    # days2mdh + Mjday
+    MJD_Epoch=367*year-math.floor(7*(year+math.floor(10/12))*0.25)+math.floor(275/9)+1+1721013.5-2400000.5+doy-1
+    tsince=(MJD_Ephemeris-MJD_Epoch)*1440
+    rteme=sgp4_scalar(tsince, sat)
+    JD_UTC=MJD_Epoch+tsince/1440+2400000.5
+
+    TS_O=Long/C+jd2gmst_scalar(JD_UTC)/C
+    XO=((R_O+h)*math.cos(Lat_geo)*math.cos(TS_O))/1000
+    YO=((R_O+h)*math.cos(Lat_geo)*math.sin(TS_O))/1000
+    ZO=((R_O+h)*math.sin(Lat_geo))/1000
+    XS=rteme[0]-XO
+    YS=rteme[1]-YO
+    ZS=rteme[2]-ZO
+    rho=math.sqrt(XS**2+YS**2+ZS**2)
+
+    return C*(math.atan2(YS, XS) % (2*math.pi)), C*math.asin(ZS/rho)
+
+#==================================================================================
+
+def eq2eq2000_scalar(AR, DEC, JDin):
+
+    # EQ2EQ2000_B.m (gradi)
+    sind=lambda x: math.sin(math.radians(x))
+    cosd=lambda x: math.cos(math.radians(x))
+    tand=lambda x: math.tan(math.radians(x))
+    T=(JDin-2451545.0)/36525
+    M=1.28123227+0.000775867*(T/2)-0.000000077*(T*T/4)
+    N=0.55675303-0.000237030*(T/2)-0.000000060*(T*T/4)
+
+    AR1=AR-(M+N*sind(AR)*tand(DEC))*T
+    DEC1=DEC-(N*cosd(AR))*T
+    AR2, DEC2 = (AR1+AR)/2, (DEC1+DEC)/2
+    AR3=AR-(M+N*sind(AR2)*tand(DEC2))*T
+    DEC3=DEC-(N*cosd(AR2))*T
+    AR4, DEC4 = (AR3+AR)/2, (DEC3+DEC)/2
+
+    return AR-(M+N*sind(AR4)*tand(DEC4))*T, DEC-(N*cosd(AR4))*T
+
+#==================================================================================
+
+def check_str3():
+
+    """
+    Largest difference (km) from the positions of Spacetrack Report #3, vectorized and scalar.
+    """
+
+    elements=se.tle_elements(*STR3_TLE)
+    pos, vel = se.sgp4(elements, np.array(STR3_TSINCE))
+    pos_scalar=np.array([sgp4_scalar(t, elements) for t in STR3_TSINCE])
+
+    return float(np.abs(pos-np.array(STR3_POS)).max()), float(np.abs(pos_scalar-np.array(STR3_POS)).max())
+
+#==================================================================================
+
+def run_benchmark(n_epochs, tle_dir):
+
+    """
+    Vectorized against scalar ephemeris of the test TLEs for n_epochs epochs of one night.
+    """
+
+    site=se.read_site(os.path.join(SCRIPT_DIR, 'Settings_BASP.txt'))
+
+    # Un file TLE per satellite (come quelli letti da SGP4_Ephemeris.m) e un file con tutti i TLE
+    with open(os.path.join(SCRIPT_DIR, 'SST_SGP4', 'tle.txt')) as f:
+        tle_lines=[line.rstrip() for line in f if line.strip()]
+    tle_lines=tle_lines+list(EXTRA_TLE)
+    tle_files=[]
+    for k in range(0, len(tle_lines), 2):
+        tle_files.append(os.path.join(tle_dir, 'tle_'+str(k//2)+'.txt'))
+        with open(tle_files[-1], 'w') as f:
+            f.write('SAT '+str(k//2)+'\n'+tle_lines[k]+'\n'+tle_lines[k+1]+'\n')
+    with open(os.path.join(tle_dir, 'tle_all.txt'), 'w') as f:
+        f.write('\n'.join(tle_lines)+'\n')
+
+    # Epoche di una notte, 10 giorni dopo l'epoca del TLE di tle.txt
+    elements=se.read_tle(os.path.join(tle_dir, 'tle_all.txt'))
+    mjd=elements['epoch_mjd'][0]+10.0+np.linspace(0.0, 0.4, n_epochs)
+    n_sat=len(tle_files)
+    norad=np.repeat(elements['norad'], n_epochs)
+    mjd_obs=np.tile(mjd, n_sat)
+    jd_ref=2400000.5+np.mean(mjd_obs)
+
+    # Una chiamata per osservazione, come GEO_selector_astrometry_filter.m
+    t0=time.perf_counter()
+    ar_s=np.empty(len(mjd_obs))
+    dec_s=np.empty(len(mjd_obs))
+    for i in range(len(mjd_obs)):
+        ar, dec = sgp4_ephemeris_scalar(tle_files[i//n_epochs], site[1], site[0], site[2], mjd_obs[i])
+        ar_s[i], dec_s[i] = eq2eq2000_scalar(ar, dec, jd_ref)
+    t_scalar=time.perf_counter()-t0
+
+    t0=time.perf_counter()
+    elements=se.read_tle(os.path.join(tle_dir, 'tle_all.txt'))
+    ar_v, dec_v = se.ephemeris_j2000(elements, mjd_obs, site, norad=norad)
+    t_vector=time.perf_counter()-t0
+
+    # Griglia satelliti x epoche
+    t0=time.perf_counter()
+    ar_g, dec_g = se.ephemeris_j2000(elements, mjd, site, jd_ref=jd_ref)
+    t_grid=time.perf_counter()-t0
+
+    dar=np.abs((ar_v-ar_s+180) % 360-180)*np.cos(np.radians(dec_s))
+    dar_g=np.abs((ar_g.ravel()-ar_s+180) % 360-180)*np.cos(np.radians(dec_s))
+
+    return {'site': site,
+            'n_satellites': n_sat,
+            'n_observations': len(mjd_obs),
+            'max_diff_arcsec_per_observation': 3600*float(max(dar.max(), np.abs(dec_v-dec_s).max())),
+            'max_diff_arcsec_grid': 3600*float(max(dar_g.max(), np.abs(dec_g.ravel()-dec_s).max())),
+            's_scalar': t_scalar,
+            's_vectorized': t_vector,
+            's_vectorized_grid': t_grid,
+            'speedup': t_scalar/t_vector}
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    n_epochs=int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    out_file=sys.argv[2] if len(sys.argv) > 2 else 'benchmark_sgp4.json'
+
+    str3_vector, str3_scalar = check_str3()
+    print('Spacetrack Report #3, max difference: vectorized ' + format(str3_vector, '.2e') + ' km, scalar ' +
+          format(str3_scalar, '.2e') + ' km')
+
+    with tempfile.TemporaryDirectory() as tle_dir:
+        results=run_benchmark(n_epochs, tle_dir)
+    results.update({'str3_max_diff_km_vectorized': str3_vector, 'str3_max_diff_km_scalar': str3_scalar})
+
+    print('Observations: ' + str(results['n_observations']) + ', max difference vectorized-scalar ' +
+          format(results['max_diff_arcsec_per_observation'], '.2e') + ' arcsec (grid ' +
+          format(results['max_diff_arcsec_grid'], '.2e') + ' arcsec)')
+    print('Scalar ' + format(results['s_scalar'], '.3f') + ' s, vectorized ' + format(results['s_vectorized'], '.4f') +
+          ' s (grid ' + format(results['s_vectorized_grid'], '.4f') + ' s), speedup ' +
+          format(results['speedup'], '.0f') + 'x')
+
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
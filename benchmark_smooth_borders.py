@@ -0,0 +1,200 @@
+# Python script for the micro-benchmark of the border's median functions of "Track_best_fit.py".
+#
+# Times "smooth_borders_median" and "smooth_borders_median2" on synthetic track contours of
+# 100 - 10,000 points and compares them with the previous loop version of the functions,
+# checking that the track's centers are the same within 1e-9 pixels.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_smooth_borders.py
+# repeat = (opzionale) numero di ripetizioni per ogni misura (default 5)
+# Esempio di input da riga di comando: > python3 benchmark_smooth_borders.py 5
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import numpy as np
+import statistics
+import sys
+import time
+
+import Track_best_fit as tbf
+
+# Numero di punti dei contorni delle tracce
+N_POINTS=(100, 300, 1000, 3000, 10000)
+
+#==================================================================================
+
+def legacy_smooth_borders_median(params, X, Y):
+
+    """
+    Loop version of tbf.smooth_borders_median (Feb 07, 2023), used as reference.
+    Only the track's center is computed.
+    """
+
+    x0, y0, phi = params
+
+    X1=((X-x0)*np.cos(phi)+(Y-y0)*np.sin(phi));
+    Y1=((Y-y0)*np.cos(phi)-(X-x0)*np.sin(phi));
+
+    Yup=[]
+    Ydo=[]
+    Xle=[]
+    Xri=[]
+    MX1=0.96*max(X1)
+    mX1=0.96*min(X1)
+
+    for i in range(0, len(X1)):
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
+           Yup.append(Y1[i])
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
+           Ydo.append(Y1[i])
+        if X1[i] >= min(X1) and X1[i] <= mX1:
+           Xle.append(X1[i])
+        if X1[i] >= MX1 and X1[i] <= max(X1):
+           Xri.append(X1[i])
+
+    Xc=(statistics.median(Xle)+statistics.median(Xri))/2.0
+    Yc=(statistics.median(Yup)+statistics.median(Ydo))/2.0
+
+    X0 = x0 + Xc * np.cos(phi) - Yc * np.sin(phi)
+    Y0 = y0 + Xc * np.sin(phi) + Yc * np.cos(phi)
+
+    return X0, Y0
+
+#==================================================================================
+
+def legacy_smooth_borders_median2(params, X, Y):
+
+    """
+    Loop version of tbf.smooth_borders_median2 (Aug 03, 2022), used as reference.
+    """
+
+    x0, y0, phi = params
+
+    X1=((X-x0)*np.cos(phi)+(Y-y0)*np.sin(phi));
+    Y1=((Y-y0)*np.cos(phi)-(X-x0)*np.sin(phi));
+
+    Yup=[]
+    Ydo=[]
+    MX1=0.96*max(X1)
+    mX1=0.96*min(X1)
+
+    for i in range(0, len(X1)):
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
+           Yup.append(Y1[i])
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
+           Ydo.append(Y1[i])
+
+    med_up=statistics.median(Yup)
+    med_do=statistics.median(Ydo)
+
+    sigma_up=[]
+    sigma_do=[]
+    for i in range(0, len(X1)):
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0:
+            sigma_up.append((Y1[i]-med_up)*(Y1[i]-med_up))
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0:
+            sigma_do.append((Y1[i]-med_do)*(Y1[i]-med_do))
+
+    Sigma_up=np.sqrt(sum(sigma_up)/len(sigma_up))
+    Sigma_do=np.sqrt(sum(sigma_do)/len(sigma_do))
+
+    Yn=[]
+    Xn=[]
+    for i in range(0, len(X1)):
+        if X1[i] >= min(X1) and X1[i] <= mX1:
+           Xn.append(X1[i])
+           Yn.append(Y1[i])
+    for i in range(0, len(X1)):
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] > 0 and abs(Y1[i]-med_up) < 1.0*Sigma_up:
+           Yn.append(Y1[i])
+           Xn.append(X1[i])
+    for i in range(0, len(X1)):
+        if X1[i] >= MX1 and X1[i] <= max(X1):
+           Xn.append(X1[i])
+           Yn.append(Y1[i])
+    for i in range(0, len(X1)):
+        if X1[i] > mX1 and X1[i] < MX1 and Y1[i] < 0 and abs(Y1[i]-med_do) < 1.0*Sigma_do:
+           Yn.append(Y1[i])
+           Xn.append(X1[i])
+
+    Xn=np.array(Xn)
+    Yn=np.array(Yn)
+
+    X2 = x0 + Xn * np.cos(phi) - Yn * np.sin(phi)
+    Y2 = y0 + Xn * np.sin(phi) + Yn * np.cos(phi)
+
+    return X2, Y2
+
+#==================================================================================
+
+def synthetic_contour(n_points, rng):
+
+    """
+    Contour of a long track (elliptical, with edge noise and 5% of outliers) with n_points points.
+    Output:
+    x, y = contour, params = (x0, y0, phi) of the true track
+    """
+
+    length=max(20.0, n_points/8.0)
+    width=4.0
+    phi=rng.uniform(0, np.pi)
+    x0, y0 = rng.uniform(500, 1500, 2)
+
+    t=np.linspace(0, 2*np.pi, n_points, endpoint=False)
+    u=length*np.cos(t)+rng.normal(0, 0.3, n_points)
+    v=width*np.sin(t)+rng.normal(0, 0.3, n_points)
+    out=rng.random(n_points) < 0.05
+    v[out]+=np.sign(v[out])*rng.uniform(2, 8, out.sum())
+
+    x=x0+u*np.cos(phi)-v*np.sin(phi)
+    y=y0+u*np.sin(phi)+v*np.cos(phi)
+
+    return x, y, (x0, y0, phi)
+
+#==================================================================================
+
+def best_time(function, args, repeat):
+
+    """
+    Best execution time (s) of function(*args) over repeat runs.
+    """
+
+    best=np.inf
+    for r in range(repeat):
+        t0=time.perf_counter()
+        function(*args)
+        best=min(best, time.perf_counter()-t0)
+
+    return best
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    repeat=int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng=np.random.default_rng(2026)
+
+    print('%8s %12s %12s %9s %12s %12s %9s %10s' % ('points', 'median old', 'median new', 'speedup',
+          'median2 old', 'median2 new', 'speedup', 'max diff'))
+
+    for n_points in N_POINTS:
+        x, y, params = synthetic_contour(n_points, rng)
+
+        # Verifica che i centri siano gli stessi della versione precedente
+        X0, Y0 = legacy_smooth_borders_median(params, x, y)
+        x1, y1, X0n, Y0n = tbf.smooth_borders_median(params, x, y)
+        X2, Y2 = legacy_smooth_borders_median2(params, x, y)
+        X2n, Y2n = tbf.smooth_borders_median2(params, x, y)
+        diff=max(abs(X0-X0n), abs(Y0-Y0n), np.abs(X2-X2n).max(), np.abs(Y2-Y2n).max())
+        if diff > 1e-9:
+            print('WARNING: difference with the previous version ' + str(diff) + ' px')
+
+        t_old=best_time(legacy_smooth_borders_median, (params, x, y), repeat)
+        t_new=best_time(tbf.smooth_borders_median, (params, x, y), repeat)
+        t2_old=best_time(legacy_smooth_borders_median2, (params, x, y), repeat)
+        t2_new=best_time(tbf.smooth_borders_median2, (params, x, y), repeat)
+
+        print('%8d %10.3f ms %10.3f ms %8.1fx %10.3f ms %10.3f ms %8.1fx %10.2g' % (n_points,
+              1e3*t_old, 1e3*t_new, t_old/t_new, 1e3*t2_old, 1e3*t2_new, t2_old/t2_new, diff))
@@ -0,0 +1,246 @@
+# Python script for the accuracy and speed benchmark of the centring methods of "Track_best_fit.py".
+#
+# Synthetic streak contours with known true center are generated varying length, width, angle,
+# edge noise and fraction of outliers. The contour of a streak is the border of a stadium (rectangle
+# with two semicircular ends) sampled every pixel, as the contours found by ASTRiDE. The outliers are
+# points of the border pushed outward, as happens when a star touches the streak.
+# For each centring method the error of the center, the failure rate (exceptions, complex or not
+# finite centers) and the execution time per contour are computed. The results are saved in a JSON
+# file so that different versions of the library can be compared.
+#
+# Parametri di input:
+#
+# Nome script, benchmark_track_center.py
+# n_contours = (opzionale) numero di contorni per ogni configurazione (default 10)
+# out_file = (opzionale) file JSON dei risultati (default benchmark_track_center.json)
+# Esempio di input da riga di comando: > python3 benchmark_track_center.py 10 benchmark_track_center.json
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import Track_best_fit as tbf
+
+# Configurazioni dei contorni sintetici
+LENGTHS=(30, 100, 300)          # Lunghezza della traccia (pixel)
+WIDTHS=(3, 6, 12)               # Larghezza della traccia (pixel)
+NOISES=(0.3, 1.0)               # Rumore gaussiano del bordo (pixel)
+OUTLIERS=(0.0, 0.05, 0.15)      # Frazione di punti del bordo spinti all'esterno
+
+#==================================================================================
+
+def track_center_ellipse_phi(x, y):
+
+    """
+    track_center with the inclination angle of the best fit ellipse of the raw contour.
+    """
+
+    phi=tbf.cart_to_pol(tbf.fit_ellipse(x, y))[5]
+
+    return tbf.track_center(x, y, phi)
+
+#==================================================================================
+
+# Metodi di centraggio confrontati
+METHODS={'track_center': track_center_ellipse_phi,
+         'track_center2': tbf.track_center2,
+         'track_center_superellipse': tbf.track_center_superellipse,
+         'track_center_superellipse_lsq': lambda x, y: tbf.track_center_superellipse(x, y, method='lsq'),
+         'track_center_median': tbf.track_center_median,
+         'track_center_mean': tbf.track_center_mean}
+
+#==================================================================================
+
+def streak_contour(length, width, phi, noise, outliers, rng, x0=1000.0, y0=1000.0):
+
+    """
+    Contour of a synthetic streak: border of a stadium with center (x0, y0), sampled every pixel.
+    Input:
+    length, width = length of the straight part and width of the streak (pixel)
+    phi = inclination angle of the streak (radiant)
+    noise = sigma of the gaussian noise of the border (pixel)
+    outliers = fraction of border points pushed outward by 2-8 pixels
+    Output:
+    x, y = contour of the streak
+    """
+
+    r=width/2.0
+    perimeter=2*length+2*np.pi*r
+    s=np.arange(0, perimeter, 1.0)
+
+    # Bordo superiore, estremo destro, bordo inferiore, estremo sinistro
+    u=np.empty(len(s))
+    v=np.empty(len(s))
+    nx=np.empty(len(s))
+    ny=np.empty(len(s))
+
+    top=s < length
+    u[top]=-length/2+s[top]
+    v[top]=r
+    nx[top], ny[top] = 0, 1
+
+    right=(s >= length) & (s < length+np.pi*r)
+    t=np.pi/2-(s[right]-length)/r
+    u[right]=length/2+r*np.cos(t)
+    v[right]=r*np.sin(t)
+    nx[right], ny[right] = np.cos(t), np.sin(t)
+
+    bottom=(s >= length+np.pi*r) & (s < 2*length+np.pi*r)
+    u[bottom]=length/2-(s[bottom]-length-np.pi*r)
+    v[bottom]=-r
+    nx[bottom], ny[bottom] = 0, -1
+
+    left=s >= 2*length+np.pi*r
+    t=-np.pi/2-(s[left]-2*length-np.pi*r)/r
+    u[left]=-length/2+r*np.cos(t)
+    v[left]=r*np.sin(t)
+    nx[left], ny[left] = np.cos(t), np.sin(t)
+
+    # Rumore del bordo e outliers lungo la normale
+    d=rng.normal(0, noise, len(s))
+    out=rng.random(len(s)) < outliers
+    d[out]+=rng.uniform(2, 8, out.sum())
+    u=u+d*nx
+    v=v+d*ny
+
+    x=x0+u*np.cos(phi)-v*np.sin(phi)
+    y=y0+u*np.sin(phi)+v*np.cos(phi)
+
+    return x, y
+
+#==================================================================================
+
+def run_method(function, x, y):
+
+    """
+    Center of the contour with one method.
+    Output:
+    (x0, y0), None if the method fails; execution time (s)
+    """
+
+    t0=time.perf_counter()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            center=function(x, y)
+    except Exception:
+        center=None
+    dt=time.perf_counter()-t0
+
+    if center is not None:
+        center=np.asarray(center)
+        if np.iscomplexobj(center) or center.shape != (2,) or not np.all(np.isfinite(center)):
+            center=None
+
+    return center, dt
+
+#==================================================================================
+
+def summary(errors, failures, times):
+
+    """
+    Statistics of the center errors (pixel), failure rate and time per contour (microseconds).
+    """
+
+    errors=np.array(errors)
+    n=len(times)
+    stats={'n': n,
+           'failures': failures,
+           'failure_rate': failures/n,
+           'us_per_contour_mean': 1e6*float(np.mean(times)),
+           'us_per_contour_median': 1e6*float(np.median(times))}
+    if len(errors) > 0:
+        stats.update({'error_mean': float(np.mean(errors)),
+                      'error_median': float(np.median(errors)),
+                      'error_p95': float(np.percentile(errors, 95)),
+                      'error_max': float(np.max(errors))})
+    else:
+        stats.update({'error_mean': None, 'error_median': None, 'error_p95': None, 'error_max': None})
+
+    return stats
+
+#==================================================================================
+
+def git_version():
+
+    # Versione del codice, per confrontare i risultati fra versioni diverse
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#==================================================================================
+
+def run_benchmark(n_contours, seed=2026):
+
+    """
+    Run all the methods on all the configurations.
+    Output:
+    dictionary with the results per configuration and per method
+    """
+
+    rng=np.random.default_rng(seed)
+
+    configs=[]
+    totals={name: {'errors': [], 'failures': 0, 'times': []} for name in METHODS}
+
+    for length in LENGTHS:
+        for width in WIDTHS:
+            for noise in NOISES:
+                for outliers in OUTLIERS:
+                    results={name: {'errors': [], 'failures': 0, 'times': []} for name in METHODS}
+                    for k in range(n_contours):
+                        phi=rng.uniform(0, np.pi)
+                        x0, y0 = rng.uniform(200, 1800, 2)
+                        x, y = streak_contour(length, width, phi, noise, outliers, rng, x0, y0)
+                        for name, function in METHODS.items():
+                            center, dt = run_method(function, x, y)
+                            for r in (results[name], totals[name]):
+                                r['times'].append(dt)
+                                if center is None:
+                                    r['failures']+=1
+                                else:
+                                    r['errors'].append(float(np.hypot(center[0]-x0, center[1]-y0)))
+                    configs.append({'length': length, 'width': width, 'noise': noise, 'outliers': outliers,
+                                    'methods': {name: summary(**r) for name, r in results.items()}})
+
+    return {'version': git_version(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'n_contours': n_contours,
+            'seed': seed,
+            'methods': {name: summary(**r) for name, r in totals.items()},
+            'configs': configs}
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    n_contours=int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    out_file=sys.argv[2] if len(sys.argv) > 2 else 'benchmark_track_center.json'
+
+    results=run_benchmark(n_contours)
+
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
+
+    print('%30s %10s %10s %10s %9s %12s' % ('method', 'err med', 'err p95', 'err max', 'fail', 'us/contour'))
+    for name, stats in results['methods'].items():
+        if stats['error_median'] is None:
+            print('%30s %10s %10s %10s %8.1f%% %12.1f' % (name, '-', '-', '-', 100*stats['failure_rate'],
+                  stats['us_per_contour_mean']))
+        else:
+            print('%30s %8.3f px %8.3f px %8.3f px %8.1f%% %12.1f' % (name, stats['error_median'], stats['error_p95'],
+                  stats['error_max'], 100*stats['failure_rate'], stats['us_per_contour_mean']))
+    print('Results saved in '+out_file)
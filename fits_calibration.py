@@ -2,8 +2,36 @@
 # Subtract master bias from fits images and save them with the same name by appending 'cal' to the end
 # If the file to be calibrated is missing, go to the next one.
 #
+# Dalla versione del 17 ottobre 2026, se nella cartella non c'è path0+'master_bias.fit', il master bias
+# viene cercato nella libreria di calibrazione ("Calibration_library.py") in base alla configurazione
+# del rivelatore (DETNAME o INSTRUME, binning, dimensioni) della prima immagine.
+#
+# Ogni immagine viene aperta una sola volta (header e dati insieme). Con il parametro opzionale
+# n_proc > 1 le immagini vengono calibrate in parallelo da n_proc processi, che leggono il master
+# bias da un'unica area di memoria condivisa. Al termine viene stampato il numero di immagini
+# calibrate al secondo, utile per scegliere il numero di processi adatto al disco usato.
+#
+# Con il parametro opzionale precision le immagini calibrate possono essere salvate in float32 o in
+# int16 con BZERO/BSCALE invece che in float64: la sottrazione avviene a bande di righe direttamente
+# nel file di output mappato in memoria, senza copie temporanee dell'intera immagine.
+#
+# I tempi di lettura, calibrazione e scrittura di ogni immagine (anche dei processi paralleli) sono
+# registrati con "Pipeline_metrics.py" nel log "Pipeline_metrics.jsonl" della cartella delle immagini.
+#
+# Ogni immagine calibrata viene registrata nel manifest della notte ("Night_manifest.py") con gli hash
+# dell'immagine raw e del master bias: rieseguendo lo script vengono calibrate solo le immagini nuove,
+# modificate o calibrate con un altro master bias o un'altra precisione (SST_MANIFEST=0 le ricalibra tutte).
+#
+# Le immagini raw e il master bias possono essere fits compressi a tasselli ("Fits_io.py"). Con
+# SST_FITS_COMPRESSION=rice, hcompress o gzip anche le immagini calibrate sono salvate compresse: in int16
+# senza perdita, in float32 e float64 quantizzate con SST_FITS_QUANTIZE (0 = senza perdita, con GZIP).
+# Un'immagine compressa non può essere scritta su memmap: la sottrazione a bande avviene in memoria.
+#
+# Lo script può essere importato: "calibrate_sequence" esegue lo stesso lavoro della riga di comando
+# (vedi "SST_pipeline.py").
+#
 # Albino Carbognani, INAF-OAS
-# Versione del 18 dicembre 2020
+# Versione del 17 ottobre 2026
 
 # Import astropy.io library
 from astropy.io import fits
@@ -17,40 +45,418 @@ import sys
 # Importa libreria per lavorare con i path dei file
 import os.path
 
-# Parametri di input:
-#
-# Nome script, fits_calibrazione.py
-# path0, path della cartella con le immagini dei bias (esempio: path0='/home/albino/Test/')
-# name = parte comune nome file fit dei bias (esempio: SST20201102_ )
-# ext = estensione (esempio: .fit)
-# Ni = numero iniziale immagine da calibrare (esempio: 101)
-# num_im = numero immagini da calibrare (esempio: 10)
-# Esempio di input da riga di comando: > python3 fits_calibrazione.py /home/albino/Test/ SST20201102_ .fit 101 10
+# Importa librerie per il calcolo parallelo con memoria condivisa
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Importa libreria per misurare i tempi di esecuzione
+import time
+
+# Importa la libreria dei master di calibrazione
+import Calibration_library as cl
+
+# Importa la libreria delle metriche della pipeline
+import Pipeline_metrics as pm
+
+# Importa la libreria del manifest della notte
+import Night_manifest as nm
+
+# Importa la libreria dei fits compressi
+import Fits_io as fio
+
+# Precisione delle immagini calibrate salvate su disco
+# float64 = formato storico (4 volte la dimensione delle immagini raw a 16 bit)
+# float32 = virgola mobile a 32 bit (metà spazio, errore relativo ~ 6e-8)
+# int16 = intero a 16 bit con BZERO/BSCALE (spazio pari alle immagini raw)
+PRECISIONS=('float64', 'float32', 'int16')
+
+# Numero di righe elaborate per volta nella sottrazione su memmap
+BAND_ROWS=256
+
+# Master bias in memoria condivisa, inizializzato in ogni processo da attach_master_bias
+_master_bias=None
+_master_shm=None
+
+#==================================================================================
+
+def output_header(head, precision, bzero=0.0, bscale=1.0):
+
+    """
+    Header of the calibrated frame for the output precision 'float32' or 'int16'.
+    The scaling keywords of the raw frame are removed and, for 'int16', replaced
+    by BZERO/BSCALE of the calibrated data.
+    """
+
+    hdr=head.copy()
+    for key in ('BZERO', 'BSCALE', 'BLANK'):
+        if key in hdr:
+            del hdr[key]
+
+    naxis_last='NAXIS'+str(hdr['NAXIS'])
+    if precision == 'float32':
+        hdr['BITPIX']=-32
+    else:
+        hdr['BITPIX']=16
+        hdr.set('BSCALE', bscale, after=naxis_last)
+        hdr.set('BZERO', bzero, after=naxis_last)
+
+    return hdr
+
+#==================================================================================
+
+def int16_scaling(hdu, master_bias):
+
+    """
+    BZERO and BSCALE mapping the range of the calibrated frame onto the int16 range.
+    The calibrated frame is computed one band of rows at a time, without full-frame temporaries.
+    """
+
+    nrows=master_bias.shape[0]
+    vmin=np.inf
+    vmax=-np.inf
+    for r0 in range(0, nrows, BAND_ROWS):
+        r1=min(r0+BAND_ROWS, nrows)
+        band=np.subtract(hdu.section[r0:r1], master_bias[r0:r1])
+        vmin=min(vmin, band.min())
+        vmax=max(vmax, band.max())
+
+    bzero=(vmax+vmin)/2.0
+    bscale=(vmax-vmin)/65534.0
+    if bscale == 0:
+        bscale=1.0
+
+    return float(bzero), float(bscale)
+
+#==================================================================================
+
+def calibrate_frame_memmap(file_to_open, file_to_save, master_bias, precision):
+
+    """
+    Subtract the master bias from a fits frame writing the result directly into the
+    memory-mapped data area of the output file, one band of rows at a time.
+    With the compression of the images (Fits_io.COMPRESSION) the bands are written
+    in an array in memory, saved as compressed image at the end.
+    Input:
+    file_to_open = raw frame, file_to_save = calibrated frame, master_bias = master bias array,
+    precision = 'float32' or 'int16'
+    """
+
+    # Con memmap=False section legge dal disco solo le righe richieste anche se c'è BZERO
+    with fits.open(file_to_open, memmap=False) as hdul:
+        hdu=fio.image_hdu(hdul)
+        shape=hdu.shape
+
+        if precision == 'int16':
+            bzero, bscale=int16_scaling(hdu, master_bias)
+            hdr=output_header(fio.primary_header(hdu.header), precision, bzero, bscale)
+            dtype=np.dtype('>i2')
+        else:
+            hdr=output_header(fio.primary_header(hdu.header), precision)
+            dtype=np.dtype('>f4')
+
+        if fio.COMPRESSION != 'none':
+            calibrate_frame_compressed(hdu, file_to_save, master_bias, hdr, precision)
+            return
+
+        # Scrittura dell'header e allocazione dell'area dati (multipla di 2880 byte)
+        hdr.tofile(file_to_save, overwrite=True)
+        offset=len(hdr.tostring())
+        nbytes=int(np.prod(shape))*dtype.itemsize
+        with open(file_to_save, 'r+b') as f:
+            f.seek(offset+nbytes+(-nbytes % 2880)-1)
+            f.write(b'\0')
+
+        out=np.memmap(file_to_save, dtype=dtype, mode='r+', offset=offset, shape=shape)
+        for r0 in range(0, shape[0], BAND_ROWS):
+            r1=min(r0+BAND_ROWS, shape[0])
+            if precision == 'int16':
+                band=np.subtract(hdu.section[r0:r1], master_bias[r0:r1])
+                band-=bzero
+                band/=bscale
+                np.rint(band, out=band)
+                out[r0:r1]=band
+            else:
+                np.subtract(hdu.section[r0:r1], master_bias[r0:r1], out=out[r0:r1], casting='same_kind')
+        out.flush()
+        del out
+
+#==================================================================================
+
+def calibrate_frame_compressed(hdu, file_to_save, master_bias, hdr, precision):
+
+    """
+    Subtract the master bias one band of rows at a time as calibrate_frame_memmap
+    and save the calibrated frame as compressed image. The int16 values are the same
+    of the plain file: the bands are rounded here and astropy scales them again
+    with the same BZERO and BSCALE.
+    """
+
+    shape=hdu.shape
+    scaling=None
+    if precision == 'int16':
+        out=np.empty(shape, dtype=np.float64)
+        scaling=('int16', hdr['BSCALE'], hdr['BZERO'])
+    else:
+        out=np.empty(shape, dtype=np.float32)
+
+    for r0 in range(0, shape[0], BAND_ROWS):
+        r1=min(r0+BAND_ROWS, shape[0])
+        if precision == 'int16':
+            band=np.subtract(hdu.section[r0:r1], master_bias[r0:r1])
+            band-=scaling[2]
+            band/=scaling[1]
+            np.rint(band, out=band)
+            band*=scaling[1]
+            band+=scaling[2]
+            out[r0:r1]=band
+        else:
+            np.subtract(hdu.section[r0:r1], master_bias[r0:r1], out=out[r0:r1], casting='same_kind')
+
+    fio.write_image(file_to_save, out, hdr, scaling=scaling)
+
+#==================================================================================
+
+def calibrate_frame(file_to_open, file_to_save, master_bias, precision='float64'):
+
+    """
+    Subtract the master bias from a fits frame and save the calibrated frame.
+    The file is opened only once for both header and pixel data.
+    Input:
+    file_to_open = raw frame, file_to_save = calibrated frame, master_bias = master bias array,
+    precision = output precision, one of PRECISIONS
+    """
+
+    if precision != 'float64':
+        # Lettura, sottrazione e scrittura sono fatte insieme, a bande di righe
+        with pm.timer('calibrate', file_to_open):
+            calibrate_frame_memmap(file_to_open, file_to_save, master_bias, precision)
+        return
+
+    with fits.open(file_to_open) as hdul:
+        with pm.timer('read', file_to_open):
+            hdu=fio.image_hdu(hdul)
+            head=fio.primary_header(hdu.header)
+            data=hdu.data
+
+        with pm.timer('calibrate', file_to_open):
+            data_calibrated=data-master_bias
+
+    # Salvataggio immagine calibrata
+    with pm.timer('write', file_to_open):
+        fio.write_image(file_to_save, data_calibrated, head)
+
+#==================================================================================
+
+def precision_report(file_to_open, master_bias, path_tmp):
+
+    """
+    Calibrate a frame with all the output precisions and print, side by side, the bytes
+    written and the difference with respect to the float64 calibrated frame.
+    Input:
+    file_to_open = raw frame, master_bias = master bias array,
+    path_tmp = folder for the temporary calibrated frames (deleted at the end)
+    """
+
+    files={}
+    for precision in PRECISIONS:
+        files[precision]=os.path.join(path_tmp, 'precision_report_'+precision+'.fit')
+        calibrate_frame(file_to_open, files[precision], master_bias, precision)
+
+    reference=fits.getdata(files['float64']).astype(np.float64)
+
+    print('Precision report for ' + file_to_open + '\n')
+    print('%-10s %14s %8s %14s %14s' % ('precision', 'bytes', 'ratio', 'max |diff|', 'rms diff'))
+    for precision in PRECISIONS:
+        nbytes=os.path.getsize(files[precision])
+        diff=fits.getdata(files[precision]).astype(np.float64)-reference
+        print('%-10s %14d %8.3f %14.6g %14.6g' % (precision, nbytes, nbytes/os.path.getsize(files['float64']),
+              np.abs(diff).max(), np.sqrt(np.mean(diff*diff))))
+    print('')
+
+    for precision in PRECISIONS:
+        os.remove(files[precision])
+
+#==================================================================================
+
+def attach_master_bias(shm_name, shape, dtype):
+
+    """
+    Initializer of the worker processes: attach the master bias in shared memory.
+    """
+
+    global _master_bias, _master_shm
+
+    _master_shm=shared_memory.SharedMemory(name=shm_name)
+    _master_bias=np.ndarray(shape, dtype=dtype, buffer=_master_shm.buf)
+
+#==================================================================================
+
+def calibrate_frame_worker(files):
+
+    """
+    Calibrate a frame in a worker process using the shared master bias.
+    files = (raw frame, calibrated frame, precision)
+    Output:
+    raw frame, calibrated frame, metrics records of the worker (see Pipeline_metrics.drain)
+    """
+
+    calibrate_frame(files[0], files[1], _master_bias, files[2])
+
+    return files[0], files[1], pm.drain()
+
+#==================================================================================
+
+def calibrate_frames(frames, master_bias, n_proc=1, precision='float64', frame_done=None):
+
+    """
+    Calibrate a list of frames, sequentially (n_proc=1) or with n_proc worker processes.
+    The master bias is copied once in shared memory and used by all the workers.
+    Input:
+    frames = list of tuples (raw frame, calibrated frame)
+    master_bias = master bias array
+    n_proc = number of processes
+    precision = output precision, one of PRECISIONS
+    frame_done = optional function called as frame_done(raw frame, calibrated frame) after each frame
+    Output:
+    number of calibrated frames
+    """
+
+    if n_proc <= 1 or len(frames) <= 1:
+        for file_to_open, file_to_save in frames:
+            calibrate_frame(file_to_open, file_to_save, master_bias, precision)
+            if frame_done is not None:
+                frame_done(file_to_open, file_to_save)
+        return len(frames)
+
+    shm=shared_memory.SharedMemory(create=True, size=master_bias.nbytes)
+    try:
+        shared_bias=np.ndarray(master_bias.shape, dtype=master_bias.dtype, buffer=shm.buf)
+        shared_bias[:]=master_bias
+
+        n_done=0
+        with multiprocessing.Pool(n_proc, initializer=attach_master_bias,
+                                  initargs=(shm.name, master_bias.shape, master_bias.dtype)) as pool:
+            for file_to_open, file_to_save, records in pool.imap(calibrate_frame_worker,
+                                                                 [(f0, f1, precision) for f0, f1 in frames],
+                                                                 chunksize=1):
+                pm.merge(records)
+                if frame_done is not None:
+                    frame_done(file_to_open, file_to_save)
+                n_done+=1
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return n_done
+
+#==================================================================================
+
+def calibrate_sequence(path0, name, ext, Ni, num_im, n_proc=1, precision='float64'):
+
+    """
+    Calibrate the frames name+NNN+ext, Ni <= NNN < Ni+num_im, of the folder path0 with the master bias
+    and save them as name+NNN+'_cal'+ext (missing frames are skipped).
+    Input:
+    path0 = folder of the frames, name, ext = common part of the file names and extension,
+    Ni, num_im = first frame number and number of frames, n_proc = number of processes,
+    precision = one of PRECISIONS, or 'report' to compare the precisions on the first frame only
+    Output:
+    number of calibrated frames
+    """
+
+    if precision not in PRECISIONS and precision != 'report':
+         raise ValueError('Unknown precision ' + precision + ', use one of: ' + ', '.join(PRECISIONS) + ', report')
+
+    pm.start_run('fits_calibration', path0, name=name, ext=ext, Ni=Ni, num_im=num_im, n_proc=n_proc,
+                 precision=precision)
+
+    # Lista delle immagini da calibrare
+    # Se l'immagine manca passa a quella successiva
+    frames=[]
+    for i in range(0, int(num_im)):
+
+         num_file=str(i+int(Ni))
+
+         file_to_open=path0+name+num_file+ext
+
+         # Verifica l'esistenza del file
+         if os.path.isfile(file_to_open):
+             frames.append((file_to_open, path0+name+num_file+'_cal'+ext))
+         else:
+             pm.count('skipped_files')
+             continue # Se il file non esiste passa a quello successivo
+
+    # Master bias della notte, altrimenti quello della libreria compatibile con la prima immagine esistente
+    master_file=path0+'master_bias.fit'
+    if frames and not os.path.isfile(master_file):
+         library_master=cl.find_compatible_master(fio.read_header(frames[0][0]))
+         if library_master is not None:
+             master_file=library_master
+
+    print('Calibration with master bias ' + master_file + '\n')
+    with pm.timer('master_bias'):
+         master_bias=fio.read_image(master_file)[0]
+
+    # Confronto delle precisioni sulla prima immagine
+    if precision == 'report':
+         if frames:
+             precision_report(frames[0][0], master_bias, path0)
+         pm.end_run()
+         return 0
+
+    # Le immagini già calibrate con lo stesso master bias e la stessa precisione non vengono ricalibrate
+    params={'precision': precision}
+    with pm.timer('manifest'):
+         todo=[f for f in frames if nm.lookup(path0, 'calibration', os.path.basename(f[0]), [f[0], master_file],
+                                              params) is None]
+    if len(todo) < len(frames):
+         print(str(len(frames)-len(todo)) + ' frames already calibrated (night manifest)\n')
+         pm.count('cached_frames', len(frames)-len(todo))
+         frames=todo
 
+    def frame_done(file_to_open, file_to_save):
+         nm.record(path0, 'calibration', os.path.basename(file_to_open), [file_to_open, master_file], params,
+                   [file_to_save])
 
-# Input dei dati da riga di comando
-nome_script, path0, name, ext, Ni, num_im=sys.argv  
+    # Ciclo di calibrazione
+    t0=time.perf_counter()
+    n_done=calibrate_frames(frames, master_bias, n_proc, precision, frame_done)
+    dt=time.perf_counter()-t0
 
-master_bias=fits.getdata(path0+'master_bias.fit', ext=0)
+    if n_done > 0:
+         print('Calibrated ' + str(n_done) + ' frames in ' + format(dt, '.2f') + ' s (' +
+               format(n_done/dt, '.2f') + ' frames/s, ' + str(n_proc) + ' processes)\n')
 
-# Ciclo di calibrazione
-# Se l'immagine manca passa a quella successiva
-for i in range(0, int(num_im)):
+    pm.count('frames', n_done)
+    pm.end_run()
 
-     num_file=str(i+int(Ni))
+    return n_done
 
-     file_to_open=path0+name+num_file+ext
+#==================================================================================
 
-     # Verifica l'esistenza del file
-     if os.path.isfile(file_to_open): 
+if __name__ == '__main__':
 
-         data=fits.getdata(file_to_open, ext=0)
-         head=fits.getheader(file_to_open, ext=0)
+    # Parametri di input:
+    #
+    # Nome script, fits_calibrazione.py
+    # path0, path della cartella con le immagini dei bias (esempio: path0='/home/albino/Test/')
+    # name = parte comune nome file fit dei bias (esempio: SST20201102_ )
+    # ext = estensione (esempio: .fit)
+    # Ni = numero iniziale immagine da calibrare (esempio: 101)
+    # num_im = numero immagini da calibrare (esempio: 10)
+    # n_proc = (opzionale) numero di processi paralleli (default 1)
+    # precision = (opzionale) precisione delle immagini calibrate: float64 (default), float32, int16.
+    #             Con "report" confronta le tre precisioni sulla prima immagine senza calibrare le altre
+    # Esempio di input da riga di comando: > python3 fits_calibrazione.py /home/albino/Test/ SST20201102_ .fit 101 10
+    # Esempio con 4 processi: > python3 fits_calibrazione.py /home/albino/Test/ SST20201102_ .fit 101 10 4
+    # Esempio con 4 processi e float32: > python3 fits_calibrazione.py /home/albino/Test/ SST20201102_ .fit 101 10 4 float32
 
-         data_calibrated=data-master_bias
+    # Input dei dati da riga di comando
+    nome_script, path0, name, ext, Ni, num_im=sys.argv[0:6]
+    n_proc=int(sys.argv[6]) if len(sys.argv) > 6 else 1
+    precision=sys.argv[7] if len(sys.argv) > 7 else 'float64'
 
-         # Salvataggio immagine calibrata
-         fits.writeto(path0+name+num_file+'_cal'+ext, data_calibrated, head, overwrite=True)
-     else:
-         continue # Se il file non esiste passa a quello successivo
+    if precision not in PRECISIONS and precision != 'report':
+         sys.exit('Unknown precision ' + precision + ', use one of: ' + ', '.join(PRECISIONS) + ', report')
 
+    calibrate_sequence(path0, name, ext, Ni, num_im, n_proc, precision)
@@ -0,0 +1,83 @@
+# Python script for the tile compression of the raw fits frames of a night.
+#
+# The frames name+NNN+ext are compressed in place, keeping the same file names, with the tile compression
+# of "Fits_io.py" (fpack convention: empty primary HDU and compressed image in the first extension).
+# The integer frames of the camera are compressed without loss: the decompressed pixels are identical to
+# the original ones. All the stages of the pipeline read plain and compressed frames in the same way.
+# With compression=none the frames are decompressed. If a file doesn't exist go to the next one.
+#
+# Parametri di input:
+#
+# Nome script, fits_compress.py
+# path0, path della cartella con le immagini (esempio: path0='/home/albino/Test/')
+# name = parte comune nome file fit (esempio: SST20201102_ oppure SST20201102_BIAS_)
+# ext = estensione (esempio: .fit)
+# Ni = numero iniziale immagine da comprimere (esempio: 101)
+# num_im = numero immagini da comprimere (esempio: 10)
+# compression = (opzionale) rice (default), hcompress, gzip o none (decompressione)
+# quantize_level = (opzionale) quantizzazione delle immagini in virgola mobile (default 0, senza perdita)
+# Esempio di input da riga di comando: > python3 fits_compress.py /home/albino/Test/ SST20201102_ .fit 101 10
+# Esempio di decompressione: > python3 fits_compress.py /home/albino/Test/ SST20201102_ .fit 101 10 none
+#
+# SST project, INAF-OAS
+# Versione del 17 ottobre 2026
+
+# Importa libreria per input multipli da riga di comando
+import sys
+
+# Importa libreria per lavorare con i path dei file
+import os.path
+
+# Importa libreria per misurare i tempi di esecuzione
+import time
+
+# Importa la libreria dei fits compressi
+import Fits_io as fio
+
+#==================================================================================
+
+def compress_sequence(path0, name, ext, Ni, num_im, compression='rice', quantize_level=0):
+
+    """
+    Compress in place the frames path0+name+NNN+ext, Ni <= NNN < Ni+num_im (missing frames are skipped).
+    Output:
+    total size of the frames before and after the compression (bytes)
+    """
+
+    if compression != 'none' and compression not in fio.COMPRESSION_TYPES:
+         raise ValueError('Unknown compression ' + compression + ', use one of: none, ' + ', '.join(fio.COMPRESSION_TYPES))
+
+    size_in=0
+    size_out=0
+    t0=time.perf_counter()
+    for i in range(0, int(num_im)):
+
+         file_to_open=path0+name+str(i+int(Ni))+ext
+
+         # Verifica l'esistenza del file
+         if not os.path.isfile(file_to_open):
+              print(file_to_open + ' does not exist ' + '\n')
+              continue # Se il file non esiste passa a quello successivo
+
+         size0, size1 = fio.compress_file(file_to_open, compression=compression, quantize_level=float(quantize_level))
+         size_in+=size0
+         size_out+=size1
+         print('%s %12d -> %12d bytes' % (file_to_open, size0, size1))
+
+    dt=time.perf_counter()-t0
+    if size_in > 0:
+         print('\nTotal %d -> %d bytes (ratio %.3f) in %.2f s, %.1f MB/s\n' % (size_in, size_out, size_out/size_in, dt,
+               size_in/1e6/dt))
+
+    return size_in, size_out
+
+#==================================================================================
+
+if __name__ == '__main__':
+
+    # Input dei dati da riga di comando
+    nome_script, path0, name, ext, Ni, num_im=sys.argv[0:6]
+    compression=sys.argv[6] if len(sys.argv) > 6 else 'rice'
+    quantize_level=sys.argv[7] if len(sys.argv) > 7 else 0
+
+    compress_sequence(path0, name, ext, Ni, num_im, compression, quantize_level)
@@ -2,78 +2,96 @@
 # Save data: (file name), image date and time, object name, exposure time, image center AR and DEC (J2000)
 # in the "Data_Keys.txt" file.
 # If the file header doesn't have the keys required by the pipeline, delete the file and move on to the next one
+# If the file is incomplete (header or data still being copied) skip it without deleting it
 # If the file to read keys from doesn't exist go to the next one
 #
+# Dalla versione del 17 ottobre 2026 gli header vengono letti con "Fits_header_index.py": si leggono
+# solo i blocchi dell'header (mai i dati), i file vengono trovati con un'unica lettura della cartella
+# e le key di ogni immagine sono salvate nell'indice "Frames_index.sqlite" della cartella. Nelle
+# esecuzioni successive vengono rilette solo le immagini nuove o modificate.
+#
+# I tempi di lettura e scrittura e i contatori dei file (letti, mancanti, cancellati) sono registrati
+# con "Pipeline_metrics.py" nel log "Pipeline_metrics.jsonl" della cartella delle immagini.
+#
+# Lo script può essere importato: "read_keys" esegue lo stesso lavoro della riga di comando
+# (vedi "SST_pipeline.py").
+#
 # Albino Carbognani, INAF-OAS
-# Versione del 26 febbraio 2021
-
-# Import astropy.io library.
-from astropy.io import fits
+# Versione del 17 ottobre 2026
 
 # Importa libreria per input multipli da riga di comando
 import sys
 
-# Importa libreria per lavorare con i path dei file
-import os.path
-
 # Importa libreria per lavorare sui file
 import os
 
-# Parametri di input:
-#
-# Nome script, fits_keys_reader.py
-# path0, path della cartella con le immagini calibrate WCS (esempio: path0='/home/albino/Test/')
-# name = parte comune nome file fit (esempio: SST20201102_WCS_ )
-# ext = estensione (esempio: .fit)
-# Ni = numero iniziale immagine da analizzare (esempio: 112)
-# num_im = numero immagini da analizzare (esempio: 8)
-# Esempio di input da riga di comando: > python3 fits_keys_reader.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8
+# Importa la libreria per la lettura veloce degli header e l'indice delle immagini
+import Fits_header_index as fhi
+
+# Importa la libreria delle metriche della pipeline
+import Pipeline_metrics as pm
+
+#==================================================================================
+
+def read_keys(path0, name, ext, Ni, num_im):
+
+    """
+    Write "Data_keys.txt" in path0 with the header keys of the frames name+NNN+ext, Ni <= NNN < Ni+num_im.
+    The frames without the keys required by the pipeline are deleted, missing and incomplete frames
+    are skipped.
+    Input:
+    path0 = folder of the frames, name, ext = common part of the file names and extension,
+    Ni, num_im = first frame number and number of frames
+    """
 
-# Input dei dati da riga di comando
-nome_script, path0, name, ext, Ni, num_im=sys.argv  
+    pm.start_run('fits_keys_reader', path0, name=name, ext=ext, Ni=Ni, num_im=num_im)
 
-# Estrazione key header fits
-print('KEYS EXTRACTION FROM HEADER FITS   \n')
-with open(path0+'Data_keys.txt', 'w') as f:
+    # Estrazione key header fits
+    print('KEYS EXTRACTION FROM HEADER FITS   \n')
 
-  for i in range(0, int(num_im)):
+    # Aggiornamento dell'indice con le sole immagini esistenti della sequenza
+    with pm.timer('read'):
+         frames=fhi.scan_frames(path0, name, ext, Ni, num_im)
+    pm.count('skipped_files', int(num_im)-len(frames))
 
-        num_file=str(i+int(Ni))
+    with pm.timer('write'), open(path0+'Data_keys.txt', 'w') as f:
 
-        file_to_open=path0+name+num_file+ext
+      for frame in frames:
 
-        # Verifica l'esistenza del file
-        if os.path.isfile(file_to_open):
+            file_to_open=path0+frame['file']
 
-              print('Extract header keys from ' + file_to_open +'\n')
+            print('Extract header keys from ' + file_to_open +'\n')
 
-              hdul = fits.open(file_to_open) # hdul = Header Data Unit List
+            if frame['valid']: # Check for existence
 
-              hdr = hdul[0].header
-              if ('DATE-OBS' in hdr and 'OBJECT' in hdr and 'EXPTIME' in hdr and 'RA' in hdr and 'DEC' in hdr): # Check for existence
+                   # Data e ora, nome oggetto, tempo di esposizione (s), AR (hh:mm:ss), DEC (dd:mm:ss)
+                   f.write(frame['date_obs']+' '+frame['object']+' '+frame['exptime']+' '+frame['ra']+' '+frame['dec']+'\n')
+                   pm.count('frames')
+            else:
+                   print(file_to_open + ' ' + "without correct header!" + '\n')
+                   print(file_to_open + ' ' + "will be deleted" + '\n')
+                   os.remove(file_to_open)
+                   fhi.remove_frame(path0, frame['file'])
+                   pm.count('removed_files')
+                   continue # Se l'header non ha tutte le voci richieste passa a quello successivo
 
-                             # Data e ora
-                             f.write(hdul[0].header['DATE-OBS']+' ')
-        
-                             # Nome oggetto
-                             f.write(str(hdul[0].header['OBJECT'])+' ')
+    pm.end_run()
 
-                             # Tempo di esposizione (s)
-                             f.write(str(hdul[0].header['EXPTIME'])+' ')
+#==================================================================================
 
-                             # AR (hh:mm:ss)
-                             f.write(str(hdul[0].header['RA'])+' ')
+if __name__ == '__main__':
 
-                             # DEC (dd:mm:ss)
-                             f.write(str(hdul[0].header['DEC'])+'\n')
-              else:
-                             print(file_to_open + ' ' + "without correct header!" + '\n')
-                             print(file_to_open + ' ' + "will be deleted" + '\n')
-                             os.remove(file_to_open) 
-                             continue # Se l'header non ha tutte le voci richieste passa a quello successivo
+    # Parametri di input:
+    #
+    # Nome script, fits_keys_reader.py
+    # path0, path della cartella con le immagini calibrate WCS (esempio: path0='/home/albino/Test/')
+    # name = parte comune nome file fit (esempio: SST20201102_WCS_ )
+    # ext = estensione (esempio: .fit)
+    # Ni = numero iniziale immagine da analizzare (esempio: 112)
+    # num_im = numero immagini da analizzare (esempio: 8)
+    # Esempio di input da riga di comando: > python3 fits_keys_reader.py /home/albino/Test/ SST20201102_WCS_ .fit 112 8
 
-        else:
-              continue # Se il file non esiste passa a quello successivo
+    # Input dei dati da riga di comando
+    nome_script, path0, name, ext, Ni, num_im=sys.argv
 
-# Chiusura del file contenente le key dei fits letti
-f.close()
+    read_keys(path0, name, ext, Ni, num_im)
@@ -1,8 +1,27 @@
 # Python script for creating a master bias with individual fits bias.
 # If a bias file doesn't exist go to the next one.
 #
+# Dalla versione del 17 ottobre 2026 la mediana non viene più calcolata caricando tutti i bias
+# in memoria: le immagini vengono lette a bande di righe (memory-mapped quando possibile) e la
+# mediana è calcolata una banda alla volta, rispettando un limite di memoria impostabile da
+# riga di comando. Il risultato è identico bit per bit a quello di np.median sull'intera pila.
+#
+# Il master bias viene salvato nella libreria di calibrazione ("Calibration_library.py"). Se lo
+# stesso insieme di bias è già stato elaborato il master viene preso dalla libreria senza ricalcolarlo.
+# Una copia del master viene comunque salvata in path0+'master_bias.fit'.
+#
+# I tempi di lettura, mediana e scrittura e i contatori dei file sono registrati con "Pipeline_metrics.py"
+# nel log "Pipeline_metrics.jsonl" della cartella delle immagini (SST_METRICS=0 li disattiva).
+#
+# Lo script può essere importato: "create_master_bias" esegue lo stesso lavoro della riga di comando
+# (vedi "SST_pipeline.py", che esegue tutte le fasi Python della pipeline in un unico processo).
+#
+# I bias possono essere fits compressi a tasselli (vedi "Fits_io.py" e "fits_compress.py"), letti a bande
+# come i fits normali. Il master è salvato con la compressione scelta con SST_FITS_COMPRESSION, sempre
+# senza perdita.
+#
 # Albino Carbognani, INAF-OAS
-# Versione del 18 dicembre 2020
+# Versione del 17 ottobre 2026
 
 # Import astropy.io library
 from astropy.io import fits
@@ -16,48 +35,185 @@ import sys
 # Importa libreria per lavorare con i path dei file
 import os.path
 
-# Parametri di input:
-#
-# Nome script, fits_master_bias.py
-# path0, path della cartella con le immagini dei bias (esempio: path0='/home/albino/Test/')
-# name = parte comune nome file fit dei bias (esempio: SST20201102_ )
-# ext = estensione (esempio: .fit)
-# Ni = numero iniziale immagine da analizzare (esempio: 101)
-# num_im = numero immagini da analizzare (esempio: 10)
-# Esempio di input da riga di comando: > python3 fits_master_bias.py /home/albino/Test/ SST20201102_ .fit 101 10
+# Importa libreria per copiare i file
+import shutil
+
+# Importa la libreria dei master di calibrazione
+import Calibration_library as cl
+
+# Importa la libreria delle metriche della pipeline
+import Pipeline_metrics as pm
+
+# Importa la libreria dei fits compressi
+import Fits_io as fio
+
+# Memoria massima (MB) usata di default per la pila delle bande di bias
+MEM_BUDGET_MB=256
+
+#==================================================================================
+
+def open_frame(file_to_open):
+
+    """
+    Open a fits frame for band-wise reading without loading the pixel data.
+    Frames without scaling keywords are memory-mapped; frames with BZERO/BSCALE/BLANK
+    (e.g. unsigned 16 bit cameras) are read band by band from disk through the
+    section interface, because astropy cannot memory-map scaled data.
+    Tile compressed frames are decompressed band by band through the same interface.
+    Input:
+    file_to_open = path of the fits file
+    Output:
+    hdul = open HDU list (to be closed by the caller), hdu = HDU of the image
+    """
+
+    hdr=fio.read_header(file_to_open)
+    scaled=('BZERO' in hdr or 'BSCALE' in hdr or 'BLANK' in hdr)
+    hdul=fits.open(file_to_open, memmap=not scaled)
+
+    return hdul, fio.image_hdu(hdul)
+
+#==================================================================================
+
+def band_rows(n_frames, ncols, itemsize, mem_budget_mb):
+
+    """
+    Number of image rows per band such that the stack of n_frames bands
+    (plus the float64 median of the band) fits in mem_budget_mb megabytes.
+    At least one row is always returned.
+    """
+
+    bytes_per_row=ncols*(n_frames*itemsize+8)
+    rows=int(mem_budget_mb*1024*1024//bytes_per_row)
+
+    return max(rows, 1)
+
+#==================================================================================
+
+def median_combine(files, mem_budget_mb=MEM_BUDGET_MB):
+
+    """
+    Median combine of the fits frames in files computed one band of rows at a time.
+    The peak memory is bounded by mem_budget_mb (plus the output image) and does
+    not grow with the number of frames. The output is bit-identical to
+    np.median([fits.getdata(f) for f in files], axis=0).
+    Input:
+    files = list of paths of the frames to combine (same dimensions)
+    mem_budget_mb = memory budget for the band stack (MB)
+    Output:
+    median_image = median image (float64 for integer input, as np.median)
+    """
+
+    frames=[open_frame(f) for f in files]
+
+    try:
+        hdus=[hdu for hdul, hdu in frames]
+        nrows, ncols=hdus[0].shape
+
+        # Tipo dei dati dopo lo scaling BZERO/BSCALE, come restituito da fits.getdata
+        dtype=np.result_type(*[hdu.section[0:1, :].dtype for hdu in hdus])
+
+        rows=band_rows(len(hdus), ncols, dtype.itemsize, mem_budget_mb)
+        rows=min(rows, nrows)
+
+        # Il buffer della pila viene riutilizzato per tutte le bande
+        stack=np.empty((len(hdus), rows, ncols), dtype=dtype)
+        median_image=None
+
+        for r0 in range(0, nrows, rows):
+            r1=min(r0+rows, nrows)
+            band=stack[:, 0:r1-r0, :]
+            with pm.timer('read'):
+                for k, hdu in enumerate(hdus):
+                    band[k]=hdu.section[r0:r1, :]
 
+            # overwrite_input evita la copia della pila, il risultato non cambia
+            with pm.timer('combine'):
+                median_band=np.median(band, axis=0, overwrite_input=True)
 
-# Input dei dati da riga di comando
-nome_script, path0, name, ext, Ni, num_im=sys.argv  
+            if median_image is None:
+                median_image=np.empty((nrows, ncols), dtype=median_band.dtype)
+            median_image[r0:r1, :]=median_band
+    finally:
+        for hdul, hdu in frames:
+            hdul.close()
 
-# Inizializzazione variabile di tipo lista con gli ADU della prima immagine
-data0=fits.getdata(path0+name+Ni+ext, ext=0)
-fitslist=[data0]
+    return median_image
 
-# Copia header della prima immagine (che sicuramente esiste sempre)
-head=fits.getheader(path0+name+Ni+ext, ext=0)
+#==================================================================================
 
-# Incremento variabile di tipo lista con le restanti immagini bias
-for i in range(0, int(num_im)-1):
+def create_master_bias(path0, name, ext, Ni, num_im, mem_mb=MEM_BUDGET_MB):
 
-     num_file=str(i+int(Ni)+1)
+    """
+    Create the master bias "master_bias.fit" in path0 with the bias frames name+NNN+ext,
+    Ni <= NNN < Ni+num_im (missing frames are skipped). The master is taken from the
+    calibration library if the same bias frames have already been combined.
+    Input:
+    path0 = folder of the bias frames, name, ext = common part of the file names and extension,
+    Ni, num_im = first frame number and number of frames, mem_mb = memory budget of the median (MB)
+    """
 
-     file_to_open=path0+name+num_file+ext
+    pm.start_run('fits_master_bias', path0, name=name, ext=ext, Ni=Ni, num_im=num_im, mem_mb=mem_mb)
+
+    # Lista dei bias esistenti, se un file non esiste passa a quello successivo
+    bias_files=[]
+    for i in range(0, int(num_im)):
+
+         num_file=str(i+int(Ni))
 
-     # Verifica l'esistenza del file
-     if os.path.isfile(file_to_open):
+         file_to_open=path0+name+num_file+ext
 
-           data=fits.getdata(path0+name+num_file+ext, ext=0)
+         # Verifica l'esistenza del file
+         if os.path.isfile(file_to_open):
+               bias_files.append(file_to_open)
+               pm.count('frames')
+         else:
+               pm.count('skipped_files')
+               continue # Se il file non esiste passa a quello successivo
 
-           # Aggiunta dell'i-esima immagine nella variabile lista
-           fitslist.insert(i+1, data)
+    # Cerca nella libreria un master creato con gli stessi bias
+    with pm.timer('library'):
+         master_file=cl.find_master(bias_files)
 
-     else:
-           continue # Se il file non esiste passa a quello successivo
+    if master_file is not None:
+         print('Master bias from calibration library ' + master_file + '\n')
+         pm.count('library_hits')
+
+         # Copia del master della libreria nella cartella delle immagini
+         with pm.timer('write'):
+              shutil.copyfile(master_file, path0+'master_bias.fit')
 
-# Creazione master bias
-median_image=np.median(fitslist, axis=0)
+    else:
+         # Copia header della prima immagine esistente
+         head=fio.read_header(bias_files[0])
+
+         # Creazione master bias
+         median_image=median_combine(bias_files, mem_mb)
+
+         # Salvataggio master bias nella libreria e nella cartella delle immagini
+         with pm.timer('write'):
+              cl.store_master(median_image, head, bias_files)
+              fio.write_image(path0+'master_bias.fit', median_image, head, quantize_level=0)
+
+    pm.end_run()
+
+#==================================================================================
+
+if __name__ == '__main__':
 
-# Salvataggio master bias
-fits.writeto(path0+'master_bias.fit', median_image, head, overwrite=True)
+    # Parametri di input:
+    #
+    # Nome script, fits_master_bias.py
+    # path0, path della cartella con le immagini dei bias (esempio: path0='/home/albino/Test/')
+    # name = parte comune nome file fit dei bias (esempio: SST20201102_ )
+    # ext = estensione (esempio: .fit)
+    # Ni = numero iniziale immagine da analizzare (esempio: 101)
+    # num_im = numero immagini da analizzare (esempio: 10)
+    # mem_mb = (opzionale) memoria massima in MB per il calcolo della mediana (default 256)
+    # Esempio di input da riga di comando: > python3 fits_master_bias.py /home/albino/Test/ SST20201102_ .fit 101 10
+    # Esempio con limite di memoria: > python3 fits_master_bias.py /home/albino/Test/ SST20201102_ .fit 101 10 512
 
+    # Input dei dati da riga di comando
+    nome_script, path0, name, ext, Ni, num_im=sys.argv[0:6]
+    mem_mb=float(sys.argv[6]) if len(sys.argv) > 6 else MEM_BUDGET_MB
+
+    create_master_bias(path0, name, ext, Ni, num_im, mem_mb)